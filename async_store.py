@@ -0,0 +1,100 @@
+import asyncio
+
+
+class AsyncStore:
+    """asyncio front-end for a Store.
+    Orders are put into a bounded queue; one worker task takes all waiting orders (up to
+    batch_size) and commits them with Store.order_many(), which takes the stock locks once
+    and writes one version and one journal transaction for the whole batch. A batch runs
+    on the event loop, so batch_size also limits how long the loop is busy with it.
+    If the queue is full, order() waits until there is space again (backpressure).
+    """
+
+    def __init__(self, store, max_queue=1000, batch_size=100):
+        """
+        Create the front-end for an existing store.
+
+        :param store: the Store (or ShardedStore) that executes the orders
+        :param max_queue: maximum number of waiting orders
+        :param batch_size: maximum number of orders committed in one batch
+        """
+        if not isinstance(max_queue, int) or max_queue <= 0:
+            raise ValueError("max_queue must be a positive integer.")
+        if not isinstance(batch_size, int) or batch_size <= 0:
+            raise ValueError("batch_size must be a positive integer.")
+        self.store = store
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self._queue = None
+        self._worker = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+    def start(self) -> None:
+        """Start the worker task. Called automatically by the first order."""
+        if self._worker is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def close(self) -> None:
+        """Wait until all queued orders are committed and stop the worker."""
+        if self._worker is None:
+            return
+        await self._queue.join()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        self._queue = None
+
+    async def order(self, shopping_list):
+        """
+        Queue an order and wait for its result.
+
+        :param shopping_list: list of (Product, quantity) tuples
+        :return: total price of the order
+        :raises Exception: the same errors as Store.order
+        """
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((shopping_list, future))
+        return await future
+
+    async def get_all_products(self):
+        """Returns a list of all active products"""
+        return self.store.get_all_products()
+
+    async def get_total_quantity(self):
+        """Returns the sum of all Products."""
+        return self.store.get_total_quantity()
+
+    async def _run(self):
+        """Worker task: take all waiting orders (up to batch_size) and commit them together."""
+        queue = self._queue
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            self._commit(batch)
+            for _ in batch:
+                queue.task_done()
+
+    def _commit(self, batch):
+        """Execute a batch of orders and hand the results to the waiting coroutines."""
+        batch = [(shopping_list, future) for shopping_list, future in batch if not future.cancelled()]
+        try:
+            results = self.store.order_many([shopping_list for shopping_list, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -0,0 +1,168 @@
+"""
+Basket-level promotions and receipts.
+
+A basket promotion looks at the whole order instead of one line, e.g.
+"buy a MacBook, get the Windows License 50% off" or "10% off baskets over 2000 €".
+Rules are indexed by their trigger product, so an order only evaluates the rules
+whose trigger is in the basket, plus the rules without a trigger product.
+"""
+from abc import ABC, abstractmethod
+
+from money import Money
+
+
+class BasketPromotion(ABC):
+    """Abstract base class for promotions on a whole order."""
+    __slots__ = ("name",)
+
+    # name of the product that must be in the basket, None if the rule applies to every basket
+    trigger = None
+
+    def __init__(self, name):
+        self.name = name
+
+    @abstractmethod
+    def apply(self, receipt, lines_by_name):
+        """
+        Add the discounts of this rule to the receipt.
+
+        :param receipt: Receipt with the lines priced so far
+        :param lines_by_name: dict product name -> list of line numbers in the receipt
+        """
+
+
+class BundleDiscount(BasketPromotion):
+    """Percent off the target product if the trigger product is in the same order."""
+    __slots__ = ("trigger", "target", "percent")
+
+    def __init__(self, name, trigger, target, percent):
+        """
+        :param name: name shown on the receipt
+        :param trigger: name of the product that must be bought
+        :param target: name of the discounted product
+        :param percent: discount on the target product in percent
+        """
+        super().__init__(name)
+        self.trigger = trigger
+        self.target = target
+        self.percent = percent
+
+    def apply(self, receipt, lines_by_name):
+        for line in lines_by_name.get(self.target, ()):
+            receipt.add_discount(line, receipt.lines[line].total.percent_of(self.percent))
+
+
+class BasketThresholdDiscount(BasketPromotion):
+    """Percent off the whole order if its total reaches a threshold.
+    The discount is split over the lines in proportion to their totals.
+    """
+    __slots__ = ("threshold", "percent")
+
+    def __init__(self, name, threshold, percent):
+        """
+        :param name: name shown on the receipt
+        :param threshold: minimum order total
+        :param percent: discount on the whole order in percent
+        """
+        super().__init__(name)
+        self.threshold = threshold
+        self.percent = percent
+
+    def apply(self, receipt, lines_by_name):
+        if receipt.total < self.threshold:
+            return
+        for line, receipt_line in enumerate(receipt.lines):
+            receipt.add_discount(line, receipt_line.total.percent_of(self.percent))
+
+
+class BasketRules:
+    """Basket promotions of a store, indexed by trigger product name."""
+
+    def __init__(self):
+        self._by_trigger = {}  # product name -> rules
+        self._everywhere = []  # rules without a trigger product
+
+    def __len__(self):
+        return sum(len(rules) for rules in self._by_trigger.values()) + len(self._everywhere)
+
+    def add(self, rule):
+        if not isinstance(rule, BasketPromotion):
+            raise TypeError("Expected a BasketPromotion.")
+        if rule.trigger is None:
+            self._everywhere.append(rule)
+        else:
+            self._by_trigger.setdefault(rule.trigger, []).append(rule)
+
+    def remove(self, rule):
+        try:
+            if rule.trigger is None:
+                self._everywhere.remove(rule)
+            else:
+                self._by_trigger[rule.trigger].remove(rule)
+        except (KeyError, ValueError):
+            raise ValueError("Basket promotion not found.") from None
+
+    def apply(self, receipt):
+        """
+        Apply all matching rules to a receipt: first the rules triggered by a product
+        in the basket (in basket order), then the rules for every basket.
+        """
+        if not self:
+            return
+        lines_by_name = {}
+        for line, receipt_line in enumerate(receipt.lines):
+            lines_by_name.setdefault(receipt_line.product.name, []).append(line)
+        for name in lines_by_name:
+            for rule in self._by_trigger.get(name, ()):
+                self._apply_rule(rule, receipt, lines_by_name)
+        for rule in self._everywhere:
+            self._apply_rule(rule, receipt, lines_by_name)
+
+    @staticmethod
+    def _apply_rule(rule, receipt, lines_by_name):
+        """Apply one rule; it is listed on the receipt only if it changed the total."""
+        before = receipt.total
+        rule.apply(receipt, lines_by_name)
+        if receipt.total != before:
+            receipt.applied.append(rule.name)
+
+
+class ReceiptLine:
+    """One line of a receipt."""
+    __slots__ = ("product", "quantity", "subtotal", "basket_discount")
+
+    def __init__(self, product, quantity, subtotal):
+        self.product = product
+        self.quantity = quantity
+        self.subtotal = subtotal  # price with the product's own promotion
+        self.basket_discount = Money()
+
+    @property
+    def discount(self):
+        """Total discount of the line compared to the regular price."""
+        return self.product.price * self.quantity - self.total
+
+    @property
+    def total(self):
+        return self.subtotal - self.basket_discount
+
+
+class Receipt:
+    """Priced order with the discount of every line."""
+
+    def __init__(self, shopping_list, line_totals):
+        """
+        :param shopping_list: list of (Product, quantity) tuples
+        :param line_totals: price of every line with the product promotions (Money)
+        """
+        self.lines = [ReceiptLine(product, quantity, subtotal)
+                      for (product, quantity), subtotal in zip(shopping_list, line_totals)]
+        self.total = sum(line_totals, Money())
+        self.applied = []  # names of the applied basket promotions
+
+    def add_discount(self, line, amount):
+        """Reduce the price of a line (never below 0)."""
+        receipt_line = self.lines[line]
+        amount = min(amount, receipt_line.total)
+        receipt_line.basket_discount += amount
+        self.total -= amount
@@ -0,0 +1,4 @@
+"""
+Benchmark scripts for the Best Buy 2 project.
+Run them from the project folder, e.g. python -m benchmarks.bench_concurrent_orders
+"""
@@ -0,0 +1,69 @@
+"""
+Orders per second of AsyncStore with many concurrent coroutines compared to calling
+Store.order in a loop, on a thread safe store with a journal (one fsync per transaction).
+AsyncStore commits the waiting orders with Store.order_many(): one lock round, one
+version and one journal transaction per batch.
+"""
+import asyncio
+import os
+import tempfile
+
+from async_store import AsyncStore
+from benchmarks.common import create_products, measure
+from journal import Journal
+from products import NonStockedProduct
+from store import Store
+
+PRODUCTS = 10_000
+ORDERS = 5_000
+LINES_PER_ORDER = 5
+
+
+def create_store_and_baskets(directory):
+    """Create a journaled store with plenty of stock and the baskets to order."""
+    products = create_products(PRODUCTS)
+    for product in products:
+        if not isinstance(product, NonStockedProduct):
+            product.set_quantity(1_000_000)
+    baskets = [[(products[(order * 7 + line * 131) % PRODUCTS], 1) for line in range(LINES_PER_ORDER)]
+               for order in range(ORDERS)]
+    store = Store(products, thread_safe=True)
+    store.attach_journal(Journal(os.path.join(directory, "journal.log")))
+    return store, baskets
+
+
+def run_sync(directory):
+    store, baskets = create_store_and_baskets(directory)
+
+    def work():
+        for basket in baskets:
+            store.order(basket)
+
+    seconds = measure(work)
+    store.journal.close()
+    return ORDERS / seconds
+
+
+def run_async(directory, batch_size):
+    store, baskets = create_store_and_baskets(directory)
+
+    async def place_all():
+        async with AsyncStore(store, max_queue=1000, batch_size=batch_size) as async_store:
+            await asyncio.gather(*(async_store.order(basket) for basket in baskets))
+
+    seconds = measure(lambda: asyncio.run(place_all()))
+    store.journal.close()
+    return ORDERS / seconds
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        results = [("sync Store.order", run_sync(directory))]
+        for batch_size in (1, 10, 100, 1000):
+            results.append((f"AsyncStore batch_size={batch_size}", run_async(directory, batch_size)))
+    for label, orders_per_second in results:
+        print(f"{label:32} {orders_per_second:12.0f} orders/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Time to price a large basket with many basket promotions: rules indexed by
+trigger product compared to checking every rule against every line of the basket.
+"""
+from basket import BundleDiscount, Receipt
+from benchmarks.common import create_products, measure
+from store import Store
+
+PRODUCTS = 100_000
+RULES = 2_000
+LINES = 1_000
+
+
+def main():
+    products = create_products(PRODUCTS)
+    store = Store(products)
+    rules = [BundleDiscount(f"rule {number}", trigger=products[number * 2].name,
+                            target=products[number * 2 + 1].name, percent=10) for number in range(RULES)]
+    for rule in rules:
+        store.add_basket_promotion(rule)
+    basket = [(products[(line * 97) % PRODUCTS], 1) for line in range(LINES)]
+    line_totals = store.quote(basket)
+
+    def indexed():
+        store.basket_rules.apply(Receipt(basket, line_totals))
+
+    def every_rule():
+        receipt = Receipt(basket, line_totals)
+        for rule in rules:
+            if any(receipt_line.product.name == rule.trigger for receipt_line in receipt.lines):
+                rule.apply(receipt, {receipt_line.product.name: [line]
+                                     for line, receipt_line in enumerate(receipt.lines)})
+
+    print(f"{RULES} rules, {LINES} lines")
+    print(f"indexed by trigger: {measure(indexed, repeat=5) * 1000:8.3f} ms")
+    print(f"every rule:         {measure(every_rule, repeat=5) * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
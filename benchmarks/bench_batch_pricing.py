@@ -0,0 +1,37 @@
+"""
+Pricing throughput of apply_promotion (one call per pair) compared to
+apply_promotion_batch (one call for all pairs) for every built-in promotion.
+"""
+import random
+
+from benchmarks.common import measure
+from optional_numpy import numpy_or_none
+from promotions import PercentDiscount, SecondHalfPrice, ThirdOneFree
+from products import Product
+
+PAIRS = 1_000_000
+
+
+def main():
+    rng = random.Random(42)
+    prices = [rng.randint(1, 2000) for _ in range(PAIRS)]
+    quantities = [rng.randint(1, 20) for _ in range(PAIRS)]
+    products = [Product("SKU", price=price, quantity=1) for price in prices]
+    np = numpy_or_none()
+    if np is not None:
+        prices = np.asarray(prices, dtype=np.float64)
+        quantities = np.asarray(quantities, dtype=np.int64)
+    print(f"NumPy: {'yes' if np is not None else 'no (plain Python fallback)'}")
+
+    for promotion in (PercentDiscount("20% off", percent=20),
+                      SecondHalfPrice("Second one half price"),
+                      ThirdOneFree("3 for 2")):
+        single = measure(lambda: [promotion.apply_promotion(product, quantity)
+                                  for product, quantity in zip(products, quantities)])
+        batch = measure(lambda: promotion.apply_promotion_batch(prices, quantities), repeat=3)
+        print(f"{type(promotion).__name__:16} single: {PAIRS / single:14.0f} pairs/s   "
+              f"batch: {PAIRS / batch:14.0f} pairs/s")
+
+
+if __name__ == "__main__":
+    main()
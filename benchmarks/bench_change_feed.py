@@ -0,0 +1,57 @@
+"""
+Keeping a downstream copy of the stock up to date: polling get_all_products() and
+diffing the whole catalog, compared to a Replica that applies the change feed.
+Also measures what publishing the events costs the orders.
+"""
+from benchmarks.common import create_products, measure
+from change_feed import ChangeFeed, Replica
+from products import NonStockedProduct
+from store import Store
+
+PRODUCTS = 100_000
+ORDERS = 1_000  # orders between two syncs
+LINES_PER_ORDER = 5
+
+
+def create_store():
+    products = create_products(PRODUCTS)
+    for product in products:
+        if not isinstance(product, NonStockedProduct):
+            product.set_quantity(1_000_000)
+    return Store(products), products
+
+
+def poll(store, previous):
+    """Diff the whole catalog against the previous poll, return (state, changed names)."""
+    state = {product.name: (product.quantity, product.active, product.price, product.promotion)
+             for product in store.get_all_products()}
+    changed = [name for name, values in state.items() if previous.get(name) != values]
+    changed.extend(name for name in previous if name not in state)
+    return state, changed
+
+
+def main():
+    store, products = create_store()
+    baskets = [[(products[(order * 7 + line * 131) % PRODUCTS], 1) for line in range(LINES_PER_ORDER)]
+               for order in range(ORDERS)]
+
+    seconds = measure(lambda: [store.order(basket) for basket in baskets])
+    print(f"orders without feed:        {ORDERS / seconds:12.0f} orders/s")
+    store.attach_feed(ChangeFeed())
+    seconds = measure(lambda: [store.order(basket) for basket in baskets])
+    print(f"orders with feed:           {ORDERS / seconds:12.0f} orders/s")
+
+    state, _ = poll(store, {})
+    replica = Replica(store)
+    for basket in baskets:
+        store.order(basket)
+    seconds = measure(lambda: poll(store, state))
+    _, changed = poll(store, state)
+    print(f"poll and diff catalog:      {seconds * 1000:12.2f} ms for {len(changed)} changed products")
+    seconds = measure(replica.sync)
+    print(f"replica.sync():             {seconds * 1000:12.2f} ms")
+    assert replica.store.get_total_quantity() == store.get_total_quantity()
+
+
+if __name__ == "__main__":
+    main()
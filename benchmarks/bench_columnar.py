@@ -0,0 +1,53 @@
+"""
+Memory per SKU and aggregate speed of Store (one object per product)
+compared to ColumnarStore (parallel columns) at 1M SKUs.
+"""
+import tracemalloc
+
+from benchmarks.common import create_products, measure
+from columnar import ColumnarInventory, ColumnarStore, PRODUCT, NON_STOCKED, LIMITED
+from optional_numpy import numpy_or_none
+from store import Store
+
+SKUS = 1_000_000
+
+
+def build_object_store():
+    return Store(create_products(SKUS))
+
+
+def build_columnar_store():
+    inventory = ColumnarInventory()
+    for product in create_products(SKUS):
+        if product.name.endswith("0"):
+            kind = NON_STOCKED
+        elif product.name.endswith("1"):
+            kind = LIMITED
+        else:
+            kind = PRODUCT
+        inventory.add_row(product.name, product.price, product.quantity, kind, maximum=1)
+    return ColumnarStore(inventory=inventory)
+
+
+def traced(build):
+    """Build a store and return it with the number of bytes still allocated for it."""
+    tracemalloc.start()
+    store = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return store, current
+
+
+def main():
+    print(f"NumPy: {'yes' if numpy_or_none() is not None else 'no (plain Python fallback)'}")
+    for label, build in (("Store", build_object_store), ("ColumnarStore", build_columnar_store)):
+        store, size = traced(build)
+        total = measure(store.get_total_quantity, repeat=5)
+        active = measure(store.get_all_products, repeat=3)
+        print(f"{label:14} {size / SKUS:8.0f} bytes/SKU   "
+              f"get_total_quantity: {total * 1000:8.3f} ms   get_all_products: {active * 1000:8.1f} ms")
+        del store
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Queries on a large catalog: Store.find() with its sorted indexes compared to a scan
+over all products, and the cost of keeping the indexes up to date during orders.
+"""
+from benchmarks.common import create_products, measure
+from catalog_index import CatalogIndex
+from products import NonStockedProduct
+from promotions import PercentDiscount
+from store import Store
+
+PRODUCTS = 100_000
+QUERIES = 100
+ORDERS = 10_000
+
+
+def scan(store, **filters):
+    return [product for product in store.products if CatalogIndex.matches(product, **filters)]
+
+
+def orders_per_second(store, products):
+    baskets = [[(products[(order * 7 + line * 131) % PRODUCTS], 1) for line in range(5)]
+               for order in range(ORDERS)]
+    return ORDERS / measure(lambda: [store.order(basket) for basket in baskets])
+
+
+def main():
+    products = create_products(PRODUCTS, promotions=True)
+    for product in products:
+        if not isinstance(product, NonStockedProduct):
+            product.set_quantity(product.quantity + 100_000)
+    store = Store(products)
+    print(f"orders without indexes: {orders_per_second(store, products):10.0f} orders/s")
+
+    queries = {
+        "price 100-110": {"price_between": (100, 110)},
+        "quantity below 100_050": {"quantity_below": 100_050},
+        "20% off, price 0-500": {"promotion": PercentDiscount, "price_between": (0, 500)},
+    }
+    seconds = measure(lambda: store.find(price_between=(0, 0)))
+    print(f"building the indexes:   {seconds * 1000:10.1f} ms")
+    for label, filters in queries.items():
+        assert sorted(p.name for p in store.find(**filters)) == sorted(p.name for p in scan(store, **filters))
+        indexed = measure(lambda: [store.find(**filters) for _ in range(QUERIES)])
+        scanned = measure(lambda: [scan(store, **filters) for _ in range(QUERIES // 10)])
+        print(f"{label:24} find: {QUERIES / indexed:10.0f} queries/s   "
+              f"scan: {QUERIES // 10 / scanned:8.1f} queries/s")
+    print(f"orders with indexes:    {orders_per_second(store, products):10.0f} orders/s")
+
+
+if __name__ == "__main__":
+    main()
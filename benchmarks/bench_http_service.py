@@ -0,0 +1,118 @@
+"""
+Load test of the HTTP/JSON order service: CONNECTIONS keep-alive connections send
+requests as fast as they are answered; reports requests/s and p50/p99 latency for
+product lists, single orders and batched orders.
+
+The service runs in a child process with a synthetic catalog:
+
+    python -m benchmarks.bench_http_service --connections 64
+
+Also compares a product list built from the cached JSON fragments with serializing
+every product again.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import time
+
+from benchmarks.common import create_products, measure
+from http_service import OrderService, Client, product_json
+from products import NonStockedProduct
+from store import Store
+
+PRODUCTS = 1_000
+CONNECTIONS = 16
+REQUESTS = 4_000  # per scenario, over all connections
+BATCH = 50  # shopping lists per /orders request
+
+
+def create_store():
+    products = create_products(PRODUCTS)
+    for product in products:
+        if not isinstance(product, NonStockedProduct):
+            product.set_quantity(1_000_000)
+    return Store(products)
+
+
+def run_service(port, ready):
+    async def serve():
+        service = OrderService(create_store())
+        await service.start(port=port)
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+async def load(port, method, path, data, requests=REQUESTS, connections=CONNECTIONS):
+    """Send requests over several connections, return (requests/s, sorted latencies)."""
+    latencies = []
+
+    async def connection(count):
+        async with Client(port=port) as client:
+            for _ in range(count):
+                start = time.perf_counter()
+                status, _ = await client.request(method, path, data)
+                latencies.append(time.perf_counter() - start)
+                assert status == 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*(connection(requests // connections) for _ in range(connections)))
+    seconds = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / seconds, latencies
+
+
+def show(label, result):
+    rate, latencies = result
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"{label:32} {rate:9.0f} requests/s, p50 {p50:7.2f} ms, p99 {p99:7.2f} ms")
+
+
+async def load_test(port, connections):
+    names = [product.name for product in create_products(PRODUCTS)]
+    items = [[{"name": names[(order * 7 + line * 131) % PRODUCTS], "quantity": 1} for line in range(5)]
+             for order in range(BATCH)]
+    show("GET /total", await load(port, "GET", "/total", None, REQUESTS, connections))
+    show(f"GET /products ({PRODUCTS} products)",
+         await load(port, "GET", "/products", None, REQUESTS // 10, connections))
+    show("POST /order (5 lines)", await load(port, "POST", "/order", {"items": items[0]}, REQUESTS, connections))
+    rate, latencies = await load(port, "POST", "/orders", {"orders": items}, REQUESTS // 10, connections)
+    show(f"POST /orders ({BATCH} orders)", (rate, latencies))
+    print(f"{'':32} {rate * BATCH:9.0f} orders/s")
+
+
+def compare_serialization():
+    store = create_store()
+    service = OrderService(store)
+    service.products_json()  # fills the fragment cache
+    seconds = measure(service.products_json, repeat=5)
+    print(f"product list, cached fragments:  {seconds * 1000:9.2f} ms")
+    seconds = measure(lambda: json.dumps([product_json(product) for product in store.get_all_products()]).encode(),
+                      repeat=5)
+    print(f"product list, serialized again:  {seconds * 1000:9.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--connections", type=int, default=CONNECTIONS, help="number of keep-alive connections")
+    parser.add_argument("--port", type=int, default=8765, help="port of the service")
+    args = parser.parse_args()
+
+    compare_serialization()
+    port = args.port
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=run_service, args=(port, ready), daemon=True)
+    process.start()
+    try:
+        ready.wait()
+        asyncio.run(load_test(port, args.connections))
+    finally:
+        process.terminate()
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
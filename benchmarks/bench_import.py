@@ -0,0 +1,44 @@
+"""
+Rows per second and peak memory of a streaming CSV import into a ColumnarStore.
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+
+from columnar import ColumnarStore
+from importer import import_catalog
+
+ROWS = 500_000
+
+
+def write_feed(path):
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("name,price,quantity,type,maximum,promotion\n")
+        for number in range(ROWS):
+            if number % 10 == 0:
+                file.write(f"SKU-{number:08d},{number % 2000 + 1},,non_stocked,,\n")
+            elif number % 10 == 1:
+                file.write(f"SKU-{number:08d},{number % 2000 + 1},{number % 1000},limited,1,\n")
+            else:
+                file.write(f"SKU-{number:08d},{number % 2000 + 1},{number % 1000},,,percent|20% off|20\n")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "feed.csv")
+        write_feed(path)
+        store = ColumnarStore()
+        tracemalloc.start()
+        start = time.perf_counter()
+        report = import_catalog(store, path, chunk_size=10_000)
+        elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    print(report)
+    print(f"{ROWS / elapsed:10.0f} rows/s")
+    print(f"store: {current / 2**20:8.1f} MiB   peak during import: {peak / 2**20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
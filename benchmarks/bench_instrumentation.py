@@ -0,0 +1,34 @@
+"""
+Cost of the instrumentation on Store.order: disabled compared to enabled.
+"""
+from benchmarks.common import create_products, measure
+from instrumentation import export_metrics, metrics
+from products import NonStockedProduct
+from store import Store
+
+PRODUCTS = 1_000
+ORDERS = 50_000
+
+
+def run():
+    products = create_products(PRODUCTS)
+    for product in products:
+        if not isinstance(product, NonStockedProduct):
+            product.set_quantity(1_000_000)
+    store = Store(products)
+    baskets = [[(products[(order * 7 + line * 131) % PRODUCTS], 1) for line in range(3)]
+               for order in range(ORDERS)]
+    return ORDERS / measure(lambda: [store.order(basket) for basket in baskets])
+
+
+def main():
+    metrics.disable()
+    print(f"instrumentation disabled: {run():10.0f} orders/s")
+    metrics.enable()
+    print(f"instrumentation enabled:  {run():10.0f} orders/s")
+    histogram = export_metrics()["histograms"]["store.order"]
+    print(f"store.order p50: {histogram['p50_us']} us   p99: {histogram['p99_us']} us")
+
+
+if __name__ == "__main__":
+    main()
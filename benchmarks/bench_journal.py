@@ -0,0 +1,50 @@
+"""
+Orders per second with a write-ahead journal: fsync after every order
+compared to group commit with 10 and 100 orders per fsync.
+"""
+import os
+import tempfile
+
+from benchmarks.common import create_products, measure
+from journal import Journal
+from products import NonStockedProduct
+from store import Store
+
+PRODUCTS = 1_000
+ORDERS = 2_000
+
+
+def run(journal_path=None, group_size=1):
+    """Place ORDERS orders (with a journal if a path is given) and return orders per second."""
+    products = create_products(PRODUCTS)
+    for product in products:
+        if not isinstance(product, NonStockedProduct):
+            product.set_quantity(1_000_000)
+    store = Store(products)
+    baskets = [[(products[(order * 7 + line * 131) % PRODUCTS], 1) for line in range(3)]
+               for order in range(ORDERS)]
+    if journal_path is not None:
+        store.attach_journal(Journal(journal_path, group_size=group_size))
+
+    def work():
+        for basket in baskets:
+            store.order(basket)
+        if store.journal is not None:
+            store.journal.flush()
+
+    elapsed = measure(work)
+    if store.journal is not None:
+        store.journal.close()
+    return ORDERS / elapsed
+
+
+def main():
+    print(f"no journal:           {run():10.0f} orders/s")
+    with tempfile.TemporaryDirectory() as directory:
+        for group_size in (1, 10, 100):
+            path = os.path.join(directory, f"journal-{group_size}.log")
+            print(f"group_size={group_size:<4}       {run(path, group_size):10.0f} orders/s")
+
+
+if __name__ == "__main__":
+    main()
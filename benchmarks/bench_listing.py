@@ -0,0 +1,27 @@
+"""
+Time to the first page of a product listing for growing catalogs: formatting every
+product of store.products (as main.py did) compared to iter_products() pages.
+"""
+from benchmarks.common import create_products, measure
+from store import Store
+
+CATALOG_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+PAGE_SIZE = 20
+
+
+def main():
+    for size in CATALOG_SIZES:
+        store = Store(create_products(size))
+        eager = measure(lambda: [product.show() for product in store.products][:PAGE_SIZE])
+        lazy = measure(lambda: [product.show() for product in store.iter_products(limit=PAGE_SIZE)], repeat=5)
+        middle = store.iter_products(limit=size // 2)
+        for _ in middle:
+            pass
+        next_page = measure(lambda: [product.show() for product in
+                                     store.iter_products(after=middle.cursor, limit=PAGE_SIZE)], repeat=5)
+        print(f"{size:>9} products: all shown {eager * 1000:9.2f} ms, first page {lazy * 1000:6.3f} ms, "
+              f"page in the middle {next_page * 1000:6.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Bytes per product (tracemalloc) of a large catalog: dict based products with one
+promotion object each, compared to slotted products sharing their promotions.
+"""
+import tracemalloc
+
+from products import Product
+from promotions import PercentDiscount, shared_promotion
+
+PRODUCTS = 200_000
+
+
+class DictProduct:
+    """The product layout before __slots__: all attributes in a per-instance dict."""
+
+    def __init__(self, name, price, quantity):
+        self._observers = []
+        self.name = name
+        self.price = price
+        self._quantity = quantity
+        self._active = True
+        self.promotion = None
+
+
+class DictPercentDiscount:
+    """The promotion layout before __slots__."""
+
+    def __init__(self, name, percent):
+        self.name = name
+        self.percent = percent
+
+
+def build_before():
+    products = [DictProduct(f"SKU-{number:08d}", 100, 10) for number in range(PRODUCTS)]
+    for product in products:
+        product.promotion = DictPercentDiscount("20% off", percent=20)
+    return products
+
+
+def build_after():
+    products = [Product(f"SKU-{number:08d}", price=100, quantity=10) for number in range(PRODUCTS)]
+    for product in products:
+        product.set_promotion(shared_promotion(PercentDiscount, "20% off", percent=20))
+    return products
+
+
+def bytes_per_product(build):
+    tracemalloc.start()
+    products = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del products
+    return current / PRODUCTS
+
+
+def main():
+    before = bytes_per_product(build_before)
+    after = bytes_per_product(build_after)
+    print(f"dict products, one promotion each: {before:8.0f} bytes/product")
+    print(f"slotted products, shared promotion: {after:8.0f} bytes/product ({1 - after / before:.0%} less)")
+
+
+if __name__ == "__main__":
+    main()
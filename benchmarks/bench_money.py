@@ -0,0 +1,44 @@
+"""
+Pricing 1M order lines with 15% off (rounded to cents per line) and summing them:
+float, decimal.Decimal and integer cents (the Money engine). Also shows how far the
+float total drifts from the exact one.
+"""
+import random
+from decimal import Decimal, ROUND_HALF_UP
+
+from benchmarks.common import measure
+from money import Money, divide_half_up
+
+LINES = 1_000_000
+CENT = Decimal("0.01")
+
+
+def main():
+    rng = random.Random(42)
+    price_cents = [rng.randint(1, 200_000) for _ in range(LINES)]
+    quantities = [rng.randint(1, 20) for _ in range(LINES)]
+    floats = [cents / 100 for cents in price_cents]
+    decimals = [Decimal(cents).scaleb(-2) for cents in price_cents]
+
+    def with_floats():
+        return sum(round(price * quantity * (1 - 15 / 100), 2) for price, quantity in zip(floats, quantities))
+
+    def with_decimals():
+        factor = Decimal("0.85")
+        return sum((price * quantity * factor).quantize(CENT, rounding=ROUND_HALF_UP)
+                   for price, quantity in zip(decimals, quantities))
+
+    def with_cents():
+        return Money(sum(divide_half_up(cents * quantity * 85, 100) for cents, quantity in zip(price_cents, quantities)))
+
+    results = {}
+    for label, function in (("float", with_floats), ("Decimal", with_decimals), ("integer cents", with_cents)):
+        seconds = measure(function)
+        results[label] = function()
+        print(f"{label:14} {LINES / seconds:12.0f} lines/s   total {results[label]}")
+    print(f"float drift against the exact total: {abs(Decimal(repr(results['float'])) - results['Decimal'])}")
+    assert results["integer cents"] == results["Decimal"]
+
+
+if __name__ == "__main__":
+    main()
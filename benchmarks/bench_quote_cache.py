@@ -0,0 +1,39 @@
+"""
+Quoting the same basket again and again (a checkout page refreshing its totals),
+with and without the quote cache.
+"""
+import random
+
+from benchmarks.common import create_products, measure
+from promotions import StackedPromotion, BestPromotion, PercentDiscount, SecondHalfPrice, ThirdOneFree
+from store import Store
+
+PRODUCTS = 10_000
+LINES = 100
+QUOTES = 1_000
+
+
+def create_basket():
+    """Create a catalog and a random basket from it."""
+    products = create_products(PRODUCTS, promotions=True)
+    # a few products with promotion groups, which are the most expensive to price
+    for product in products[1::7]:
+        product.set_promotion(BestPromotion("best offer", [
+            StackedPromotion("3 for 2, then 10% off", [ThirdOneFree("3 for 2"), PercentDiscount("10%", percent=10)]),
+            SecondHalfPrice("Second one half price")]))
+    rng = random.Random(42)
+    basket = [(products[rng.randrange(PRODUCTS)], rng.randint(1, 3)) for _ in range(LINES)]
+    return products, basket
+
+
+def main():
+    for size in (0, 10_000):
+        products, basket = create_basket()
+        store = Store(products, quote_cache_size=size)
+        seconds = measure(lambda: [store.quote(basket) for _ in range(QUOTES)])
+        label = "no cache" if not size else "cache"
+        print(f"{label:9} {QUOTES / seconds:10.0f} quotes/s   {store.quote_cache.info()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Availability of a product with many open carts: recomputing the planned quantities
+from every cart compared to the reserved quantities kept by the ReservationBook.
+Also measures reserve() and the lazy expiry of abandoned carts.
+"""
+from benchmarks.common import create_products, measure
+from products import NonStockedProduct
+from store import Store
+
+PRODUCTS = 1_000
+CARTS = 10_000
+LINES_PER_CART = 5
+
+
+def main():
+    products = [product for product in create_products(PRODUCTS) if not isinstance(product, NonStockedProduct)]
+    for product in products:
+        product.set_quantity(1_000_000)
+    store = Store(products)
+    now = [0.0]
+    store.reservations.clock = lambda: now[0]
+    carts = [[(products[(cart * 7 + line * 131) % len(products)], 1) for line in range(LINES_PER_CART)]
+             for cart in range(CARTS)]
+
+    seconds = measure(lambda: [store.reserve(cart, ttl=60) for cart in carts])
+    print(f"reserve:                    {CARTS / seconds:12.0f} carts/s")
+
+    def recompute(checked):
+        for product in checked:
+            planned = 0
+            for cart in carts:
+                for cart_product, quantity in cart:
+                    if cart_product is product:
+                        planned += quantity
+            product.quantity - planned
+
+    seconds = measure(lambda: [store.available(product) for product in products])
+    print(f"available(), reservations:  {len(products) / seconds:12.0f} products/s")
+    sample = products[:10]  # recomputing is too slow for the whole catalog
+    seconds = measure(lambda: recompute(sample))
+    print(f"available(), recomputed:    {len(sample) / seconds:12.0f} products/s")
+
+    now[0] = 61
+    seconds = measure(store.reservations.expire)
+    print(f"expire {CARTS} carts:        {seconds * 1000:12.1f} ms")
+    assert all(store.available(product) == 1_000_000 for product in products)
+
+
+if __name__ == "__main__":
+    main()
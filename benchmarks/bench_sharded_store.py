@@ -0,0 +1,67 @@
+"""
+Order throughput of the ShardedStore with 1, 2, 4 and 8 worker processes,
+compared to a plain Store in one process.
+
+Single-shard orders are sent with order_many(), so all shards work at the same time;
+cross-shard orders use two-phase commit and are placed one by one.
+"""
+from benchmarks.common import create_products, measure
+from products import NonStockedProduct
+from sharded_store import ShardedStore, shard_of
+from store import Store
+
+PRODUCTS = 10_000
+ORDERS = 20_000
+CROSS_SHARD_ORDERS = 1_000
+LINES_PER_ORDER = 5
+
+
+def create_catalog():
+    products = create_products(PRODUCTS, promotions=True)
+    for product in products:
+        if not isinstance(product, NonStockedProduct):
+            product.set_quantity(1_000_000)
+    return products
+
+
+def single_shard_baskets(products, workers):
+    """Baskets whose lines all belong to the same shard, spread evenly over the shards."""
+    by_shard = [[] for _ in range(workers)]
+    for product in products:
+        by_shard[shard_of(product.name, workers)].append(product)
+    baskets = []
+    for order in range(ORDERS):
+        shard_products = by_shard[order % workers]
+        baskets.append([(shard_products[(order * 7 + line * 131) % len(shard_products)], 1)
+                        for line in range(LINES_PER_ORDER)])
+    return baskets
+
+
+def cross_shard_baskets(products):
+    return [[(products[(order * 7 + line * 131) % PRODUCTS], 1) for line in range(LINES_PER_ORDER)]
+            for order in range(CROSS_SHARD_ORDERS)]
+
+
+def main():
+    products = create_catalog()
+    store = Store(products)
+    baskets = single_shard_baskets(products, 1)
+    seconds = measure(lambda: [store.order(basket) for basket in baskets])
+    print(f"Store, one process:  {ORDERS / seconds:10.0f} orders/s")
+
+    for workers in (1, 2, 4, 8):
+        products = create_catalog()
+        with ShardedStore(products, workers=workers) as sharded:
+            baskets = single_shard_baskets(products, workers)
+            initial_quantity = sharded.get_total_quantity()
+            single = measure(lambda: sharded.order_many(baskets))
+            cross = measure(lambda: [sharded.order(basket) for basket in cross_shard_baskets(products)])
+            sold = sum(quantity for basket in baskets + cross_shard_baskets(products)
+                       for product, quantity in basket if not isinstance(product, NonStockedProduct))
+            assert sharded.get_total_quantity() == initial_quantity - sold
+        print(f"{workers} worker(s): single shard {ORDERS / single:10.0f} orders/s   "
+              f"cross shard {CROSS_SHARD_ORDERS / cross:8.0f} orders/s")
+
+
+if __name__ == "__main__":
+    main()
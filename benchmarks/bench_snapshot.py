@@ -0,0 +1,33 @@
+"""
+Save and reload time of a binary snapshot with 1M SKUs.
+"""
+import os
+import tempfile
+
+from benchmarks.common import create_products, measure
+from store import Store
+
+SKUS = 1_000_000
+
+
+def main():
+    store = Store(create_products(SKUS))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "inventory.snap")
+        save = measure(lambda: store.save(path))
+        size = os.path.getsize(path)
+        load = measure(lambda: Store.load(path), repeat=5)
+        loaded = Store.load(path)
+        lookup = measure(lambda: loaded.get_product("SKU-00500000").quantity, repeat=5)
+        total = measure(loaded.get_total_quantity)
+        assert loaded.get_total_quantity() == store.get_total_quantity()
+        del loaded
+    print(f"snapshot size:           {size / SKUS:10.1f} bytes/SKU")
+    print(f"save:                    {save * 1000:10.1f} ms")
+    print(f"load:                    {load * 1000:10.3f} ms")
+    print(f"first lookup by name:    {lookup * 1000:10.3f} ms")
+    print(f"get_total_quantity:      {total * 1000:10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
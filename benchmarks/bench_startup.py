@@ -0,0 +1,109 @@
+"""
+Startup time of main.py: `python -X importtime -c "import main"` (the slowest modules
+and the whole import) and the wall time of short command line calls, also on memory-mapped
+snapshot catalogs of growing size. Compares the results with a tracked budget:
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --budget benchmarks/startup_budget.json
+
+The exit code is 1 if a case is over its budget. Every case is the best of RUNS runs,
+with bytecode caching on, so compiling the modules is not counted. Run it with NumPy
+installed as well: the budget holds only because importing main does not load NumPy.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import create_products
+from store import Store
+
+RUNS = 7
+CATALOG_SIZES = (10_000, 1_000_000)
+BUDGET_PATH = os.path.join(os.path.dirname(__file__), "startup_budget.json")
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(arguments):
+    """Run python with arguments in the repository, return (seconds, stderr)."""
+    environment = dict(os.environ)
+    environment.pop("PYTHONDONTWRITEBYTECODE", None)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, *arguments], cwd=REPOSITORY, env=environment,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    return time.perf_counter() - start, result.stderr
+
+
+def import_times():
+    """Return {module: (self µs, cumulative µs)}, the best of RUNS imports of main."""
+    best = {}
+    run(["-c", "import main"])  # writes the bytecode caches
+    for _ in range(RUNS):
+        _, output = run(["-X", "importtime", "-c", "import main"])
+        for line in output.splitlines():
+            if not line.startswith("import time:") or "|" not in line or "self" in line:
+                continue
+            own, cumulative, module = line[len("import time:"):].split("|")
+            module = module.strip()
+            times = (int(own), int(cumulative))
+            best[module] = min(best.get(module, times), times)
+    return best
+
+
+def wall_time(arguments):
+    """Best wall time of RUNS calls, in seconds."""
+    run(arguments)
+    return min(run(arguments)[0] for _ in range(RUNS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget", default=BUDGET_PATH, help="JSON file with the budget of every case in ms")
+    args = parser.parse_args()
+
+    times = import_times()
+    print("slowest modules (self time):")
+    for module, (own, cumulative) in sorted(times.items(), key=lambda item: -item[1][0])[:8]:
+        print(f"  {module:28} {own / 1000:7.2f} ms (cumulative {cumulative / 1000:7.2f} ms)")
+
+    results = {
+        "import main": times["main"][1] / 1000,
+        "python -c pass": wall_time(["-c", "pass"]) * 1000,
+        "main.py stock": wall_time(["main.py", "stock"]) * 1000,
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for size in CATALOG_SIZES:
+            products = create_products(size)
+            path = os.path.join(directory, f"catalog-{size}.snap")
+            Store(products).save(path)
+            name = products[size // 2].name
+            catalog = ["main.py", "--catalog", path]
+            results[f"{size} products: stock NAME"] = wall_time([*catalog, "stock", name]) * 1000
+            results[f"{size} products: order NAME 1"] = wall_time([*catalog, "order", name, "1"]) * 1000
+            os.remove(f"{path}.journal")  # RUNS + 1 orders were journaled
+            results[f"{size} products: all products read"] = wall_time(
+                ["-c", f"from store import Store; Store.load({path!r}).get_all_products()"]) * 1000
+            del products
+
+    budget = {}
+    if os.path.exists(args.budget):
+        with open(args.budget, encoding="utf-8") as file:
+            budget = json.load(file)
+    over = False
+    print()
+    for case, milliseconds in results.items():
+        limit = budget.get(case)
+        status = ""
+        if limit is not None:
+            status = f"budget {limit:7.1f} ms" + ("  OVER BUDGET" if milliseconds > limit else "")
+            over = over or milliseconds > limit
+        print(f"{case:40} {milliseconds:9.2f} ms  {status}")
+    if over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Reports during heavy ordering: order latency while a reporting thread reads the whole
+inventory every REPORT_INTERVAL seconds, with Store.snapshot() read views compared to a
+report that holds a store-wide lock (which orders also take) while it reads the products.
+Also measures how long snapshot() takes on a large catalog.
+
+The garbage collector is paused during the runs, so the maximum latency shows how long
+an order waited for a report and not a collection pause.
+"""
+import gc
+import threading
+import time
+
+from benchmarks.common import create_products, measure
+from products import NonStockedProduct
+from store import Store
+
+PRODUCTS = 100_000
+ORDERS = 20_000
+LINES_PER_ORDER = 5
+REPORT_INTERVAL = 0.05
+
+
+def create_store():
+    products = create_products(PRODUCTS)
+    for product in products:
+        if not isinstance(product, NonStockedProduct):
+            product.set_quantity(1_000_000)
+    return Store(products, thread_safe=True), products
+
+
+def run(report, store, products, lock=None):
+    """Place ORDERS orders while report() runs periodically, return (orders/s, latencies, reports)."""
+    baskets = [[(products[(order * 7 + line * 131) % PRODUCTS], 1) for line in range(LINES_PER_ORDER)]
+               for order in range(ORDERS)]
+    done = threading.Event()
+    reports = [0]
+    latencies = []
+
+    def reporter():
+        while not done.wait(REPORT_INTERVAL):
+            report()
+            reports[0] += 1
+
+    def order_all():
+        for basket in baskets:
+            start = time.perf_counter()
+            if lock is None:
+                store.order(basket)
+            else:
+                with lock:
+                    store.order(basket)
+            latencies.append(time.perf_counter() - start)
+
+    thread = threading.Thread(target=reporter) if report is not None else None
+    if thread is not None:
+        thread.start()
+    gc.disable()
+    try:
+        seconds = measure(order_all)
+    finally:
+        gc.enable()
+    done.set()
+    if thread is not None:
+        thread.join()
+    latencies.sort()
+    return ORDERS / seconds, latencies, reports[0]
+
+
+def show(label, result):
+    rate, latencies, reports = result
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"{label:26} {rate:9.0f} orders/s, p99 {p99:7.3f} ms, max {latencies[-1] * 1000:7.1f} ms, "
+          f"{reports} reports")
+
+
+def main():
+    store, products = create_store()
+    show("no reports:", run(None, store, products))
+
+    seconds = measure(store.snapshot)
+    print(f"first snapshot():           {seconds * 1000:9.1f} ms (starts version tracking)")
+    views = [store.snapshot() for _ in range(10)]
+    seconds = measure(lambda: [store.snapshot().close() for _ in range(10_000)])
+    print(f"snapshot():                 {seconds / 10_000 * 1e6:9.2f} us")
+    for view in views:
+        view.close()
+
+    def snapshot_report():
+        with store.snapshot() as view:
+            [(state.name, state.quantity) for state in view.products]
+
+    show("reports with snapshot():", run(snapshot_report, store, products))
+
+    lock = threading.Lock()
+
+    def locked_report():
+        with lock:
+            [(product.name, product.quantity) for product in store.products]
+
+    show("reports with a store lock:", run(locked_report, store, products, lock))
+
+
+if __name__ == "__main__":
+    main()
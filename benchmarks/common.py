@@ -0,0 +1,55 @@
+"""
+Helpers shared by the benchmark scripts: synthetic catalogs and timing.
+"""
+import random
+import time
+
+from products import Product, NonStockedProduct, LimitedProduct
+from promotions import PercentDiscount, SecondHalfPrice, ThirdOneFree, shared_promotion
+
+
+def create_products(count, seed=42, promotions=False):
+    """
+    Create a synthetic catalog with a mix of all product types.
+
+    :param count: number of products
+    :param seed: seed of the random generator, the same seed creates the same catalog
+    :param promotions: if True, every third product gets one of the three promotion types
+    :return: list of products
+    """
+    rng = random.Random(seed)
+    deals = (shared_promotion(PercentDiscount, "20% off", percent=20),
+             shared_promotion(SecondHalfPrice, "Second one half price"),
+             shared_promotion(ThirdOneFree, "3 for 2"))
+    products = []
+    for number in range(count):
+        name = f"SKU-{number:08d}"
+        price = rng.randint(1, 2000)
+        kind = number % 10
+        if kind == 0:
+            products.append(NonStockedProduct(name, price=price))
+        elif kind == 1:
+            products.append(LimitedProduct(name, price=price, quantity=rng.randint(1, 1000), maximum=1))
+        else:
+            products.append(Product(name, price=price, quantity=rng.randint(1, 1000)))
+        if promotions and number % 3 == 0:
+            products[-1].set_promotion(deals[number // 3 % 3])
+    return products
+
+
+def measure(function, repeat=1):
+    """
+    Run a function and return the best wall clock time in seconds.
+
+    :param function: function without arguments
+    :param repeat: number of runs
+    :return: fastest run in seconds
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
@@ -0,0 +1,253 @@
+"""
+Order simulation for capacity planning: replays a reproducible stream of orders against
+a store at a target rate and reports throughput, latency percentiles, the time at which
+products ran out of stock and the revenue.
+
+    python -m benchmarks.simulation --orders 20000 --rate 2000
+    python -m benchmarks.simulation --mode threads --workers 4 --engine columnar
+    python -m benchmarks.simulation --mode processes --workers 4 --save report.json
+    python -m benchmarks.simulation --catalog catalog.snap --orders-file orders.jsonl
+
+The catalog is synthetic (all product types and promotions, see benchmarks.common) or a
+snapshot file written by Store.save(). The orders are generated from the seed, products
+follow a Zipf distribution (a few hot products get most of the orders), or are read from
+a file with one JSON object per line in the format of POST /order of http_service.py:
+{"items": [{"name": "...", "quantity": 1}, ...]}. --record writes the generated orders
+in that format.
+
+Modes: "single" places the orders from one thread, "threads" from several threads on a
+thread safe store, "processes" on a ShardedStore with one worker process per thread.
+Latency is measured from the time an order was due at the target rate, so it includes
+the waiting when the store can not keep up with the rate.
+"""
+import argparse
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+
+from benchmarks.common import create_products
+from columnar import ColumnarStore
+from money import Money
+from products import NonStockedProduct, LimitedProduct, to_row, from_row
+from sharded_store import ShardedStore
+from store import Store
+
+MODES = ("single", "threads", "processes")
+ENGINES = {"store": Store, "columnar": ColumnarStore}
+
+
+def generate_orders(products, count, seed=42, exponent=1.1, max_lines=5):
+    """
+    Create a reproducible stream of orders. The product of rank k is chosen with a weight
+    of 1 / k ** exponent; the ranks are shuffled, so the hot products are of all types.
+
+    :param products: catalog
+    :param count: number of orders
+    :param seed: seed of the random generator, the same seed creates the same orders
+    :param exponent: skew of the Zipf distribution, 0 for uniform
+    :param max_lines: maximum number of products per order
+    :return: list of orders, each a list of (name, quantity) tuples
+    """
+    rng = random.Random(seed)
+    ranked = list(products)
+    rng.shuffle(ranked)
+    cum_weights = list(itertools.accumulate(1 / rank ** exponent for rank in range(1, len(ranked) + 1)))
+    orders = []
+    for _ in range(count):
+        lines = {}
+        for product in rng.choices(ranked, cum_weights=cum_weights, k=rng.randint(1, max_lines)):
+            quantity = lines.get(product.name, 0) + rng.randint(1, 3)
+            if isinstance(product, LimitedProduct):
+                quantity = min(quantity, product.maximum)
+            lines[product.name] = quantity
+        orders.append(list(lines.items()))
+    return orders
+
+
+def save_orders(orders, path):
+    """Write orders to a file, one JSON object per line (see module docstring)."""
+    with open(path, "w", encoding="utf-8") as file:
+        for order in orders:
+            items = [{"name": name, "quantity": quantity} for name, quantity in order]
+            file.write(json.dumps({"items": items}) + "\n")
+
+
+def load_orders(path):
+    """Read orders written by save_orders(), e.g. recorded traffic of the HTTP service."""
+    with open(path, encoding="utf-8") as file:
+        return [[(item["name"], item["quantity"]) for item in json.loads(line)["items"]]
+                for line in file if line.strip()]
+
+
+def create_store(products, mode="single", engine="store", workers=1):
+    """
+    Create the store of a simulation.
+
+    :param products: catalog
+    :param mode: "single", "threads" or "processes"
+    :param engine: "store" or "columnar", not used in the processes mode
+    :param workers: number of worker processes in the processes mode
+    :return: Store, ColumnarStore or ShardedStore
+    """
+    if mode == "processes":
+        return ShardedStore(products, workers=workers)
+    return ENGINES[engine](products, thread_safe=mode == "threads")
+
+
+def percentiles(values):
+    """Return p50, p90, p99 and max of a list of seconds, in milliseconds."""
+    values = sorted(values)
+    if not values:
+        return {}
+    result = {f"p{percent}": values[min(len(values) - 1, len(values) * percent // 100)] * 1000
+              for percent in (50, 90, 99)}
+    result["max"] = values[-1] * 1000
+    return result
+
+
+def simulate(store, orders, quantities, rate=None, workers=1):
+    """
+    Place the orders on a store from several threads at a target rate.
+
+    :param store: Store, ColumnarStore or ShardedStore
+    :param orders: list of orders, each a list of (name, quantity) tuples
+    :param quantities: dict name -> stock at the start of the stocked products, to find stockouts
+    :param rate: target orders per second over all threads, None for as fast as possible
+    :param workers: number of threads placing orders
+    :return: dict with the results (orders, placed, failed, seconds, orders_per_second,
+             latency_ms, revenue, stockouts: name -> seconds after the start)
+    """
+    products = {}
+    for name in {name for order in orders for name, _ in order}:
+        products[name] = store.get_product(name)
+        if products[name] is None:
+            raise ValueError(f"Product {name} of the orders is not in the catalog.")
+    shopping_lists = [[(products[name], quantity) for name, quantity in order] for order in orders]
+
+    remaining = dict(quantities)
+    stockouts = {}
+    stock_lock = threading.Lock()
+    numbers = itertools.count()  # next() is atomic, so the threads share the orders
+    results = []
+    start = time.perf_counter()
+
+    def work():
+        latencies = []
+        revenue = Money()
+        failed = 0
+        while True:
+            number = next(numbers)
+            if number >= len(orders):
+                break
+            due = start + number / rate if rate else time.perf_counter()
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                total = store.order(shopping_lists[number])
+            except Exception:
+                latencies.append(time.perf_counter() - due)
+                failed += 1
+                continue
+            done = time.perf_counter()
+            latencies.append(done - due)
+            revenue += total
+            with stock_lock:
+                for name, quantity in orders[number]:
+                    if name in remaining:
+                        remaining[name] -= quantity
+                        if remaining[name] == 0:
+                            stockouts[name] = done - start
+        results.append((latencies, revenue, failed))
+
+    if workers == 1:
+        work()
+    else:
+        threads = [threading.Thread(target=work) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    seconds = time.perf_counter() - start
+
+    failed = sum(result[2] for result in results)
+    return {
+        "orders": len(orders),
+        "placed": len(orders) - failed,
+        "failed": failed,
+        "seconds": seconds,
+        "orders_per_second": len(orders) / seconds,
+        "latency_ms": percentiles([latency for result in results for latency in result[0]]),
+        "revenue": float(sum(result[1] for result in results)),
+        "stockouts": dict(sorted(stockouts.items(), key=lambda item: item[1])),
+    }
+
+
+def report(results, rate=None):
+    """Print the results of simulate()."""
+    print(f"orders:      {results['orders']} ({results['placed']} placed, {results['failed']} failed)")
+    target = f" (target {rate:.0f})" if rate else ""
+    print(f"throughput:  {results['orders_per_second']:.0f} orders/s{target} in {results['seconds']:.2f} s")
+    print("latency:     " + ", ".join(f"{name} {value:.3f} ms" for name, value in results["latency_ms"].items()))
+    print(f"revenue:     {results['revenue']:.2f}")
+    stockouts = list(results["stockouts"].items())
+    print(f"stockouts:   {len(stockouts)} products")
+    for name, seconds in stockouts[:5]:
+        print(f"             {name} after {seconds:.3f} s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=10_000, help="size of the synthetic catalog")
+    parser.add_argument("--catalog", help="snapshot file to use instead of the synthetic catalog")
+    parser.add_argument("--stock", type=int, help="quantity of every stocked product, default: the catalog's")
+    parser.add_argument("--orders", type=int, default=20_000, help="number of generated orders")
+    parser.add_argument("--orders-file", help="replay the orders of this file instead")
+    parser.add_argument("--record", help="write the orders to this file")
+    parser.add_argument("--seed", type=int, default=42, help="seed of the catalog and the orders")
+    parser.add_argument("--exponent", type=float, default=1.1, help="skew of the Zipf distribution")
+    parser.add_argument("--rate", type=float, default=0, help="target orders per second, 0 = as fast as possible")
+    parser.add_argument("--mode", choices=MODES, default="single")
+    parser.add_argument("--workers", type=int, default=4, help="threads or processes (not used by single)")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="store", help="not used by processes")
+    parser.add_argument("--save", help="write the settings and results to this JSON file")
+    args = parser.parse_args(argv)
+
+    if args.catalog:
+        # plain copies, so every engine and mode can use them
+        products = [from_row(to_row(product)) for product in Store.load(args.catalog).products]
+    else:
+        products = create_products(args.products, seed=args.seed, promotions=True)
+    if args.stock is not None:
+        for product in products:
+            if not isinstance(product, NonStockedProduct):
+                product.set_quantity(args.stock)
+    orders = load_orders(args.orders_file) if args.orders_file else \
+        generate_orders(products, args.orders, args.seed, args.exponent)
+    if args.record:
+        save_orders(orders, args.record)
+    quantities = {product.name: product.quantity for product in products
+                  if not isinstance(product, NonStockedProduct)}
+
+    workers = 1 if args.mode == "single" else args.workers
+    store = create_store(products, args.mode, args.engine, workers)
+    try:
+        results = simulate(store, orders, quantities, args.rate or None, workers)
+    finally:
+        if isinstance(store, ShardedStore):
+            store.close()
+
+    engine = "sharded" if args.mode == "processes" else args.engine
+    print(f"mode {args.mode}, {workers} worker(s), engine {engine}, {len(products)} products, seed {args.seed}")
+    report(results, args.rate)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump({"settings": vars(args), "results": results}, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
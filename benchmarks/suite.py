@@ -0,0 +1,172 @@
+"""
+Performance suite for the store, the products and the promotions.
+
+Builds synthetic catalogs (1e3 to 1e6 products, mixed product types and promotions)
+and baskets (1 to 10k lines), measures throughput and memory and can save the results
+as a JSON baseline or compare them with an earlier baseline:
+
+    python -m benchmarks.suite --save baseline.json
+    python -m benchmarks.suite --compare baseline.json --threshold 0.2
+
+With --compare the exit code is 1 if a case got slower than the threshold allows.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import create_products
+from products import LimitedProduct, NonStockedProduct
+from promotions import PercentDiscount, SecondHalfPrice, ThirdOneFree, StackedPromotion, BestPromotion
+from store import Store
+
+CATALOG_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+BASKET_SIZES = (1, 10, 100, 1_000, 10_000)
+MIN_SECONDS = 0.2  # every case runs at least this long
+
+
+def ops_per_second(function, operations=1):
+    """
+    Run a function repeatedly for at least MIN_SECONDS.
+
+    :param function: function without arguments
+    :param operations: number of operations done by one call
+    :return: operations per second
+    """
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        function()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SECONDS:
+            return calls * operations / elapsed
+
+
+def create_catalog(size):
+    """Create a store with plenty of stock, and return it with the time and memory needed."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    products = create_products(size, promotions=True)
+    for product in products:
+        if not isinstance(product, NonStockedProduct):
+            product.set_quantity(10 ** 12)
+    store = Store(products)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return store, products, {"seconds": elapsed, "bytes_per_product": current / size, "peak_bytes": peak}
+
+
+def create_basket(products, lines, rng):
+    """Create a basket with random lines; a LimitedProduct appears at most once."""
+    basket = []
+    limited = set()
+    while len(basket) < lines:
+        product = products[rng.randrange(len(products))]
+        if isinstance(product, LimitedProduct):
+            if product in limited:
+                continue
+            limited.add(product)
+            basket.append((product, 1))
+        else:
+            basket.append((product, rng.randint(1, 3)))
+    return basket
+
+
+def run(catalog_sizes, basket_sizes):
+    """Run all cases and return the results as a dict: case name -> values."""
+    results = {}
+    rng = random.Random(42)
+    for size in catalog_sizes:
+        store, products, build = create_catalog(size)
+        results[f"catalog.build[{size}]"] = {"ops_per_second": size / build["seconds"],
+                                             "bytes_per_product": build["bytes_per_product"],
+                                             "peak_bytes": build["peak_bytes"]}
+        results[f"store.get_all_products[{size}]"] = {"ops_per_second": ops_per_second(store.get_all_products)}
+        results[f"store.get_total_quantity[{size}]"] = {"ops_per_second": ops_per_second(store.get_total_quantity)}
+        for lines in basket_sizes:
+            basket = create_basket(products, lines, rng)
+            results[f"store.order[{size}x{lines}]"] = {
+                "ops_per_second": ops_per_second(lambda: store.order(basket)),
+                "lines_per_second": ops_per_second(lambda: store.order(basket), operations=lines),
+            }
+        del store, products
+
+    product = create_products(10)[2]
+    product.set_quantity(10 ** 12)
+    results["product.buy"] = {"ops_per_second": ops_per_second(lambda: product.buy(1))}
+    for promotion in (PercentDiscount("20% off", percent=20),
+                      SecondHalfPrice("Second one half price"),
+                      ThirdOneFree("3 for 2"),
+                      StackedPromotion("10 discounts", [PercentDiscount(f"{n}% off", percent=n)
+                                                        for n in range(1, 11)]),
+                      BestPromotion("best of 3", [PercentDiscount("20% off", percent=20),
+                                                  SecondHalfPrice("Second one half price"),
+                                                  ThirdOneFree("3 for 2")])):
+        name = type(promotion).__name__
+        results[f"promotion.{name}"] = {
+            "ops_per_second": ops_per_second(lambda: promotion.apply_promotion(product, 5))}
+        prices = [rng.randint(1, 2000) for _ in range(10_000)]
+        quantities = [rng.randint(1, 20) for _ in range(10_000)]
+        results[f"promotion.{name}.batch[10000]"] = {
+            "ops_per_second": ops_per_second(lambda: promotion.apply_promotion_batch(prices, quantities),
+                                             operations=10_000)}
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the change of every case against a baseline.
+
+    :return: list of case names that are slower than the threshold allows
+    """
+    regressions = []
+    for case, values in results.items():
+        old = baseline.get(case)
+        if old is None:
+            print(f"{case:45} {values['ops_per_second']:14.0f} ops/s   (new)")
+            continue
+        change = values["ops_per_second"] / old["ops_per_second"] - 1
+        marker = ""
+        if change < -threshold:
+            marker = "  REGRESSION"
+            regressions.append(case)
+        print(f"{case:45} {values['ops_per_second']:14.0f} ops/s   {change:+7.1%}{marker}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare the results with this JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown (0.2 = 20%%)")
+    parser.add_argument("--max-products", type=int, default=CATALOG_SIZES[-1], help="largest catalog size")
+    parser.add_argument("--max-lines", type=int, default=BASKET_SIZES[-1], help="largest basket size")
+    args = parser.parse_args(argv)
+
+    results = run([size for size in CATALOG_SIZES if size <= args.max_products],
+                  [lines for lines in BASKET_SIZES if lines <= args.max_lines])
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+        if compare(results, baseline, args.threshold):
+            exit_code = 1
+    else:
+        for case, values in results.items():
+            print(f"{case:45} {values['ops_per_second']:14.0f} ops/s")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "results": results}, file, indent=2)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+Secondary indexes over the products of a store, used by Store.find().
+
+Prices and quantities are kept in sorted lists of (value, name) pairs, so a range is
+found with two binary searches. Promotions and product classes are kept in dicts.
+The indexes follow every change of a product, so a query never scans the whole
+catalog. Changes of the sorted lists are collected and merged into the list by the
+next query, so an order only pays a dict update per line, not a list insert.
+Non-stocked products have no quantity and are not in the quantity index.
+
+LowStockWatches finds the watches whose threshold a quantity change crossed,
+also with a binary search.
+"""
+from bisect import bisect_left, bisect_right, insort
+
+from products import NonStockedProduct
+
+
+class _AfterAll:
+    """Compares greater than every name or id, so (value, _AFTER_ALL) ends the entries of a value."""
+    __slots__ = ()
+
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+
+_AFTER_ALL = _AfterAll()
+
+
+def _remove(index, value, name):
+    """Remove a (value, name) pair from a sorted list."""
+    position = bisect_left(index, (value, name))
+    if position < len(index) and index[position] == (value, name):
+        del index[position]
+
+
+# value of a product that is not in a sorted index yet
+_MISSING = object()
+
+# up to this many changes are merged one by one, more changes re-sort the list
+_MERGE_ONE_BY_ONE = 32
+
+
+class _SortedIndex:
+    """Sorted (value, name) pairs of one product field, with pending changes."""
+    __slots__ = ("field", "_pairs", "_pending")
+
+    def __init__(self, field, products):
+        self.field = field
+        self._pairs = sorted((getattr(product, field), product.name) for product in products)
+        self._pending = {}  # name -> (value in _pairs or _MISSING, product or None if removed)
+
+    def _listed(self, name, value):
+        pending = self._pending.get(name)
+        return pending[0] if pending is not None else value
+
+    def add(self, product) -> None:
+        self._pending[product.name] = (self._listed(product.name, _MISSING), product)
+
+    def remove(self, product) -> None:
+        name = product.name
+        self._pending[name] = (self._listed(name, getattr(product, self.field)), None)
+
+    def changed(self, product, old_value) -> None:
+        self._pending[product.name] = (self._listed(product.name, old_value), product)
+
+    def pairs(self):
+        """Return the sorted list after merging the pending changes."""
+        pending = self._pending
+        if not pending:
+            return self._pairs
+        pairs = self._pairs
+        if len(pending) <= _MERGE_ONE_BY_ONE:
+            for name, (listed, product) in pending.items():
+                if listed is not _MISSING:
+                    _remove(pairs, listed, name)
+                if product is not None:
+                    insort(pairs, (getattr(product, self.field), name))
+        else:
+            pairs = [pair for pair in pairs if pair[1] not in pending]
+            pairs.extend(sorted((getattr(product, self.field), name)
+                                for name, (_, product) in pending.items() if product is not None))
+            pairs.sort()  # merges the two sorted runs in linear time
+            self._pairs = pairs
+        pending.clear()
+        return pairs
+
+
+class CatalogIndex:
+    """Sorted and hashed indexes of the products of a store."""
+
+    def __init__(self, products=()):
+        products = list(products)
+        self._by_price = _SortedIndex("price", products)
+        self._by_quantity = _SortedIndex("quantity", [product for product in products
+                                                      if not isinstance(product, NonStockedProduct)])
+        self._by_promotion = {}  # promotion -> {name: None}
+        self._by_kind = {}  # product class -> {name: None}
+        for product in products:
+            self._add_to_dicts(product)
+
+    def add(self, product) -> None:
+        self._by_price.add(product)
+        if not isinstance(product, NonStockedProduct):
+            self._by_quantity.add(product)
+        self._add_to_dicts(product)
+
+    def _add_to_dicts(self, product):
+        name = product.name
+        if product.promotion is not None:
+            self._by_promotion.setdefault(product.promotion, {})[name] = None
+        self._by_kind.setdefault(type(product), {})[name] = None
+
+    def remove(self, product) -> None:
+        name = product.name
+        self._by_price.remove(product)
+        if not isinstance(product, NonStockedProduct):
+            self._by_quantity.remove(product)
+        if product.promotion is not None:
+            self._discard(self._by_promotion, product.promotion, name)
+        self._discard(self._by_kind, type(product), name)
+
+    def update(self, product, field, old_value) -> None:
+        """Move a product in the index of a changed field."""
+        name = product.name
+        if field == "price":
+            self._by_price.changed(product, old_value)
+        elif field == "quantity" and not isinstance(product, NonStockedProduct):
+            self._by_quantity.changed(product, old_value)
+        elif field == "promotion":
+            if old_value is not None:
+                self._discard(self._by_promotion, old_value, name)
+            if product.promotion is not None:
+                self._by_promotion.setdefault(product.promotion, {})[name] = None
+
+    @staticmethod
+    def _discard(index, key, name):
+        names = index.get(key)
+        if names is not None:
+            names.pop(name, None)
+            if not names:
+                del index[key]
+
+    def candidates(self, price_between=None, quantity_below=None, promotion=None, kind=None):
+        """
+        Return the names of the smallest index result of the given filters.
+        The other filters still have to be checked on the products.
+
+        :return: list of names, or None if no filter was given
+        """
+        results = []
+        if price_between is not None:
+            low, high = price_between
+            prices = self._by_price.pairs()
+            start = bisect_left(prices, (low,))
+            end = bisect_right(prices, (high, _AFTER_ALL))
+            results.append([name for _, name in prices[start:end]])
+        if quantity_below is not None:
+            quantities = self._by_quantity.pairs()
+            end = bisect_left(quantities, (quantity_below,))
+            results.append([name for _, name in quantities[:end]])
+        if promotion is not None:
+            if isinstance(promotion, type):
+                # a promotion class matches all promotions of that class
+                results.append([name for key, names in self._by_promotion.items()
+                                if isinstance(key, promotion) for name in names])
+            else:
+                results.append(list(self._by_promotion.get(promotion, ())))
+        if kind is not None:
+            results.append([name for key, names in self._by_kind.items()
+                            if issubclass(key, kind) for name in names])
+        return min(results, key=len) if results else None
+
+    @staticmethod
+    def matches(product, price_between=None, quantity_below=None, promotion=None, kind=None):
+        """Return True if a product passes all given filters (see Store.find())."""
+        if price_between is not None and not price_between[0] <= product.price <= price_between[1]:
+            return False
+        if quantity_below is not None and (isinstance(product, NonStockedProduct) or
+                                           product.quantity >= quantity_below):
+            return False
+        if promotion is not None:
+            if isinstance(promotion, type):
+                if not isinstance(product.promotion, promotion):
+                    return False
+            elif product.promotion is not promotion:
+                return False
+        return kind is None or isinstance(product, kind)
+
+
+class LowStockWatches:
+    """Callbacks that are called when the quantity of a product falls below a threshold."""
+
+    def __init__(self):
+        self._thresholds = []  # sorted (threshold, watch id)
+        self._callbacks = {}  # watch id -> (threshold, callback)
+        self._next_id = 1
+
+    def __bool__(self):
+        return bool(self._callbacks)
+
+    def add(self, threshold, callback):
+        """
+        :param threshold: the callback is called when the quantity changes from >= threshold to < threshold
+        :param callback: callable taking the product
+        :return: id of the watch, for remove()
+        """
+        watch_id = self._next_id
+        self._next_id += 1
+        insort(self._thresholds, (threshold, watch_id))
+        self._callbacks[watch_id] = (threshold, callback)
+        return watch_id
+
+    def remove(self, watch_id) -> None:
+        threshold, _ = self._callbacks.pop(watch_id)
+        _remove(self._thresholds, threshold, watch_id)
+
+    def crossed(self, old_quantity, new_quantity):
+        """Return the callbacks of all thresholds with new_quantity < threshold <= old_quantity."""
+        if new_quantity >= old_quantity:
+            return []
+        start = bisect_right(self._thresholds, (new_quantity, _AFTER_ALL))
+        end = bisect_right(self._thresholds, (old_quantity, _AFTER_ALL))
+        return [self._callbacks[watch_id][1] for _, watch_id in self._thresholds[start:end]]
@@ -0,0 +1,182 @@
+"""
+Change feed of a store, for downstream systems like search, pricing and reporting.
+
+A store with an attached ChangeFeed publishes one small event per change:
+
+- "quantity", "active", "price", "promotion": the new value of a product field
+  (Product.buy, set_quantity, activate/deactivate, set_promotion, ...)
+- "add": the new product as a tuple (see products.to_row)
+- "remove": the name of the removed product
+
+Events carry the new value, not a difference, so applying an event twice is harmless.
+The feed keeps the last `capacity` events in a ring buffer. Every event has an offset
+that only grows; subscribers read from their own offset and only pay for the changes,
+not for the size of the catalog. A subscriber that falls behind by more than the
+capacity gets a FeedOverrunError and has to copy the store again.
+
+A Replica keeps a copy of a store in sync by applying the events.
+"""
+import threading
+
+from products import to_row, from_row
+from store import Store
+
+
+class FeedOverrunError(Exception):
+    """The events at the requested offset were already overwritten."""
+
+
+class Change:
+    """One event of a change feed."""
+    __slots__ = ("offset", "kind", "name", "value")
+
+    def __init__(self, offset, kind, name, value):
+        self.offset = offset
+        self.kind = kind  # "quantity", "active", "price", "promotion", "add" or "remove"
+        self.name = name  # name of the product
+        self.value = value  # new value, the to_row() tuple for "add", None for "remove"
+
+    def __repr__(self):
+        return f"Change({self.offset}, {self.kind!r}, {self.name!r}, {self.value!r})"
+
+
+class ChangeFeed:
+    """Bounded ring buffer of change events."""
+
+    def __init__(self, capacity=65_536):
+        """
+        :param capacity: number of events kept for subscribers
+        """
+        if not isinstance(capacity, int) or capacity <= 0:
+            raise ValueError("capacity must be a positive integer.")
+        self.capacity = capacity
+        self._events = [None] * capacity
+        self._end = 0  # offset of the next event
+        self._lock = threading.Lock()
+
+    @property
+    def end(self):
+        """Offset of the next event; a subscriber starting here gets all future events."""
+        return self._end
+
+    @property
+    def start(self):
+        """Offset of the oldest event still in the buffer."""
+        return max(0, self._end - self.capacity)
+
+    def publish(self, kind, name, value=None) -> None:
+        """Append an event. Called by the store."""
+        with self._lock:
+            offset = self._end
+            self._events[offset % self.capacity] = Change(offset, kind, name, value)
+            self._end = offset + 1
+
+    def read(self, offset, limit=None):
+        """
+        Return the events from an offset on.
+
+        :param offset: offset of the first event
+        :param limit: maximum number of events, None for all available
+        :return: list of Change objects (empty if there is no new event)
+        :raises FeedOverrunError: if the events at offset were already overwritten
+        """
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError("offset must be a non-negative integer.")
+        with self._lock:
+            end = self._end
+            if offset < end - self.capacity:
+                raise FeedOverrunError(f"Offset {offset} was overwritten, the oldest event is "
+                                       f"{end - self.capacity}.")
+            if limit is not None:
+                end = min(end, offset + limit)
+            if offset >= end:
+                return []
+            events, capacity = self._events, self.capacity
+            first, last = offset % capacity, end % capacity
+            if first < last:
+                return events[first:last]
+            return events[first:] + events[:last]
+
+    def subscribe(self, offset=None):
+        """
+        :param offset: first offset to read, None for the end (only future events)
+        :return: Subscription
+        """
+        return Subscription(self, self.end if offset is None else offset)
+
+
+class Subscription:
+    """Reader of a change feed that remembers its offset."""
+
+    def __init__(self, feed, offset):
+        self.feed = feed
+        self.offset = offset
+
+    def poll(self, limit=None):
+        """
+        Return the events published since the last poll and move the offset past them.
+
+        :param limit: maximum number of events
+        :raises FeedOverrunError: if the subscriber fell behind by more than the feed capacity
+        """
+        events = self.feed.read(self.offset, limit)
+        if events:
+            self.offset = events[-1].offset + 1
+        return events
+
+
+class Replica:
+    """Copy of a store that is kept in sync with the change feed of the store."""
+
+    def __init__(self, source, thread_safe=False):
+        """
+        Copy the products of a store and subscribe to its change feed.
+
+        :param source: Store with an attached ChangeFeed (see Store.attach_feed)
+        :param thread_safe: passed on to the Store of the replica
+        """
+        if source.feed is None:
+            raise ValueError("The source store has no change feed, see Store.attach_feed().")
+        self.source = source
+        self.thread_safe = thread_safe
+        self.store = None
+        self.subscription = None
+        self.resync()
+
+    def resync(self) -> None:
+        """Copy the whole source store again, e.g. after falling behind the feed."""
+        # subscribe before copying: changes made during the copy are applied again, which is harmless
+        subscription = self.source.feed.subscribe()
+        self.store = Store([from_row(to_row(product)) for product in self.source.products],
+                           thread_safe=self.thread_safe)
+        self.subscription = subscription
+
+    def sync(self, limit=None):
+        """
+        Apply the events published since the last sync.
+
+        :param limit: maximum number of events to apply
+        :return: number of applied events; after a FeedOverrunError the store is copied again and 0 is returned
+        """
+        try:
+            events = self.subscription.poll(limit)
+        except FeedOverrunError:
+            self.resync()
+            return 0
+        for change in events:
+            self.apply(change)
+        return len(events)
+
+    def apply(self, change) -> None:
+        """Apply one event to the store of the replica."""
+        store = self.store
+        product = store.get_product(change.name)
+        if change.kind == "add":
+            if product is not None:
+                store.remove_product(product)
+            store.add_product(from_row(change.value))
+        elif change.kind == "remove":
+            if product is not None:
+                store.remove_product(product)
+        elif product is not None:
+            setattr(product, change.kind, change.value)
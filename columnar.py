@@ -0,0 +1,381 @@
+import sys
+from array import array
+from contextlib import nullcontext
+
+from locks import stock_locks
+from optional_numpy import numpy_or_none
+from products import Product, NonStockedProduct, LimitedProduct, validate_product_values, to_row
+from store import Store
+
+# values of the kind column
+PRODUCT = 0
+NON_STOCKED = 1
+LIMITED = 2
+
+# values of the active column
+INACTIVE = 0
+ACTIVE = 1
+REMOVED = -1
+
+
+class ColumnarInventory:
+    """Inventory stored as parallel columns instead of one object per product.
+    A row holds name, price, quantity, active flag, kind, maximum and promotion id.
+    Products are only created as lightweight views when they are accessed.
+    The columns may also be memoryviews of a snapshot file (see snapshot.py);
+    they are copied into arrays the first time a row is added or removed.
+    """
+
+    def __init__(self):
+        self.names = []  # row -> interned name
+        self._index = {}  # name -> row, None until needed for a snapshot
+        self.prices = array("d")
+        self.quantities = array("q")
+        self.active = array("b")
+        self.kinds = array("b")
+        self.maximums = array("q")
+        self.promotion_ids = array("i")  # -1 = no promotion
+        self.promotions = []  # promotion id -> promotion
+        self._promotion_ids = {}  # promotion -> promotion id
+        self.observers = []  # notified about changes of any row
+        self.versions = {}  # row -> version, only rows that were changed
+        self._removed = 0  # number of removed rows
+
+    def __len__(self):
+        return len(self.kinds) - self._removed
+
+    @property
+    def index(self):
+        """Dictionary name -> row of all products that were not removed."""
+        if self._index is None:
+            self._index = {self.names[row]: row for row in self.rows()}
+        return self._index
+
+    def find(self, name):
+        """
+        Return the row of a product.
+
+        :param name: name of the product
+        :return: row number or None if there is no product with this name
+        """
+        if self._index is not None:
+            return self._index.get(name)
+        row = self.names.find(name)
+        if row is None or self.active[row] == REMOVED:
+            return None
+        return row
+
+    def add_row(self, name, price, quantity=0, kind=PRODUCT, maximum=0, promotion=None):
+        """
+        Append a product as a new row.
+
+        :param name: unique name of the product
+        :param price: price of the product
+        :param quantity: stock (always 0 for NON_STOCKED)
+        :param kind: PRODUCT, NON_STOCKED or LIMITED
+        :param maximum: maximum per order (LIMITED only)
+        :param promotion: promotion or None
+        :return: row number
+        """
+        if kind == NON_STOCKED:
+            quantity = 0
+        validate_product_values(name, price, quantity)
+        if kind not in (PRODUCT, NON_STOCKED, LIMITED):
+            raise ValueError("Unknown product kind.")
+        if self.find(name) is not None:
+            raise ValueError(f"Product {name} already exists in the store.")
+        self._make_growable()
+        row = len(self.names)
+        name = sys.intern(name)
+        self.names.append(name)
+        self._index[name] = row
+        self.prices.append(price)
+        self.quantities.append(quantity)
+        self.active.append(ACTIVE)
+        self.kinds.append(kind)
+        self.maximums.append(maximum)
+        self.promotion_ids.append(self.promotion_id(promotion))
+        return row
+
+    def add_product(self, product):
+        """
+        Copy a Product into a new row.
+
+        :param product: Product, NonStockedProduct or LimitedProduct
+        :return: row number
+        """
+        if isinstance(product, NonStockedProduct):
+            kind, maximum = NON_STOCKED, 0
+        elif isinstance(product, LimitedProduct):
+            kind, maximum = LIMITED, product.maximum
+        else:
+            kind, maximum = PRODUCT, 0
+        row = self.add_row(product.name, product.price, product.quantity, kind, maximum, product.promotion)
+        self.active[row] = ACTIVE if product.active else INACTIVE
+        return row
+
+    def remove_row(self, row):
+        """Mark a row as removed. Row numbers of other products do not change."""
+        del self.index[self.names[row]]
+        self.active[row] = REMOVED
+        self.quantities[row] = 0
+        self._removed += 1
+
+    def promotion_id(self, promotion):
+        """Return the id of a promotion, adding it to the promotion table if needed."""
+        if promotion is None:
+            return -1
+        promotion_id = self._promotion_ids.get(promotion)
+        if promotion_id is None:
+            promotion_id = len(self.promotions)
+            self.promotions.append(promotion)
+            self._promotion_ids[promotion] = promotion_id
+        return promotion_id
+
+    def view(self, row):
+        """Return a Product view of a row."""
+        view = object.__new__(_VIEW_CLASSES[self.kinds[row]])
+        view._inventory = self
+        view._row = row
+        return view
+
+    def total_quantity(self):
+        """Sum of the quantity column."""
+        np = numpy_or_none()
+        if np is not None:
+            return int(np.frombuffer(self.quantities, dtype=np.int64).sum())
+        return sum(self.quantities)
+
+    def active_rows(self):
+        """Row numbers of all active products, in row order."""
+        np = numpy_or_none()
+        if np is not None:
+            return np.flatnonzero(np.frombuffer(self.active, dtype=np.int8) == ACTIVE).tolist()
+        return [row for row, flag in enumerate(self.active) if flag == ACTIVE]
+
+    def rows(self):
+        """Row numbers of all products that were not removed, in row order."""
+        if self._index is not None:
+            return list(self._index.values())
+        if not self._removed:
+            return list(range(len(self.kinds)))
+        return [row for row, flag in enumerate(self.active) if flag != REMOVED]
+
+    def _make_growable(self):
+        """Copy columns that are memoryviews of a snapshot into arrays, so rows can be added."""
+        if isinstance(self.names, list):
+            return
+        self.index  # build the name index before the names are replaced
+        self.names = [sys.intern(self.names[row]) for row in range(len(self.kinds))]
+        for column in ("prices", "quantities", "active", "kinds", "maximums", "promotion_ids"):
+            values = getattr(self, column)
+            setattr(self, column, array(values.format, values.tobytes()))
+
+
+class _RowView:
+    """Makes a product class read and write its values from a row of a ColumnarInventory."""
+    __slots__ = ()
+
+    @property
+    def _observers(self):
+        # all views of an inventory share its observers
+        return self._inventory.observers
+
+    @property
+    def name(self):
+        return self._inventory.names[self._row]
+
+    @property
+    def version(self):
+        return self._inventory.versions.get(self._row, 0)
+
+    def _changed(self):
+        """Increase the version of the row."""
+        versions = self._inventory.versions
+        versions[self._row] = versions.get(self._row, 0) + 1
+
+    @property
+    def price(self):
+        price = self._inventory.prices[self._row]
+        # the column stores floats, give whole prices back as int like the original product
+        return int(price) if price.is_integer() else price
+
+    @price.setter
+    def price(self, price):
+        prices = self._inventory.prices
+        old_price = prices[self._row]
+        prices[self._row] = price
+        self._changed()
+        if self._inventory.observers and old_price != price:
+            self._notify("price", old_price)
+
+    @property
+    def quantity(self):
+        return self._inventory.quantities[self._row]
+
+    @quantity.setter
+    def quantity(self, quantity):
+        quantities = self._inventory.quantities
+        old_quantity = quantities[self._row]
+        quantities[self._row] = quantity
+        self._changed()
+        if self._inventory.observers and old_quantity != quantity:
+            self._notify("quantity", old_quantity)
+
+    @property
+    def active(self):
+        return self._inventory.active[self._row] == ACTIVE
+
+    @active.setter
+    def active(self, active):
+        flags = self._inventory.active
+        old_active = flags[self._row] == ACTIVE
+        flags[self._row] = ACTIVE if active else INACTIVE
+        self._changed()
+        if self._inventory.observers and old_active != active:
+            self._notify("active", old_active)
+
+    @property
+    def promotion(self):
+        promotion_id = self._inventory.promotion_ids[self._row]
+        return self._inventory.promotions[promotion_id] if promotion_id >= 0 else None
+
+    @promotion.setter
+    def promotion(self, promotion):
+        old_promotion = self.promotion
+        self._inventory.promotion_ids[self._row] = self._inventory.promotion_id(promotion)
+        self._changed()
+        if self._inventory.observers and old_promotion is not promotion:
+            self._notify("promotion", old_promotion)
+
+    def __eq__(self, other):
+        return (isinstance(other, _RowView) and
+                other._inventory is self._inventory and other._row == self._row)
+
+    def __hash__(self):
+        return hash((id(self._inventory), self._row))
+
+
+class ProductView(_RowView, Product):
+    """Product stored in a ColumnarInventory row."""
+    __slots__ = ("_inventory", "_row")
+
+
+class NonStockedProductView(_RowView, NonStockedProduct):
+    """NonStockedProduct stored in a ColumnarInventory row."""
+    __slots__ = ("_inventory", "_row")
+
+
+class LimitedProductView(_RowView, LimitedProduct):
+    """LimitedProduct stored in a ColumnarInventory row."""
+    __slots__ = ("_inventory", "_row")
+
+    @property
+    def maximum(self):
+        return self._inventory.maximums[self._row]
+
+
+_VIEW_CLASSES = {PRODUCT: ProductView, NON_STOCKED: NonStockedProductView, LIMITED: LimitedProductView}
+
+
+class ColumnarStore(Store):
+    """Store backed by a ColumnarInventory.
+    add_product() copies a product into the inventory; afterwards the store works with
+    views of the rows, which get_product(), products and get_all_products() return.
+    The active filter is computed on the columns. The total quantity is summed on the
+    column when it is first needed and then kept up to date like in Store.
+    """
+
+    def __init__(self, products=None, inventory=None, thread_safe=False, quote_cache_size=10_000):
+        """
+        Initialize the store with a list of products or an existing inventory.
+
+        :param products: list of Product objects to copy into the inventory
+        :param inventory: ColumnarInventory to use, a new one if None
+        :param thread_safe: if True, orders may be placed from several threads at once
+        :param quote_cache_size: number of priced lines kept for quote() and order() (0 = no cache)
+        """
+        self.inventory = inventory if inventory is not None else ColumnarInventory()
+        super().__init__(products if products is not None else [], thread_safe, quote_cache_size)
+        # not summed yet: opening a large snapshot should not read the whole quantity column
+        self._total_quantity = None
+        self.inventory.observers.append(self._on_product_changed)
+
+    @property
+    def products(self):
+        """List of all products in the store (active and inactive)."""
+        return [self.inventory.view(row) for row in self.inventory.rows()]
+
+    def add_product(self, product):
+        """Copy a product into the inventory"""
+        if not isinstance(product, Product):
+            raise TypeError("All items must be Product objects.")
+        with self.versions.lock, self._index_lock:
+            row = self.inventory.add_product(product)
+            if self._total_quantity is not None:
+                self._total_quantity += self.inventory.quantities[row]
+            if self._catalog_index is not None:
+                self._catalog_index.add(self.inventory.view(row))
+            if self.versions.enabled:
+                self.versions.added(self.inventory.view(row))
+            if self.feed is not None:
+                self.feed.publish("add", product.name, to_row(product))
+
+    def remove_product(self, product):
+        """Remove a product from the inventory"""
+        name = getattr(product, "name", None)
+        with self.versions.lock, self._index_lock:
+            row = self.inventory.find(name)
+            if row is None or product != self.inventory.view(row):
+                raise ValueError("Product not found in the list.")
+            if self._catalog_index is not None:
+                self._catalog_index.remove(self.inventory.view(row))
+            if self.versions.enabled:
+                self.versions.removed(self.inventory.view(row))
+            if self.feed is not None:
+                self.feed.publish("remove", name)
+            if self._total_quantity is not None:
+                self._total_quantity -= self.inventory.quantities[row]
+            self.inventory.remove_row(row)
+
+    def get_product(self, name):
+        """
+        Look up a product by its name.
+
+        :param name: name of the product
+        :return: view of the product or None if the store has no product with this name
+        """
+        row = self.inventory.find(name)
+        return self.inventory.view(row) if row is not None else None
+
+    def get_total_quantity(self):
+        """Returns the sum of all Products."""
+        total = self._total_quantity
+        if total is None:
+            # every stock lock is held, so no order changes the column between the sum
+            # and the first update by _update_indexes()
+            with stock_locks.acquire_every() if self.thread_safe else nullcontext(), self._index_lock:
+                if self._total_quantity is None:
+                    self._total_quantity = self.inventory.total_quantity()
+                total = self._total_quantity
+        return total
+
+    def get_all_products(self):
+        """Returns a list of all active products"""
+        return [self.inventory.view(row) for row in self.inventory.active_rows()]
+
+    def _iter_entries(self, after):
+        """Yield (row, view) of the products in rows after a cursor; rows never move."""
+        inventory = self.inventory
+        row = 0 if after is None else after + 1
+        while row < len(inventory.kinds):
+            if inventory.active[row] != REMOVED:
+                yield row, inventory.view(row)
+            row += 1
+
+    def _update_indexes(self, product, field, old_value):
+        """Keep the total quantity up to date; the active filter is computed on the columns."""
+        if field == "quantity":
+            with self._index_lock:
+                if self._total_quantity is not None:
+                    self._total_quantity += product.quantity - old_value
@@ -0,0 +1,347 @@
+"""
+HTTP/JSON service for a store, built on asyncio streams (standard library only).
+
+Endpoints:
+
+- GET  /products          all active products
+- GET  /products/<name>   one product (URL-encoded name)
+- GET  /total             total quantity of the store
+- POST /quote             price a shopping list without ordering it
+- POST /order             order a shopping list
+- POST /orders            order many shopping lists with one request
+
+A shopping list is a JSON list of {"name": ..., "quantity": ...} objects; /quote and
+/order take {"items": [...]}, /orders takes {"orders": [[...], [...]]}. Amounts of
+money are returned as strings like "1160.00", so they stay exact.
+
+Connections are kept alive (HTTP/1.1), so a client can send many requests over one
+connection. Orders of all connections go through an AsyncStore and are committed in
+batches. The JSON of every product is cached together with the product's version,
+so a product list only serializes the products that changed since the last request.
+
+Run `python http_service.py [port]` to serve the store of main.py.
+"""
+import asyncio
+import json
+from urllib.parse import unquote
+
+from async_store import AsyncStore
+from money import Money
+from products import LimitedProduct
+
+MAX_BODY = 1 << 20  # largest accepted request body in bytes
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            409: "Conflict", 413: "Payload Too Large"}
+
+
+class HttpError(Exception):
+    """Error that is answered with an HTTP status code and a JSON error message."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def product_json(product):
+    """Return the values shown by Product.show() as a JSON-serializable dict."""
+    data = {
+        "name": product.name,
+        "price": product.price,
+        "quantity": product.quantity,
+        "active": product.active,
+        "promotion": product.promotion.name if product.promotion else None,
+    }
+    if isinstance(product, LimitedProduct):
+        data["maximum"] = product.maximum
+    return data
+
+
+class OrderService:
+    """HTTP/JSON front-end for a Store (see module docstring)."""
+
+    def __init__(self, store, max_queue=1000, batch_size=100, keep_alive_timeout=15):
+        """
+        :param store: the Store to serve
+        :param max_queue: maximum number of waiting orders (see AsyncStore)
+        :param batch_size: maximum number of orders committed in one batch
+        :param keep_alive_timeout: seconds an idle connection is kept open
+        """
+        self.store = store
+        self.async_store = AsyncStore(store, max_queue=max_queue, batch_size=batch_size)
+        self.keep_alive_timeout = keep_alive_timeout
+        self._fragments = {}  # product -> (version, JSON bytes)
+        self._prune_at = 1024  # size of _fragments at which removed products are dropped
+        self._server = None
+
+    async def start(self, host="127.0.0.1", port=8000):
+        """
+        Start listening.
+
+        :param port: TCP port, 0 for any free port
+        :return: the port the service listens on
+        """
+        self.async_store.start()
+        self._server = await asyncio.start_server(self._serve_connection, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        """Stop listening and wait for the queued orders."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        await self.async_store.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+    async def serve_forever(self, host="127.0.0.1", port=8000):
+        await self.start(host, port)
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _serve_connection(self, reader, writer):
+        """Answer the requests of one connection until the client closes it."""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), self.keep_alive_timeout)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    break
+                except HttpError as e:
+                    # the rest of a malformed request can not be skipped, answer and close
+                    writer.write(self._response(e.status, self._error(e), False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, body, keep_alive = request
+                try:
+                    status, payload = 200, await self.handle(method, path, body)
+                except HttpError as e:
+                    status, payload = e.status, self._error(e)
+                writer.write(self._response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader):
+        """
+        Read one request.
+
+        :return: (method, path, body, keep_alive) or None if the connection was closed
+        :raises HttpError: for a malformed request
+        """
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, path, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "Malformed request line.")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length.")
+        if length < 0:
+            raise HttpError(400, "Invalid Content-Length.")
+        if length > MAX_BODY:
+            raise HttpError(413, "Request body too large.")
+        body = await reader.readexactly(length) if length else b""
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        return method, path, body, keep_alive
+
+    @staticmethod
+    def _error(error):
+        return json.dumps({"error": str(error)}).encode()
+
+    @staticmethod
+    def _response(status, payload, keep_alive):
+        head = (f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        return head.encode("latin-1") + payload
+
+    async def handle(self, method, path, body):
+        """
+        Answer one request.
+
+        :param method: "GET" or "POST"
+        :param path: request path, e.g. "/products"
+        :param body: request body (bytes)
+        :return: JSON response body (bytes)
+        :raises HttpError: for unknown paths and invalid requests
+        """
+        path = path.split("?", 1)[0]
+        if method == "GET":
+            if path == "/products":
+                return self.products_json()
+            if path.startswith("/products/"):
+                return self._fragment(self._product(unquote(path[len("/products/"):])))
+            if path == "/total":
+                return json.dumps({"total_quantity": self.store.get_total_quantity()}).encode()
+        elif method == "POST":
+            if path == "/quote":
+                shopping_list = self._shopping_list(self._json(body, "items"))
+                lines = self.store.quote(shopping_list)
+                return json.dumps({"lines": [str(line) for line in lines],
+                                   "total": str(sum(lines, Money()))}).encode()
+            if path == "/order":
+                shopping_list = self._shopping_list(self._json(body, "items"))
+                try:
+                    total = await self.async_store.order(shopping_list)
+                except Exception as e:
+                    raise HttpError(409, str(e)) from e
+                return json.dumps({"total": str(total)}).encode()
+            if path == "/orders":
+                orders = self._json(body, "orders")
+                if not isinstance(orders, list):
+                    raise HttpError(400, "orders must be a list of shopping lists.")
+                shopping_lists = [self._shopping_list(items) for items in orders]
+                results = await asyncio.gather(*(self.async_store.order(shopping_list)
+                                                 for shopping_list in shopping_lists),
+                                               return_exceptions=True)
+                return json.dumps({"results": [{"error": str(result)} if isinstance(result, Exception)
+                                               else {"total": str(result)} for result in results]}).encode()
+        if path in ("/products", "/total", "/quote", "/order", "/orders") or path.startswith("/products/"):
+            raise HttpError(405, f"{method} is not allowed for {path}.")
+        raise HttpError(404, f"Unknown path {path}.")
+
+    def products_json(self):
+        """Return the JSON list of all active products, built from the cached fragments."""
+        fragment = self._fragment
+        return b"[" + b",".join([fragment(product) for product in self.store.get_all_products()]) + b"]"
+
+    def _fragment(self, product):
+        """Return the JSON of a product, serialized again only if the product changed."""
+        version = product.version  # read first: a change during dumps() gives a new version
+        cached = self._fragments.get(product)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        fragment = json.dumps(product_json(product)).encode()
+        self._fragments[product] = (version, fragment)
+        if len(self._fragments) > self._prune_at:
+            self._prune_fragments()
+        return fragment
+
+    def _prune_fragments(self):
+        """
+        Drop the fragments of products that were removed from the store.
+        Runs whenever the cache has doubled since the last time, so the cost per new fragment stays constant.
+        """
+        get_product = self.store.get_product
+        self._fragments = {product: cached for product, cached in self._fragments.items()
+                           if get_product(product.name) == product}
+        self._prune_at = max(2 * len(self._fragments), 1024)
+
+    def _product(self, name):
+        product = self.store.get_product(name)
+        if product is None:
+            raise HttpError(404, f"Product {name} not found in the store.")
+        return product
+
+    @staticmethod
+    def _json(body, key):
+        """Return one value of a JSON object request body."""
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            raise HttpError(400, f"Invalid JSON: {e}") from e
+        if not isinstance(data, dict) or key not in data:
+            raise HttpError(400, f"Expected a JSON object with {key!r}.")
+        return data[key]
+
+    def _shopping_list(self, items):
+        """Turn a list of {"name": ..., "quantity": ...} objects into (Product, quantity) tuples."""
+        if not isinstance(items, list):
+            raise HttpError(400, "A shopping list must be a list of items.")
+        shopping_list = []
+        for item in items:
+            if not isinstance(item, dict) or not isinstance(item.get("name"), str) or \
+                    type(item.get("quantity")) is not int or item["quantity"] <= 0:
+                raise HttpError(400, 'Each item must be {"name": <string>, "quantity": <positive integer>}.')
+            shopping_list.append((self._product(item["name"]), item["quantity"]))
+        return shopping_list
+
+
+class Client:
+    """Minimal keep-alive JSON client for an OrderService, e.g. for tests and load tests."""
+
+    def __init__(self, host="127.0.0.1", port=8000):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+    async def connect(self) -> None:
+        """Open the connection that all requests of this client use."""
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+
+    async def request(self, method, path, data=None):
+        """
+        Send a request over the open connection.
+
+        :param method: "GET" or "POST"
+        :param path: request path, e.g. "/products"
+        :param data: JSON-serializable request body or None
+        :return: (status code, decoded JSON response)
+        """
+        body = json.dumps(data).encode() if data is not None else b""
+        self._writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                           f"Content-Type: application/json\r\n"
+                           f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+        await self._writer.drain()
+        status = int((await self._reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self._reader.readexactly(length))
+
+
+if __name__ == "__main__":
+    import sys
+
+    from main import best_buy
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    print(f"Serving the Best Buy store on http://127.0.0.1:{port}/products")
+    try:
+        asyncio.run(OrderService(best_buy).serve_forever(port=port))
+    except KeyboardInterrupt:
+        pass
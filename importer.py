@@ -0,0 +1,173 @@
+"""
+Streaming import of product catalogs from CSV or JSON Lines files.
+
+Columns (CSV header or JSON keys):
+    name, price, quantity, type, maximum, promotion
+
+type is "product" (default), "non_stocked" or "limited" (needs maximum).
+promotion is empty or "<kind>|<name>[|<percent>]" with kind
+"percent", "second_half_price" or "third_one_free", e.g. "percent|20% off|20".
+
+Rows are read one by one and added to the store in chunks, so the memory used by the
+import does not grow with the size of the file. Bad rows are reported, not fatal.
+"""
+import csv
+import json
+from itertools import islice
+
+from products import Product, NonStockedProduct, LimitedProduct
+from promotions import PercentDiscount, SecondHalfPrice, ThirdOneFree, shared_promotion
+
+
+class ImportReport:
+    """Result of an import: number of imported products and the bad rows."""
+
+    def __init__(self, max_errors):
+        self.imported = 0
+        self.error_count = 0
+        self.errors = []  # (line number, message), at most max_errors entries
+        self.max_errors = max_errors
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line, message))
+
+    def __repr__(self):
+        return f"ImportReport(imported={self.imported}, errors={self.error_count})"
+
+
+def read_rows(path):
+    """
+    Yield the rows of a CSV or JSON Lines file as (line number, dict).
+    The format is chosen by the file extension (.csv, .jsonl or .ndjson).
+    A JSON line that can not be parsed is yielded as (line number, error message).
+    """
+    path = str(path)
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as file:
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row
+    elif path.endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as file:
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, f"Invalid JSON: {e}"
+                    continue
+                if not isinstance(row, dict):
+                    yield line_number, "Expected a JSON object."
+                    continue
+                yield line_number, row
+    else:
+        raise ValueError("Unknown file type, expected .csv, .jsonl or .ndjson.")
+
+
+def _number(value, name):
+    """Convert a CSV text or JSON value to int or float."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"{name} is missing.")
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return float(value)
+        except ValueError:
+            raise ValueError(f"{name} must be a number.") from None
+
+
+def parse_promotion(text):
+    """
+    Create a shared promotion from the promotion column.
+
+    :param text: "<kind>|<name>[|<percent>]" or empty
+    :return: promotion or None
+    """
+    if not text:
+        return None
+    parts = text.split("|")
+    kind, name = parts[0].strip(), parts[1].strip() if len(parts) > 1 else ""
+    if not name:
+        raise ValueError("Promotion needs a name.")
+    if kind == "percent":
+        if len(parts) != 3:
+            raise ValueError("Percent promotion needs a percent.")
+        return shared_promotion(PercentDiscount, name, percent=_number(parts[2].strip(), "Percent"))
+    if kind == "second_half_price":
+        return shared_promotion(SecondHalfPrice, name)
+    if kind == "third_one_free":
+        return shared_promotion(ThirdOneFree, name)
+    raise ValueError(f"Unknown promotion kind {kind}.")
+
+
+def row_to_product(row):
+    """
+    Create a product from an imported row.
+
+    :param row: dict with the columns described in the module docstring
+    :return: Product, NonStockedProduct or LimitedProduct
+    :raises Exception: if the row is invalid
+    """
+    kind = (row.get("type") or "product").strip()
+    name = row.get("name")
+    price = _number(row.get("price"), "Price")
+    if kind == "non_stocked":
+        product = NonStockedProduct(name, price=price)
+    elif kind == "limited":
+        product = LimitedProduct(name, price=price, quantity=_number(row.get("quantity"), "Quantity"),
+                                 maximum=_number(row.get("maximum"), "Maximum"))
+    elif kind == "product":
+        product = Product(name, price=price, quantity=_number(row.get("quantity"), "Quantity"))
+    else:
+        raise ValueError(f"Unknown product type {kind}.")
+    product.set_promotion(parse_promotion(row.get("promotion")))
+    return product
+
+
+def _products(rows, report):
+    """Turn rows into (line number, product), reporting bad rows."""
+    for line, row in rows:
+        if isinstance(row, str):
+            report.add_error(line, row)
+            continue
+        try:
+            yield line, row_to_product(row)
+        except Exception as e:
+            report.add_error(line, str(e))
+
+
+def import_catalog(store, path, chunk_size=10_000, max_errors=1000):
+    """
+    Import all products of a CSV or JSON Lines file into a store.
+
+    :param store: Store (or ColumnarStore) to add the products to
+    :param path: file to import
+    :param chunk_size: number of products added to the store at once
+    :param max_errors: maximum number of bad rows kept in the report
+    :return: ImportReport
+    """
+    if not isinstance(chunk_size, int) or chunk_size <= 0:
+        raise ValueError("chunk_size must be a positive integer.")
+    report = ImportReport(max_errors)
+    products = _products(read_rows(path), report)
+    while True:
+        chunk = list(islice(products, chunk_size))
+        if not chunk:
+            break
+        valid = []
+        names = set()
+        for line, product in chunk:
+            if product.name in names or store.get_product(product.name) is not None:
+                report.add_error(line, f"Product {product.name} already exists in the store.")
+                continue
+            names.add(product.name)
+            valid.append(product)
+        store.add_products(valid)
+        report.imported += len(valid)
+    return report
@@ -0,0 +1,147 @@
+"""
+Counters and latency histograms for the hot paths (Store.order, Product.buy, promotions).
+
+Instrumentation is disabled by default; an instrumented function then only checks one
+flag before calling the original function. Enable it with metrics.enable() and read the
+values with export_metrics() or dump_metrics().
+"""
+import functools
+import threading
+import time
+
+# upper bounds of the latency buckets in microseconds, the last bucket is unbounded
+BUCKET_BOUNDS_US = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 50000, 100000)
+
+
+class Histogram:
+    """Latency histogram with fixed buckets."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS_US) + 1)
+        self.count = 0
+        self.total_us = 0.0
+        self.max_us = 0.0
+
+    def add(self, value_us):
+        """Add one measurement in microseconds."""
+        index = 0
+        while index < len(BUCKET_BOUNDS_US) and value_us > BUCKET_BOUNDS_US[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.total_us += value_us
+        if value_us > self.max_us:
+            self.max_us = value_us
+
+    def percentile(self, percent):
+        """Return the upper bucket bound that contains the given percentile (max for the last bucket)."""
+        if not self.count:
+            return 0.0
+        wanted = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= wanted:
+                return float(BUCKET_BOUNDS_US[index]) if index < len(BUCKET_BOUNDS_US) else self.max_us
+        return self.max_us
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean_us": self.total_us / self.count if self.count else 0.0,
+            "p50_us": self.percentile(50),
+            "p99_us": self.percentile(99),
+            "max_us": self.max_us,
+            "buckets": dict(zip([f"<={bound}" for bound in BUCKET_BOUNDS_US] + ["inf"], self.buckets)),
+        }
+
+
+class Metrics:
+    """Registry of counters and histograms."""
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        """Remove all recorded values."""
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def increment(self, name, amount=1) -> None:
+        """Increase a counter (only if enabled)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, value_us) -> None:
+        """Add a latency in microseconds to a histogram (only if enabled)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.add(value_us)
+
+    def snapshot(self):
+        """Return all counters and histograms as a dict."""
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+            }
+
+
+# the metrics of the application
+metrics = Metrics()
+
+
+def instrumented(name):
+    """
+    Decorator counting the calls, errors and latency of a function.
+
+    :param name: metric name, e.g. "store.order"
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                metrics.increment(f"{name}.errors")
+                raise
+            finally:
+                metrics.increment(f"{name}.calls")
+                metrics.observe(name, (time.perf_counter_ns() - start) / 1000)
+        return wrapper
+    return decorator
+
+
+def export_metrics():
+    """Return a snapshot of all metrics as a dict."""
+    return metrics.snapshot()
+
+
+def dump_metrics(path):
+    """
+    Write a snapshot of all metrics to a JSON file.
+
+    :param path: file to write
+    """
+    import json  # imported here, importing the store does not need the JSON module
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(export_metrics(), file, indent=2)
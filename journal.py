@@ -0,0 +1,238 @@
+"""
+Write-ahead journal of stock changes.
+
+Every change of a product's quantity or active status is written to an append-only
+file as one JSON line per transaction (an order, or a single set_quantity()).
+A line is only replayed if it is complete, so a crash in the middle of a write
+never applies half an order. With group commit, several transactions share one
+fsync: up to group_size - 1 committed transactions may be lost in a crash. With a
+sync_interval, a background thread also fsyncs them after at most that many seconds,
+even if no further transaction is written.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from store import Store
+
+
+class Journal:
+    """Append-only journal of stock changes with group commit."""
+
+    def __init__(self, path, group_size=1, sync_interval=None):
+        """
+        Open (or create) a journal file.
+
+        :param path: journal file
+        :param group_size: number of transactions that share one fsync (1 = fsync every transaction)
+        :param sync_interval: if set, committed transactions are fsynced after at most this many seconds
+        """
+        if not isinstance(group_size, int) or group_size <= 0:
+            raise ValueError("group_size must be a positive integer.")
+        self.path = path
+        self.group_size = group_size
+        self.sync_interval = sync_interval
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._local = threading.local()  # transaction of the current thread
+        self._unsynced = 0  # committed transactions since the last fsync
+        self._last_sync = time.monotonic()
+        self._closed = threading.Event()
+        self._flusher = None
+        if sync_interval is not None:
+            # fsyncs the last transactions of a group also when no more transactions come
+            self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+            self._flusher.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def record(self, product, field, old_value) -> None:
+        """
+        Record the current state of a changed product. Used as a store observer.
+        Outside of a transaction the change is committed immediately.
+        """
+        if field not in ("quantity", "active"):
+            return
+        changes = getattr(self._local, "changes", None)
+        entry = [product.name, product.quantity, product.active]
+        if changes is None:
+            self._commit([entry])
+        else:
+            changes.append(entry)
+
+    @contextmanager
+    def transaction(self):
+        """Collect all changes of the block and commit them as one journal line."""
+        if getattr(self._local, "changes", None) is not None:
+            yield  # already inside a transaction of this thread
+            return
+        self._local.changes = []
+        try:
+            yield
+        finally:
+            changes, self._local.changes = self._local.changes, None
+            if changes:
+                self._commit(changes)
+
+    def _commit(self, changes):
+        """Write one transaction and fsync if the group is full."""
+        line = json.dumps(changes, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._unsynced += 1
+            if self._unsynced >= self.group_size or (
+                    self.sync_interval is not None and
+                    time.monotonic() - self._last_sync >= self.sync_interval):
+                self._sync()
+
+    def flush(self) -> None:
+        """Force all committed transactions to disk."""
+        with self._lock:
+            if self._unsynced:
+                self._sync()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.sync_interval):
+            self.flush()
+
+    def position(self):
+        """Return the end of the transactions committed so far, see truncate()."""
+        with self._lock:
+            self._file.flush()
+            return self._file.tell()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def truncate(self, position=None) -> None:
+        """
+        Remove the transactions written before a position, e.g. after they were written to
+        a snapshot. Transactions committed after the position are kept. The kept transactions
+        are written to a new file that replaces the journal, so a crash leaves either the
+        old or the new journal, never one without the kept transactions.
+
+        :param position: value returned by position(), None to remove all transactions
+        """
+        with self._lock:
+            self._file.flush()
+            rest = ""
+            if position is not None:
+                with open(self.path, encoding="utf-8") as file:
+                    file.seek(position)
+                    rest = file.read()
+            temporary_path = f"{self.path}.tmp"
+            with open(temporary_path, "w", encoding="utf-8") as file:
+                file.write(rest)
+                file.flush()
+                os.fsync(file.fileno())
+            self._file.close()
+            try:
+                os.replace(temporary_path, self.path)
+                _sync_directory(self.path)
+            finally:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        """Flush and close the journal file."""
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        self._file.close()
+
+
+def _sync_directory(path):
+    """fsync the directory of a file, so a rename of the file survives a crash (POSIX only)."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    descriptor = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def read_transactions(path):
+    """
+    Yield the transactions of a journal file in order.
+    An incomplete last line (crash during the write) is ignored.
+
+    :param path: journal file
+    :return: generator of lists with [name, quantity, active] entries
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            if not line.endswith("\n"):
+                break
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                break
+
+
+def replay(store, journal_path):
+    """
+    Apply all transactions of a journal to a store.
+
+    :param store: store to update
+    :param journal_path: journal file
+    :return: number of applied transactions
+    """
+    count = 0
+    for changes in read_transactions(journal_path):
+        for name, quantity, active in changes:
+            product = store.get_product(name)
+            if product is None:
+                continue
+            product.quantity = quantity
+            product.active = active
+        count += 1
+    return count
+
+
+def recover(snapshot_path, journal_path, group_size=1, thread_safe=False):
+    """
+    Rebuild a store after a restart or crash: load the latest snapshot,
+    replay the journal and attach the journal for new changes.
+
+    :param snapshot_path: snapshot file written by Store.save()
+    :param journal_path: journal file
+    :param group_size: group size of the reopened journal
+    :param thread_safe: passed to the store
+    :return: the recovered store
+    """
+    store = Store.load(snapshot_path, thread_safe=thread_safe)
+    replay(store, journal_path)
+    store.attach_journal(Journal(journal_path, group_size=group_size))
+    return store
+
+
+def checkpoint(store, snapshot_path):
+    """
+    Write a new snapshot and remove the transactions it contains from the journal of the store.
+    Orders may go on during the checkpoint: transactions committed after the snapshot was
+    started stay in the journal. A crash between both steps is safe: replaying the old
+    journal on top of the new snapshot writes the same absolute values again.
+
+    :param store: store with an attached journal
+    :param snapshot_path: snapshot file to replace
+    """
+    position = store.journal.position() if store.journal is not None else None
+    temporary_path = f"{snapshot_path}.tmp"
+    store.save(temporary_path)
+    os.replace(temporary_path, snapshot_path)
+    if store.journal is not None:
+        store.journal.truncate(position)
@@ -0,0 +1,137 @@
+import threading
+
+
+class LockStripes:
+    """A fixed table of locks shared by many objects (lock striping).
+    Every object is mapped to one stripe, so we need far fewer locks than
+    objects and still do not serialize unrelated objects behind one global lock.
+    """
+
+    def __init__(self, count=256):
+        if not isinstance(count, int) or count <= 0:
+            raise ValueError("Count must be a positive integer.")
+        self._locks = [threading.Lock() for _ in range(count)]
+        self._local = threading.local()  # per thread: number of holds and the deferred calls
+
+    def index(self, obj) -> int:
+        """Return the stripe number of an object (equal objects share a stripe)."""
+        return hash(obj) % len(self._locks)
+
+    def lock_for(self, obj):
+        """Return the lock guarding an object."""
+        return self._locks[self.index(obj)]
+
+    def hold(self, obj):
+        """Return a context manager holding the lock of one object."""
+        return _Holding(self._locks[hash(obj) % len(self._locks)], self._local)
+
+    def acquire_all(self, objects):
+        """
+        Return a context manager holding the locks of all given objects.
+        The stripes are always taken in ascending order, so two threads locking
+        overlapping sets of objects can not deadlock.
+
+        :param objects: iterable of objects to lock
+        """
+        return _HoldingAll([self._locks[index] for index in sorted({self.index(obj) for obj in objects})],
+                           self._local)
+
+    def acquire_every(self):
+        """Return a context manager holding every stripe, e.g. to read one consistent value of all objects."""
+        return _HoldingAll(self._locks, self._local)
+
+    def wait_for_holders(self) -> None:
+        """Take and release every stripe in turn: returns once all locks held at the call were released."""
+        for lock in self._locks:
+            with lock:
+                pass
+
+    def call_after_release(self, function, *args):
+        """
+        Call a function as soon as the current thread holds no stripe lock (taken with
+        hold() or acquire_all()), at once if it holds none. For callbacks that may change
+        the stock themselves, e.g. to reorder a product, without deadlocking.
+        """
+        local = self._local
+        if getattr(local, "holds", 0):
+            local.deferred.append((function, args))
+        else:
+            function(*args)
+
+
+def _run_deferred(local):
+    """Run the calls deferred by call_after_release() once the last lock of the thread is released."""
+    deferred = local.deferred
+    local.deferred = []
+    error = None
+    for function, args in deferred:
+        try:
+            function(*args)
+        except BaseException as e:  # the other calls still run, the first error is raised at the end
+            if error is None:
+                error = e
+    if error is not None:
+        raise error
+
+
+class _Holding:
+    """Context manager of LockStripes.hold()."""
+    __slots__ = ("_lock", "_local")
+
+    def __init__(self, lock, local):
+        self._lock = lock
+        self._local = local
+
+    def __enter__(self):
+        self._lock.acquire()
+        local = self._local
+        try:
+            local.holds += 1
+        except AttributeError:  # first lock of this thread
+            local.holds = 1
+            local.deferred = []
+
+    def __exit__(self, exc_type, exc, traceback):
+        self._lock.release()
+        local = self._local
+        local.holds -= 1
+        if not local.holds and local.deferred:
+            _run_deferred(local)
+
+
+class _HoldingAll:
+    """Context manager of LockStripes.acquire_all()."""
+    __slots__ = ("_locks", "_local")
+
+    def __init__(self, locks, local):
+        self._locks = locks
+        self._local = local
+
+    def __enter__(self):
+        acquired = []
+        try:
+            for lock in self._locks:
+                lock.acquire()
+                acquired.append(lock)
+        except BaseException:
+            for lock in reversed(acquired):
+                lock.release()
+            raise
+        local = self._local
+        try:
+            local.holds += 1
+        except AttributeError:  # first lock of this thread
+            local.holds = 1
+            local.deferred = []
+
+    def __exit__(self, exc_type, exc, traceback):
+        for lock in reversed(self._locks):
+            lock.release()
+        local = self._local
+        local.holds -= 1
+        if not local.holds and local.deferred:
+            _run_deferred(local)
+
+
+# locks used for every stock change of a product
+stock_locks = LockStripes()
@@ -1,22 +1,99 @@
+import os
+
 from products import Product, LimitedProduct, NonStockedProduct
 from store import Store
 from promotions import PercentDiscount, SecondHalfPrice, ThirdOneFree
 
-# setup initial stock of inventory
-product_list = [
-    Product("MacBook Air M2", price=1450, quantity=100),
-    Product("Bose QuietComfort Earbuds", price=250, quantity=500),
-    Product("Google Pixel 7", price=500, quantity=500),
-    NonStockedProduct("Windows License", price=200),
-    LimitedProduct("Shipping", price=10, quantity=5, maximum=1)  # ← dein Testfall
-]
 
-# Assign promotions to some products
-product_list[0].set_promotion(PercentDiscount("20% off", percent=20))          # MacBook Air M2
-product_list[1].set_promotion(SecondHalfPrice("Second one half price"))        # Bose Earbuds
-product_list[2].set_promotion(ThirdOneFree("3 für 2 Aktion"))                  # Pixel 7
+def create_products():
+    """
+    Create the initial stock of inventory, with promotions on some products.
+
+    :return: list of products
+    """
+    product_list = [
+        Product("MacBook Air M2", price=1450, quantity=100),
+        Product("Bose QuietComfort Earbuds", price=250, quantity=500),
+        Product("Google Pixel 7", price=500, quantity=500),
+        NonStockedProduct("Windows License", price=200),
+        LimitedProduct("Shipping", price=10, quantity=5, maximum=1)  # ← dein Testfall
+    ]
+
+    # Assign promotions to some products
+    product_list[0].set_promotion(PercentDiscount("20% off", percent=20))          # MacBook Air M2
+    product_list[1].set_promotion(SecondHalfPrice("Second one half price"))        # Bose Earbuds
+    product_list[2].set_promotion(ThirdOneFree("3 für 2 Aktion"))                  # Pixel 7
+    return product_list
+
+
+def create_store(products=None):
+    """
+    Create the Best Buy store.
+
+    :param products: products of the store, None for create_products()
+    :return: Store
+    """
+    return Store(create_products() if products is None else products)
+
+
+def __getattr__(name):
+    """
+    Create product_list and best_buy when they are used for the first time,
+    not when the module is imported.
+    """
+    if name in ("product_list", "best_buy"):
+        products = create_products()
+        globals().update(product_list=products, best_buy=create_store(products))
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+PAGE_SIZE = 20  # products shown before asking for the next page
+# every command on a catalog replays its journal; once the journal is larger, the orders are
+# written into the snapshot (a checkpoint) and the journal starts empty again
+CHECKPOINT_BYTES = 64 * 1024  # replays in about 50 ms, see README
+
+
+def show_products(store, page_size=PAGE_SIZE):
+    """
+    Print the products page by page. Only the products of the current page are read,
+    so the first page appears at once, also for a very large catalog.
+    """
+    number = 0
+    cursor = None
+    while True:
+        page = store.iter_products(after=cursor, limit=page_size)
+        shown = 0
+        for product in page:
+            number += 1
+            shown += 1
+            print(f"{number}. {product.show()}")
+        cursor = page.cursor
+        if shown < page_size:
+            return
+        if input("Press Enter for more products, or q to go back: ").strip().lower() == "q":
+            return
+
+
+def print_receipt(receipt):
+    """Print the lines, discounts and total of an order."""
+    print("\nOrder successful! Summary:")
+    print(f"{'Product':30} {'Unit Price':>12} {'Quantity':>10} {'Discount':>12} {'Subtotal':>12}")
+    for line in receipt.lines:
+        print(f"{line.product.name:30} {line.product.price:12} €{line.quantity:10} {line.discount:12.2f} €{line.total:12.2f} €")
+    print("-" * 85)
+    for promotion_name in receipt.applied:
+        print(f"Basket promotion: {promotion_name}")
+    print(f"{'Total':>66} {receipt.total:12.2f} €")
+
+
+def reservation_expired(store, reservation):
+    """Return True if the reservation of a cart ran out of time and its stock was given back."""
+    if reservation is None:
+        return False
+    store.reservations.expire()
+    return not reservation.active
 
-best_buy = Store(product_list)
 
 def start(store):
     """
@@ -41,9 +118,8 @@ def start(store):
             continue
 
         if choice == "1":
-            # show all products including inactive ones
-            for index, product in enumerate(store.products, start=1):
-                print(f"{index}. {product.show()}")
+            # show all products including inactive ones, one page at a time
+            show_products(store)
 
         elif choice == "2":
             # Display total quantity of all products
@@ -51,34 +127,23 @@ def start(store):
 
         elif choice == "3":
             # Allow user to make an order one by one
-            order_list = []  # Collect (Product, quantity) tuples
+            # the stock of the chosen products is reserved until the order is placed or cancelled
+            reservation = None
 
             while True:
-                planned_quantities = {}
-                for prod, qty in order_list:
-                    planned_quantities[prod] = planned_quantities.get(prod, 0) + qty
-
                 # Show all products
                 products_for_order = store.products
                 print("\nAvailable products:")
                 for index, product in enumerate(products_for_order, start=1):
-                    planned = planned_quantities.get(product, 0)
-                    if isinstance(product, NonStockedProduct):
-                        available = 0
-                    else:
-                        available = product.get_quantity() - planned
-                        # Aktualisiere den aktiven Status basierend auf der verfügbaren Menge
-                        if available == 0:
-                            product.deactivate()
-                        else:
-                            product.activate()
-
+                    available = store.available(product)
                     promotion_info = f", Promotion: {product.promotion.name}" if product.promotion else ""
                     print(f"{index}. {product.name} (Quantity available: {available}, Active: {product.is_active()}{promotion_info})")
 
                 # choose product index
                 index_input = input("Enter the product number you want to order (or 'q' to cancel): ").strip()
                 if index_input.lower() == 'q':
+                    if reservation is not None:
+                        store.release(reservation)
                     print("Order cancelled.")
                     break
                 if not index_input.isdigit():
@@ -96,25 +161,25 @@ def start(store):
                     print(f"The selected product '{selected_product.name}' is inactive and cannot be ordered.")
                     continue
 
-                planned = planned_quantities.get(selected_product, 0)
-                available = selected_product.get_quantity() - planned
-
-                if available <= 0 and not isinstance(selected_product, NonStockedProduct):
+                if store.available(selected_product) <= 0 and not isinstance(selected_product, NonStockedProduct):
                     print(f"Sorry, {selected_product.name} is out of stock.")
                     continue
 
                 # choose quantity
                 while True:
+                    if reservation_expired(store, reservation):
+                        print("Your reservation expired and the reserved products were given back. "
+                              "Starting a new order.")
+                        reservation = None
                     if isinstance(selected_product, LimitedProduct) and selected_product.maximum == 1:
                         print(f"Note: {selected_product.name} can only be ordered 1 per order.")
-                    if not selected_product.is_active():
-                        print(f"The product '{selected_product.name}' is inactive and cannot be ordered.")
-                        break
 
-                    planned = planned_quantities.get(selected_product, 0)
-                    available = selected_product.get_quantity() - planned
+                    planned = reservation.amount(selected_product) if reservation is not None else 0
+                    available = store.available(selected_product)
                     quantity_input = input(f"Enter quantity for {selected_product.name} (or 'q' to cancel): ").strip()
                     if quantity_input.lower() == "q":
+                        if reservation is not None:
+                            store.release(reservation)
                         print("Order cancelled.")
                         return
                     if not quantity_input.isdigit():
@@ -125,7 +190,8 @@ def start(store):
 
                     # Überprüfung: Bei LimitedProduct darf nicht mehr als das Maximum bestellt werden
                     if isinstance(selected_product, LimitedProduct):
-                        if quantity > selected_product.maximum:
+                        # the maximum counts for the whole order, including earlier lines
+                        if quantity + planned > selected_product.maximum:
                             print(f"Cannot order more than {selected_product.maximum} of this product.")
                             continue
 
@@ -134,35 +200,23 @@ def start(store):
                             f"Not enough quantity in stock. Maximum available is {available}. Please enter a smaller amount.")
                         continue
 
+                    try:
+                        reservation = store.reserve([(selected_product, quantity)], reservation=reservation)
+                    except Exception as e:
+                        print(e)
+                        continue
                     break  # valid quantity
 
-                order_list.append((selected_product, quantity))
-                # Update active status of the selected product immediately after ordering
-                if not isinstance(selected_product, NonStockedProduct) and selected_product.get_quantity() == 0:
-                    selected_product.deactivate()
-
                 # Ask if the user wants to add another product
                 another_product = input("Would you like to add another product? (y/n): ").strip().lower()
                 if another_product == 'n':
+                    if reservation_expired(store, reservation):
+                        print("Your reservation expired and the reserved products were given back. "
+                              "Please order again.")
+                        break
                     # process the order
                     try:
-                        total = store.order(order_list)
-                        # Synchronize active status after ordering
-                        for product in store.products:
-                            if not isinstance(product, NonStockedProduct):
-                                if product.get_quantity() == 0:
-                                    product.deactivate()
-                                else:
-                                    product.activate()
-                        print("\nOrder successful! Summary:")
-                        print(f"{'Product':30} {'Unit Price':>12} {'Quantity':>10} {'Discount':>12} {'Subtotal':>12}")
-                        for product, quantity in order_list:
-                            original_total = product.price * quantity
-                            discounted_total = product.promotion.apply_promotion(product, quantity) if product.promotion else original_total
-                            discount_value = original_total - discounted_total
-                            print(f"{product.name:30} {product.price:12} €{quantity:10} {discount_value:12.2f} €{discounted_total:12.2f} €")
-                        print("-" * 85)
-                        print(f"{'Total':>66} {total:12.2f} €")
+                        print_receipt(store.checkout(reservation))
                     except Exception as e:
                         raise Exception("Order failed") from e
                     break
@@ -172,12 +226,127 @@ def start(store):
             break
 
 
+def parse_arguments(argv):
+    """Parse the command line, see main()."""
+    import argparse  # imported here, importing this module does not need the command line
+
+    parser = argparse.ArgumentParser(description="Best Buy store. Without a command the interactive menu starts.")
+    parser.add_argument("--catalog", metavar="SNAPSHOT",
+                        help="snapshot file (see Store.save) to use instead of the demo products; "
+                             "products are only read from it when they are used")
+    parser.add_argument("--journal", metavar="PATH",
+                        help="journal of the changes to the catalog, default: SNAPSHOT.journal")
+    commands = parser.add_subparsers(dest="command")
+    stock = commands.add_parser("stock", help="show the stock of products, or the total quantity")
+    stock.add_argument("names", nargs="*", metavar="NAME")
+    order = commands.add_parser("order", help="order products, e.g. order 'Google Pixel 7' 2 Shipping 1")
+    order.add_argument("items", nargs="+", metavar="NAME QUANTITY")
+    save = commands.add_parser("save", help="write the catalog to a snapshot file")
+    save.add_argument("path")
+
+    args = parser.parse_args(argv)
+    if args.command == "order":
+        if len(args.items) % 2 or not all(quantity.isdigit() for quantity in args.items[1::2]):
+            parser.error("order expects pairs of product name and quantity.")
+    return args
+
+
+def open_store(catalog=None, journal_path=None, writable=False):
+    """
+    Open the store for a command.
+
+    :param catalog: snapshot file, None for the demo products (create_store())
+    :param journal_path: journal of the catalog, None for the snapshot path + ".journal"
+    :param writable: if True, changes are written to the journal
+    :return: Store
+    """
+    if catalog is None:
+        return create_store()
+    import journal  # imported here, only needed for a catalog file
+
+    journal_path = journal_path or f"{catalog}.journal"
+    if writable:
+        return journal.recover(catalog, journal_path)
+    store = Store.load(catalog)
+    journal.replay(store, journal_path)
+    return store
+
+
+def main(argv=None):
+    """
+    Run a single command and return the exit code, or start the interactive menu
+    if there is no command. With --catalog only the products named on the command
+    line are read from the snapshot.
+
+    :param argv: command line arguments, None for sys.argv
+    :return: exit code
+    """
+    args = parse_arguments(argv)
+    # the menu and order change the stock: with --catalog they are written to the journal;
+    # saving over the catalog itself is a checkpoint, which needs the journal as well
+    writable = args.command in (None, "order") or saves_catalog(args)
+    store = open_store(args.catalog, args.journal, writable=writable)
+    try:
+        return run_command(store, args)
+    finally:
+        if store.journal is not None:
+            if os.path.getsize(store.journal.path) > CHECKPOINT_BYTES:
+                import journal  # imported here, only needed for a catalog file
+                journal.checkpoint(store, args.catalog)
+            store.journal.close()
+
+
+def saves_catalog(args):
+    """Return True if the command saves the store over its own --catalog file."""
+    return args.command == "save" and args.catalog is not None and \
+        os.path.abspath(args.path) == os.path.abspath(args.catalog)
+
+
+def run_command(store, args):
+    """Run the command of the parsed arguments on a store, return the exit code."""
+    if args.command is None:
+        start(store)
+    elif args.command == "stock":
+        if not args.names:
+            print("Total quantity in store:", store.get_total_quantity())
+        for name in args.names:
+            product = store.get_product(name)
+            if product is None:
+                print(f"Product {name} not found.")
+                return 1
+            print(product.show())
+    elif args.command == "order":
+        shopping_list = []
+        for name, quantity in zip(args.items[::2], args.items[1::2]):
+            product = store.get_product(name)
+            if product is None:
+                print(f"Product {name} not found.")
+                return 1
+            shopping_list.append((product, int(quantity)))
+        try:
+            print_receipt(store.place_order(shopping_list))
+        except Exception as e:
+            print(e)
+            return 1
+    elif args.command == "save":
+        if saves_catalog(args):
+            import journal  # imported here, only needed for a catalog file
+            # replaces the memory-mapped file safely and empties the journal
+            journal.checkpoint(store, args.catalog)
+        else:
+            store.save(args.path)
+        print(f"Saved {len(store.products)} products to {args.path}.")
+    return 0
+
+
 if __name__ == "__main__":
     """ 
     Main entry point of the Best Buy application.
-    Initializes the store and handles clean exit on keyboard interruption.
+    Runs a command or the interactive menu and handles clean exit on keyboard interruption.
     """
+    import sys
+
     try:
-        start(best_buy)
+        sys.exit(main())
     except KeyboardInterrupt:
         print("\n\nProgram interrupted. Goodbye!")
@@ -0,0 +1,183 @@
+"""
+Exact money amounts stored as integer cents.
+
+Prices of products stay plain numbers (e.g. 1450 or 2.5); every price that is
+computed (Product.buy, the promotions, Store.order, quote() and receipts) is a
+Money. Calculations stay in Python ints, so totals never drift; where a result
+falls between two cents it is rounded half up, once, at the place documented by
+the promotion.
+
+Money compares equal to numbers with the same value, so `store.order(...) == 140`
+and formatting with "{:.2f}" keep working. A float is compared by its shortest
+decimal form, so Money.of(0.3) == 0.3.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from fractions import Fraction
+import numbers
+
+
+def divide_half_up(numerator, denominator=1):
+    """
+    Divide and round half up to an int, without floats.
+
+    :param numerator: int or Fraction
+    :param denominator: positive int
+    :return: int
+    """
+    return (2 * numerator + denominator) // (2 * denominator)
+
+
+def to_cents(value):
+    """
+    Convert an amount (int, float, Decimal, Fraction or Money) to cents.
+    Amounts with more than two decimals are rounded half up.
+
+    :return: int
+    """
+    if type(value) is int:
+        return value * 100
+    if isinstance(value, Money):
+        return value.cents
+    if isinstance(value, float):
+        scaled = value * 100
+        cents = round(scaled)
+        if abs(scaled - cents) < 1e-6:
+            return int(cents)  # fast path: at most two decimals
+        value = Decimal(repr(value))
+    if isinstance(value, Decimal):
+        return int((value * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    if isinstance(value, numbers.Rational):
+        return divide_half_up(Fraction(value) * 100)
+    raise TypeError(f"Can not convert {type(value).__name__} to money.")
+
+
+def _exact_cents(value):
+    """Return an amount in cents without rounding (int or Decimal), for comparisons."""
+    if isinstance(value, Money):
+        return value.cents
+    if isinstance(value, numbers.Integral):
+        return int(value) * 100
+    if isinstance(value, float):
+        return Decimal(repr(value)) * 100
+    if isinstance(value, Decimal):
+        return value * 100
+    if isinstance(value, numbers.Rational):
+        return Fraction(value) * 100
+    return NotImplemented
+
+
+class Money:
+    """Amount of money in cents. Immutable."""
+    __slots__ = ("cents",)
+
+    def __init__(self, cents=0):
+        """
+        :param cents: amount in cents (int); use Money.of() to convert an amount in euros
+        """
+        if not isinstance(cents, int):
+            raise TypeError("cents must be an int.")
+        self.cents = cents
+
+    @classmethod
+    def of(cls, amount):
+        """Create a Money from an amount like 14.5 (rounded half up to cents)."""
+        return cls(to_cents(amount))
+
+    @property
+    def amount(self):
+        """The amount as Decimal, e.g. Decimal('14.50')."""
+        return Decimal(self.cents).scaleb(-2)
+
+    def percent_of(self, percent):
+        """Return percent % of the amount, rounded half up to cents."""
+        fraction = Fraction(str(percent)) if isinstance(percent, float) else Fraction(percent)
+        return Money(divide_half_up(self.cents * fraction.numerator, fraction.denominator * 100))
+
+    def __add__(self, other):
+        if isinstance(other, Money):
+            return Money(self.cents + other.cents)
+        if isinstance(other, numbers.Number):
+            return Money(self.cents + to_cents(other))
+        return NotImplemented
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, Money):
+            return Money(self.cents - other.cents)
+        if isinstance(other, numbers.Number):
+            return Money(self.cents - to_cents(other))
+        return NotImplemented
+
+    def __rsub__(self, other):
+        if isinstance(other, numbers.Number):
+            return Money(to_cents(other) - self.cents)
+        return NotImplemented
+
+    def __mul__(self, factor):
+        if type(factor) is int:
+            return Money(self.cents * factor)
+        if isinstance(factor, float):
+            factor = Fraction(str(factor))
+        if isinstance(factor, (numbers.Rational, Decimal)):
+            factor = Fraction(factor)
+            return Money(divide_half_up(self.cents * factor.numerator, factor.denominator))
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, divisor):
+        if isinstance(divisor, (numbers.Rational, float, Decimal)):
+            divisor = Fraction(str(divisor)) if isinstance(divisor, float) else Fraction(divisor)
+            return Money(divide_half_up(self.cents * divisor.denominator, divisor.numerator))
+        return NotImplemented
+
+    def __neg__(self):
+        return Money(-self.cents)
+
+    def __abs__(self):
+        return Money(abs(self.cents))
+
+    def __bool__(self):
+        return self.cents != 0
+
+    def __float__(self):
+        return self.cents / 100
+
+    def __eq__(self, other):
+        other = _exact_cents(other)
+        if other is NotImplemented:
+            return NotImplemented
+        return self.cents == other
+
+    def __lt__(self, other):
+        other = _exact_cents(other)
+        return NotImplemented if other is NotImplemented else self.cents < other
+
+    def __le__(self, other):
+        other = _exact_cents(other)
+        return NotImplemented if other is NotImplemented else self.cents <= other
+
+    def __gt__(self, other):
+        other = _exact_cents(other)
+        return NotImplemented if other is NotImplemented else self.cents > other
+
+    def __ge__(self, other):
+        other = _exact_cents(other)
+        return NotImplemented if other is NotImplemented else self.cents >= other
+
+    def __hash__(self):
+        # equal to the hash of the same value as int, Decimal or Fraction (and as float if
+        # the float is exact, e.g. 2.5; 0.1 compares equal by its decimal form but is not 1/10)
+        if self.cents % 100 == 0:
+            return hash(self.cents // 100)
+        return hash(Fraction(self.cents, 100))
+
+    def __format__(self, spec):
+        return format(self.amount, spec) if spec else str(self)
+
+    def __str__(self):
+        return str(self.amount)
+
+    def __repr__(self):
+        return f"Money('{self.amount}')"
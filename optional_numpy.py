@@ -0,0 +1,18 @@
+"""
+NumPy is optional, and importing it takes longer than starting the command line without it.
+The batch pricing and the columnar aggregates import it through numpy_or_none() when they
+are first used, so importing main never loads it.
+"""
+_numpy = False  # the numpy module, None if it is not installed, False before the first call
+
+
+def numpy_or_none():
+    """Return the numpy module, or None if NumPy is not installed (the callers fall back to plain Python)."""
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy  # imported here, see module docstring
+        except ImportError:
+            numpy = None
+        _numpy = numpy
+    return _numpy
@@ -1,44 +1,168 @@
+from instrumentation import instrumented
+from locks import stock_locks
+from money import Money, to_cents
+
+
+def validate_product_values(name, price, quantity):
+    """
+    Check the values of a new product.
+
+    :raises Exception: if one of the values is invalid
+    """
+    # check for string and not empty
+    if not isinstance(name, str) or not name.strip():
+        raise Exception("Name must be a non-empty string.")
+
+    # check for int or float and greater than 0
+    if not isinstance(price, (int, float)) or price <= 0:
+        raise Exception("Price must be greater than 0.")
+
+    #check for int and greater than 0
+    if not isinstance(quantity, int) or quantity < 0:
+        raise Exception("Quantity must be a non-negative integer.")
+
+
 class Product:
     """This class represents a product with name, price, quantity, and active status."""
+    # no per-instance __dict__, large catalogs need much less memory
+    __slots__ = ("_observers", "_version", "name", "_price", "_quantity", "_active", "_promotion")
 
     def __init__(self, name, price=0.0, quantity=0): #Constructor
         """Create a new product and check if the values are valid"""
+        validate_product_values(name, price, quantity)
 
-        # check for string and not empty
-        if not isinstance(name, str) or not name.strip():
-            raise Exception("Name must be a non-empty string.")
+        self._observers = ()  # callbacks notified about stock and status changes
+        self._version = 0  # increased by every change, see version
+        self.name = name
+        self._price = price
+        self._quantity = quantity
+        self._active = True
+        self._promotion = None  # New attribute
 
-        # check for int or float and greater than 0
-        if not isinstance(price, (int, float)) or price <= 0:
-            raise Exception("Price must be greater than 0.")
+    @property
+    def version(self):
+        """Number that changes whenever price, promotion, stock or status of the product change."""
+        return self._version
 
-        #check for int and greater than 0
-        if not isinstance(quantity, int) or quantity < 0:
-            raise Exception("Quantity must be a non-negative integer.")
+    @property
+    def price(self):
+        """Price of one item."""
+        return self._price
 
-        self.name = name
-        self.price = price
-        self.quantity = quantity
-        self.active = True
-        self.promotion = None  # New attribute
+    @price.setter
+    def price(self, price):
+        old_price = self._price
+        self._price = price
+        self._version += 1
+        if self._observers and old_price != price:
+            self._notify("price", old_price)
+
+    @property
+    def promotion(self):
+        """Promotion of the product or None."""
+        return self._promotion
 
-    def buy(self, amount: int) -> float:
+    @promotion.setter
+    def promotion(self, promotion):
+        old_promotion = self._promotion
+        self._promotion = promotion
+        self._version += 1
+        if self._observers and old_promotion is not promotion:
+            self._notify("promotion", old_promotion)
+
+    @property
+    def quantity(self):
+        """Current stock of the product."""
+        return self._quantity
+
+    @quantity.setter
+    def quantity(self, quantity):
+        old_quantity = self._quantity
+        self._quantity = quantity
+        self._version += 1
+        if self._observers and old_quantity != quantity:
+            self._notify("quantity", old_quantity)
+
+    @property
+    def active(self):
+        """True if the product can be ordered."""
+        return self._active
+
+    @active.setter
+    def active(self, active):
+        old_active = self._active
+        self._active = active
+        self._version += 1
+        if self._observers and old_active != active:
+            self._notify("active", old_active)
+
+    def add_observer(self, callback) -> None:
+        """
+        Register a callback that is called after the product changed.
+
+        :param callback: callable taking (product, field, old_value)
+        """
+        # a new tuple instead of a list: no empty list per product, and safe to iterate while changing
+        self._observers = self._observers + (callback,)
+
+    def remove_observer(self, callback) -> None:
+        """Unregister a callback added with add_observer()."""
+        observers = list(self._observers)
+        observers.remove(callback)
+        self._observers = tuple(observers)
+
+    def _notify(self, field, old_value):
+        """Inform all observers that a field changed."""
+        for callback in self._observers:
+            callback(self, field, old_value)
+
+    @instrumented("product.buy")
+    def buy(self, amount: int) -> Money:
         """
         Buy a number of items. Update stock and return total price.
 
         :param amount: number of items to buy
-        :return: total price
+        :return: total price (Money)
+        """
+        # check and update the stock under the product lock, so two threads can not oversell
+        with stock_locks.hold(self):
+            self.validate_purchase(amount)
+            price = self.get_price(amount)
+            self.commit_purchase(amount)
+        return price
+
+    def validate_purchase(self, amount: int) -> None:
+        """
+        Check that a number of items can be bought, without changing the stock.
+
+        :param amount: number of items to buy
+        :raises ValueError: if the amount is invalid or not in stock
         """
         if not isinstance(amount, int) or amount <= 0:
             raise ValueError("Amount must be a positive integer.")
         if amount > self.quantity:
             raise ValueError("Not enough quantity in stock.")
-        self.quantity -= amount
-        if self.quantity == 0 and not isinstance(self, NonStockedProduct):
-            self.active = False
+
+    def get_price(self, amount: int) -> Money:
+        """
+        Return the total price for a number of items (with promotion, if any).
+
+        :param amount: number of items
+        :return: total price (Money)
+        """
         if self.promotion:
             return self.promotion.apply_promotion(self, amount)
-        return self.price * amount
+        return Money(to_cents(self.price) * amount)
+
+    def commit_purchase(self, amount: int) -> None:
+        """
+        Remove bought items from the stock. The amount must be validated before.
+
+        :param amount: number of items bought
+        """
+        self.quantity -= amount
+        if self.quantity == 0:
+            self.deactivate()
 
     def set_quantity(self, quantity: int) -> None:
         """
@@ -48,9 +172,10 @@ class Product:
         """
         if not isinstance(quantity, int) or quantity < 0:
             raise ValueError("Quantity must be a non-negative integer.")
-        self.quantity = quantity
-        if self.quantity == 0:
-            self.deactivate()
+        with stock_locks.hold(self):
+            self.quantity = quantity
+            if self.quantity == 0:
+                self.deactivate()
 
     def deactivate(self) -> None:
         """Set the product as not active."""
@@ -80,6 +205,8 @@ class NonStockedProduct(Product):
     """A product that does not require stock tracking (e.g. digital license).
     Always available and quantity is fixed at 0.
     """
+    __slots__ = ()
+
     def __init__(self, name, price):
         super().__init__(name, price, quantity=0)
         self.active = True # Always active, even if quantity is 0
@@ -87,38 +214,40 @@ class NonStockedProduct(Product):
     def set_quantity(self, quantity):
         self.quantity = 0 # Always zero, can not be changed
 
-    def buy(self, amount: int) -> float:
+    def validate_purchase(self, amount: int) -> None:
         """
-        Purchase a non-stocked product. Always available in any quantity.
+        Check the amount only. A non-stocked product is always available.
 
         :param amount: number of items to buy
-        :return: total price with or without promotion
+        :raises ValueError: if the amount is invalid
         """
-        if self.promotion:
-            return self.promotion.apply_promotion(self, amount)
-        return self.price * amount
+        if not isinstance(amount, int) or amount <= 0:
+            raise ValueError("Amount must be a positive integer.")
+
+    def commit_purchase(self, amount: int) -> None:
+        """Nothing to do, there is no stock to update."""
 
 
 class LimitedProduct(Product):
     """A product that limits how many units can be purchased per order.
     Inherits from Product and enforces a maximum purchase limit.
     """
+    __slots__ = ("maximum",)
 
     def __init__(self, name, price, quantity, maximum):
         super().__init__(name, price, quantity)
         self.maximum = maximum # max quantity per purchase
 
-    def buy(self, quantity):
+    def validate_purchase(self, amount: int) -> None:
         """
-        Purchase a product with a maximum limit per order.
+        Check the maximum limit per order and the stock.
 
-        :param quantity: number of items to buy
-        :return: total price (may include promotion)
-        :raises Exception: if quantity exceeds the maximum allowed
+        :param amount: number of items to buy
+        :raises Exception: if amount exceeds the maximum allowed
         """
-        if quantity > self.maximum:
+        if amount > self.maximum:
             raise Exception(f"Cannot buy more than {self.maximum} of this product")
-        return super().buy(quantity)
+        super().validate_purchase(amount)
 
     def show(self):
         return (f"{self.name} (Price: {self.price}, Quantity: {self.quantity}, "
@@ -127,3 +256,28 @@ class LimitedProduct(Product):
     def is_active(self):
         """Return True if product is active."""
         return self.active
+
+
+def to_row(product):
+    """Return the values of a product as a tuple, e.g. to send it to another process."""
+    if isinstance(product, NonStockedProduct):
+        kind, maximum = "non_stocked", 0
+    elif isinstance(product, LimitedProduct):
+        kind, maximum = "limited", product.maximum
+    else:
+        kind, maximum = "product", 0
+    return kind, product.name, product.price, product.quantity, maximum, product.active, product.promotion
+
+
+def from_row(row):
+    """Create a product from a tuple returned by to_row()."""
+    kind, name, price, quantity, maximum, active, promotion = row
+    if kind == "non_stocked":
+        product = NonStockedProduct(name, price=price)
+    elif kind == "limited":
+        product = LimitedProduct(name, price=price, quantity=quantity, maximum=maximum)
+    else:
+        product = Product(name, price=price, quantity=quantity)
+    product.active = active
+    product.set_promotion(promotion)
+    return product
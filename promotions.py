@@ -1,77 +1,441 @@
+import weakref
 from abc import ABC, abstractmethod
+from fractions import Fraction
+
+from instrumentation import instrumented
+from money import Money, divide_half_up, to_cents
+from optional_numpy import numpy_or_none
+
+INT64_MAX = 2 ** 63 - 1
+
+
+def _as_cent_columns(price_cents, quantities):
+    """Return prices in cents and quantities as int64 NumPy arrays (or lists without NumPy)."""
+    np = numpy_or_none()
+    if len(price_cents) != len(quantities):
+        raise ValueError("prices and quantities must have the same length.")
+    if np is not None:
+        return np.asarray(price_cents, dtype=np.int64), np.asarray(quantities, dtype=np.int64)
+    return [int(cents) for cents in price_cents], [int(quantity) for quantity in quantities]
+
+
+def _prices_to_cents(prices):
+    """
+    Convert unit prices to an int64 NumPy array of cents, rounded like to_cents(): prices with
+    at most two decimals directly, the others half up from their decimal form.
+    """
+    np = numpy_or_none()
+    scaled = np.asarray(prices, dtype=np.float64) * 100
+    rounded = np.rint(scaled)
+    cents = rounded.astype(np.int64)
+    # np.rint rounds half to even, so more than two decimals are converted one by one
+    for index in np.flatnonzero(np.abs(scaled - rounded) >= 1e-6).tolist():
+        cents[index] = to_cents(prices[index])
+    return cents
+
+
+def _exact_totals(totals):
+    """Return exact Python int totals as int64 NumPy array, or as object array if one does not fit into int64."""
+    np = numpy_or_none()
+    if all(-INT64_MAX - 1 <= total <= INT64_MAX for total in totals):
+        return np.asarray(totals, dtype=np.int64)
+    return np.asarray(totals, dtype=object)
+
+
+def _fits_int64(price_cents, quantities, factor, offset=0):
+    """
+    Return True if price * quantity * factor + offset fits into int64 for every pair
+    of the NumPy columns, so the vectorized formula can not overflow silently.
+    """
+    np = numpy_or_none()
+    if len(price_cents) == 0:
+        return True
+    largest = int(np.abs(price_cents).max()) * int(np.abs(quantities).max())
+    return largest * factor + offset <= INT64_MAX
+
+
+def _remaining_factor(percent):
+    """
+    Return the part of the price that is left after a percent discount as exact fraction.
+
+    :return: (numerator, denominator) ints, e.g. (4, 5) for 20 percent
+    """
+    if type(percent) is int:
+        return 100 - percent, 100  # fast path without Fraction
+    # a float by its decimal form, 12.5 -> 25/2
+    factor = 1 - (Fraction(str(percent)) if isinstance(percent, float) else Fraction(percent)) / 100
+    return factor.numerator, factor.denominator
 
 
 class Promotion(ABC):
     """Abstract base class for all promotions.
-    Each promotion must define its own apply_promotion logic.
+    Each promotion must define its own price_cents logic, which prices a line in
+    integer cents and documents how it rounds.
     """
-    
+    __slots__ = ("_version", "_groups", "_shared", "name")
+
     def __init__(self, name):
+        self._version = 0
+        self._groups = None  # WeakSet of the groups containing this promotion, see PromotionGroup
+        self._shared = False  # True for the promotions of shared_promotion(), which can not be changed
         self.name = name
 
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+            return
+        if getattr(self, "_shared", False):
+            raise AttributeError(f"Promotion {self.name} is shared and can not be changed; "
+                                 f"create a new promotion and call set_promotion() instead.")
+        # every change of a parameter (e.g. percent) gives the promotion a new version
+        object.__setattr__(self, name, value)
+        self._changed()
+
+    def _changed(self):
+        """Give the promotion a new version and tell the groups containing it."""
+        # _version and _groups may not be set yet in the __init__ of a subclass
+        object.__setattr__(self, "_version", getattr(self, "_version", 0) + 1)
+        for group in getattr(self, "_groups", None) or ():
+            group._changed()
+
+    def __getstate__(self):
+        # the links to the groups are weak references, which can not be pickled (e.g. for the
+        # worker processes of a ShardedStore); a group links itself again when it is restored
+        state = dict(getattr(self, "__dict__", {}))
+        for cls in type(self).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if name not in ("_groups", "__weakref__") and hasattr(self, name):
+                    state[name] = getattr(self, name)
+        return None, state
+
+    def __setstate__(self, state):
+        for name, value in state[1].items():
+            object.__setattr__(self, name, value)
+        object.__setattr__(self, "_groups", None)
+
+    @property
+    def version(self):
+        """Number that changes whenever a parameter of the promotion changes."""
+        return self._version
+
     @abstractmethod
+    def price_cents(self, unit_cents, quantity):
+        """
+        Return the price of a line in cents.
+
+        :param unit_cents: price of one item in cents (int, or Fraction inside a promotion group)
+        :param quantity: the amount of the product being purchased
+        :return: total price in cents (int)
+        """
+
+    @instrumented("promotion.apply_promotion")
     def apply_promotion(self, product, quantity):
         """
         Apply the promotion logic to a product for a given quantity.
 
         :param product: The product being purchased
         :param quantity: The amount of the product being purchased
-        :return: The final price after applying the promotion
+        :return: The final price after applying the promotion (Money)
+        """
+        return Money(self.price_cents(to_cents(product.price), quantity))
+
+    def apply_promotion_batch(self, prices, quantities):
+        """
+        Apply the promotion to many (price, quantity) pairs in one call.
+        The prices are converted to cents and priced exactly, see apply_promotion_batch_cents().
+
+        :param prices: sequence or array of unit prices
+        :param quantities: sequence or array of quantities, same length as prices
+        :return: final prices as NumPy float array (list if NumPy is not installed)
+        """
+        np = numpy_or_none()
+        if np is not None:
+            return self.apply_promotion_batch_cents(_prices_to_cents(prices), quantities) / 100
+        totals = self.apply_promotion_batch_cents([to_cents(price) for price in prices], quantities)
+        return [total / 100 for total in totals]
+
+    @instrumented("promotion.apply_promotion_batch")
+    def apply_promotion_batch_cents(self, price_cents, quantities):
+        """
+        Apply the promotion to many (price in cents, quantity) pairs in one call.
+        The built-in promotions override this with a vectorized version in machine ints;
+        the default calls price_cents for every pair.
+
+        :param price_cents: sequence or array of unit prices in cents
+        :param quantities: sequence or array of quantities, same length as price_cents
+        :return: final prices in cents as int64 NumPy array (list of int if NumPy is not installed;
+                 object array of ints if a price does not fit into int64)
+        """
+        np = numpy_or_none()
+        price_cents, quantities = _as_cent_columns(price_cents, quantities)
+        totals = [self.price_cents(int(cents), int(quantity)) for cents, quantity in zip(price_cents, quantities)]
+        return _exact_totals(totals) if np is not None else totals
+
+    def pricing_function(self):
         """
-        pass
+        Return a function (unit price in cents, quantity) -> total price in cents for this promotion.
+        Used by promotion groups to combine several promotions.
+        """
+        return self.price_cents
 
 
 class PercentDiscount(Promotion):
-    """Promotion that gives a percentage discount on the total price."""
-    
+    """Promotion that gives a percentage discount on the total price.
+    The line total is rounded half up to cents once, e.g. 3 x 9.99 with 15% off = 25.47.
+    """
+    __slots__ = ("percent",)
+
     def __init__(self, name, percent):
         super().__init__(name)
         self.percent = percent
 
-    def apply_promotion(self, product, quantity):
+    def price_cents(self, unit_cents, quantity):
         """
         Apply a percentage discount to the total price.
 
-        :param product: The product being purchased
+        :param unit_cents: price of one item in cents
         :param quantity: The amount of the product being purchased
-        :return: Discounted total price
+        :return: Discounted total price in cents
+        """
+        numerator, denominator = _remaining_factor(self.percent)
+        return divide_half_up(unit_cents * quantity * numerator, denominator)
+
+    @instrumented("promotion.apply_promotion_batch")
+    def apply_promotion_batch_cents(self, price_cents, quantities):
+        """
+        Apply the percentage discount to many (price in cents, quantity) pairs.
+
+        :param price_cents: sequence or array of unit prices in cents
+        :param quantities: sequence or array of quantities
+        :return: discounted total prices in cents
         """
-        discount = product.price * (self.percent / 100)
-        return (product.price - discount) * quantity
+        np = numpy_or_none()
+        price_cents, quantities = _as_cent_columns(price_cents, quantities)
+        numerator, denominator = _remaining_factor(self.percent)
+        if np is None:
+            return [divide_half_up(cents * quantity * numerator, denominator)
+                    for cents, quantity in zip(price_cents, quantities)]
+        if _fits_int64(price_cents, quantities, 2 * numerator, denominator):
+            return (2 * price_cents * quantities * numerator + denominator) // (2 * denominator)
+        # large amounts, or a float percent like 100 / 3 with a huge numerator: compute in Python ints
+        return _exact_totals([divide_half_up(int(cents) * int(quantity) * numerator, denominator)
+                              for cents, quantity in zip(price_cents, quantities)])
 
 
 class SecondHalfPrice(Promotion):
-    """Promotion where every second item is sold at half price."""
-    
+    """Promotion where every second item is sold at half price.
+    The half price is rounded half up to cents per item, e.g. 9.99 -> 5.00.
+    """
+    __slots__ = ()
+
     def __init__(self, name):
         super().__init__(name)
 
-    def apply_promotion(self, product, quantity):
+    def price_cents(self, unit_cents, quantity):
         """
         Apply a half-price discount to every second item.
 
-        :param product: The product being purchased
+        :param unit_cents: price of one item in cents
         :param quantity: The amount of the product being purchased
-        :return: Discounted total price
+        :return: Discounted total price in cents
         """
         full_price_items = quantity // 2 + quantity % 2
         half_price_items = quantity // 2
-        return (full_price_items * product.price) + (half_price_items * product.price * 0.5)
+        return divide_half_up(full_price_items * unit_cents) + half_price_items * divide_half_up(unit_cents, 2)
+
+    @instrumented("promotion.apply_promotion_batch")
+    def apply_promotion_batch_cents(self, price_cents, quantities):
+        """
+        Apply the half-price discount to many (price in cents, quantity) pairs.
+
+        :param price_cents: sequence or array of unit prices in cents
+        :param quantities: sequence or array of quantities
+        :return: discounted total prices in cents
+        """
+        np = numpy_or_none()
+        price_cents, quantities = _as_cent_columns(price_cents, quantities)
+        if np is not None and _fits_int64(price_cents, quantities, 2, 1):
+            half_price_items = quantities // 2
+            full_price_items = half_price_items + quantities % 2
+            return full_price_items * price_cents + half_price_items * ((price_cents + 1) // 2)
+        totals = [(quantity // 2 + quantity % 2) * cents + quantity // 2 * ((cents + 1) // 2)
+                  for cents, quantity in zip(map(int, price_cents), map(int, quantities))]
+        return _exact_totals(totals) if np is not None else totals
 
 
 class ThirdOneFree(Promotion):
-    """Promotion where every third item is free (3 for 2 deal)."""
-    
+    """Promotion where every third item is free (3 for 2 deal). Needs no rounding."""
+    __slots__ = ()
+
     def __init__(self, name):
         super().__init__(name)
 
-    def apply_promotion(self, product, quantity):
+    def price_cents(self, unit_cents, quantity):
         """
         Apply a '3 for 2' discount—every third item is free.
 
-        :param product: The product being purchased
+        :param unit_cents: price of one item in cents
         :param quantity: The amount of the product being purchased
-        :return: Discounted total price
+        :return: Discounted total price in cents
         """
         chargeable_items = quantity - (quantity // 3)
-        return chargeable_items * product.price
+        return divide_half_up(chargeable_items * unit_cents)
+
+    @instrumented("promotion.apply_promotion_batch")
+    def apply_promotion_batch_cents(self, price_cents, quantities):
+        """
+        Apply the '3 for 2' discount to many (price in cents, quantity) pairs.
+
+        :param price_cents: sequence or array of unit prices in cents
+        :param quantities: sequence or array of quantities
+        :return: discounted total prices in cents
+        """
+        np = numpy_or_none()
+        price_cents, quantities = _as_cent_columns(price_cents, quantities)
+        if np is not None and _fits_int64(price_cents, quantities, 1):
+            return (quantities - quantities // 3) * price_cents
+        totals = [(quantity - quantity // 3) * cents
+                  for cents, quantity in zip(map(int, price_cents), map(int, quantities))]
+        return _exact_totals(totals) if np is not None else totals
+
+
+class PromotionGroup(Promotion):
+    """Base class for promotions made of other promotions.
+    The group is compiled once into a single pricing function, which is cached,
+    so pricing a line does not walk the rules again. Groups can not be changed
+    after creation; create a new group and call set_promotion() instead.
+    If one of the promotions in the group changes, it tells the group, which gets
+    a new version and is compiled again when it is used the next time.
+    """
+    __slots__ = ("promotions", "_pricing", "__weakref__")
+
+    def __init__(self, name, promotions):
+        super().__init__(name)
+        if not promotions or not all(isinstance(promotion, Promotion) for promotion in promotions):
+            raise ValueError("A promotion group needs a list of promotions.")
+        self.promotions = tuple(promotions)
+        self._pricing = None
+        self._link_promotions()
+
+    def _link_promotions(self):
+        """Register the group with its promotions, so a change of one of them reaches the group."""
+        for promotion in self.promotions:
+            if promotion._groups is None:
+                object.__setattr__(promotion, "_groups", weakref.WeakSet())
+            promotion._groups.add(self)
+
+    def __getstate__(self):
+        # the compiled pricing function is a closure, which can not be pickled either;
+        # it is compiled again when it is used
+        state = super().__getstate__()
+        state[1].pop("_pricing", None)
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        object.__setattr__(self, "_pricing", None)
+        self._link_promotions()
+
+    def _changed(self):
+        object.__setattr__(self, "_pricing", None)
+        super()._changed()
+
+    @abstractmethod
+    def compile(self):
+        """Combine the promotions into one pricing function (unit price in cents, quantity) -> total in cents."""
+
+    def pricing_function(self):
+        pricing = self._pricing
+        if pricing is None:
+            version = self._version
+            pricing = self.compile()
+            if self._version == version:  # keep it only if no promotion changed while compiling
+                object.__setattr__(self, "_pricing", pricing)
+        return pricing
+
+    def price_cents(self, unit_cents, quantity):
+        """
+        Apply the combined promotions.
+
+        :param unit_cents: price of one item in cents
+        :param quantity: The amount of the product being purchased
+        :return: Discounted total price in cents
+        """
+        return self.pricing_function()(unit_cents, quantity)
+
+
+class StackedPromotion(PromotionGroup):
+    """Ordered group: every promotion is applied to the result of the previous one,
+    e.g. "3 for 2" and then 10% off everything. A promotion sees the price per item
+    after the previous promotions (total / quantity, exact) as unit price.
+    The line total is rounded to cents after every step; consecutive percent
+    discounts are combined into one exact factor and rounded once.
+    """
+    __slots__ = ()
+
+    def compile(self):
+        steps = []
+        for promotion in self.promotions:
+            if isinstance(promotion, PercentDiscount):
+                factor = Fraction(*_remaining_factor(promotion.percent))
+                if steps and isinstance(steps[-1], Fraction):
+                    # consecutive percent discounts fold into one factor
+                    steps[-1] *= factor
+                else:
+                    steps.append(factor)
+            else:
+                steps.append(promotion.pricing_function())
+        # a factor as (numerator, denominator) ints, a promotion as its pricing function
+        steps = tuple((step.numerator, step.denominator) if isinstance(step, Fraction) else step
+                      for step in steps)
+
+        def pricing(unit_cents, quantity):
+            if not quantity:
+                return 0
+            unit_price = unit_cents
+            for step in steps:
+                if isinstance(step, tuple):
+                    total = divide_half_up(unit_price * quantity * step[0], step[1])
+                else:
+                    total = step(unit_price, quantity)
+                # exact price per item for the next step, an int whenever possible
+                unit_price = total // quantity if total % quantity == 0 else Fraction(total, quantity)
+            return total
+
+        if len(steps) == 1 and not isinstance(steps[0], tuple):
+            return steps[0]
+        return pricing
+
+
+class BestPromotion(PromotionGroup):
+    """Exclusive group: only the promotion giving the lowest price is applied."""
+    __slots__ = ()
+
+    def compile(self):
+        functions = tuple(promotion.pricing_function() for promotion in self.promotions)
+        if len(functions) == 1:
+            return functions[0]
+        return lambda unit_cents, quantity: min(function(unit_cents, quantity) for function in functions)
+
+
+# registry of shared promotions, see shared_promotion()
+_shared_promotions = {}
+
+
+def shared_promotion(promotion_class, *args, **kwargs):
+    """
+    Return a promotion that is shared by all callers with the same type and parameters (flyweight).
+    Hundreds of products with the same deal then use one promotion object, also across stores,
+    snapshots and imports. Shared promotions can not be changed: setting a parameter raises
+    AttributeError, so a change can not reach the other users of the promotion.
+
+    :param promotion_class: PercentDiscount, SecondHalfPrice, ThirdOneFree or another Promotion class
+    :return: the shared promotion
+    """
+    key = (promotion_class, args, tuple(sorted(kwargs.items())))
+    promotion = _shared_promotions.get(key)
+    if promotion is None:
+        promotion = promotion_class(*args, **kwargs)
+        object.__setattr__(promotion, "_shared", True)
+        promotion = _shared_promotions.setdefault(key, promotion)
+    return promotion
@@ -0,0 +1,188 @@
+"""
+Stock reservations for shopping carts.
+
+A reservation holds stock for a cart until it is checked out, released or expires.
+The book keeps the reserved amount of every product up to date, so the available
+stock (quantity - reserved) is known without looking at the carts. Expiry times are
+kept in a heap and expired reservations are removed lazily, whenever the book is used.
+"""
+from contextlib import nullcontext
+import heapq
+import itertools
+import threading
+import time
+
+from products import NonStockedProduct
+
+
+class Reservation:
+    """Stock held for one cart."""
+    __slots__ = ("id", "lines", "amounts", "expires_at", "active")
+
+    def __init__(self, reservation_id, expires_at):
+        self.id = reservation_id
+        self.lines = []  # (Product, quantity) tuples in the order they were reserved
+        self.amounts = {}  # product -> reserved quantity
+        self.expires_at = expires_at
+        self.active = True  # False after checkout, release or expiry
+
+    def amount(self, product):
+        """Return the quantity of a product in the reservation."""
+        return self.amounts.get(product, 0)
+
+    def __repr__(self):
+        return f"Reservation(id={self.id}, lines={len(self.lines)}, active={self.active})"
+
+
+class ReservationBook:
+    """All open reservations of a store and the reserved quantity per product."""
+
+    def __init__(self, clock=time.monotonic, thread_safe=False):
+        """
+        :param clock: function returning the current time in seconds (replaceable in tests)
+        :param thread_safe: if True, the book may be used from several threads at once
+        """
+        self.clock = clock
+        self._lock = threading.Lock() if thread_safe else nullcontext()
+        self._reserved = {}  # product -> quantity reserved by all open reservations
+        self._open = {}  # reservation id -> Reservation
+        self._expiries = []  # heap of (expires_at, reservation id), may contain outdated entries
+        self._ids = itertools.count(1)
+
+    def __len__(self):
+        """Number of open reservations (expired ones may still be counted until the next call)."""
+        return len(self._open)
+
+    def reserved(self, product):
+        """Return the quantity of a product held by open reservations."""
+        with self._lock:
+            self._expire()
+            return self._reserved.get(product, 0)
+
+    def available(self, product):
+        """Return the stock of a product that is not reserved."""
+        with self._lock:
+            self._expire()
+            return product.quantity - self._reserved.get(product, 0)
+
+    def reserve(self, shopping_list, ttl, reservation=None):
+        """
+        Reserve stock for a list of (Product, quantity) tuples. Either all lines are
+        reserved or none.
+
+        :param shopping_list: list of (Product, quantity) tuples
+        :param ttl: seconds until the reservation expires, counted from now
+        :param reservation: open reservation to add the lines to (its expiry is renewed),
+                            None for a new reservation
+        :return: the reservation
+        :raises Exception: if a line can not be reserved
+        """
+        if ttl <= 0:
+            raise ValueError("ttl must be positive.")
+        with self._lock:
+            self._expire()
+            if reservation is not None and not reservation.active:
+                raise Exception("Reservation expired or already checked out.")
+            amounts = {}
+            for product, quantity in shopping_list:
+                if not isinstance(quantity, int) or quantity <= 0:
+                    raise Exception(f"Error reserving product {product.name}: Amount must be a positive integer.")
+                amounts[product] = amounts.get(product, 0) + quantity
+            for product, amount in amounts.items():
+                held = reservation.amount(product) if reservation is not None else 0
+                try:
+                    # the whole reservation must be a valid purchase, e.g. for LimitedProduct.maximum
+                    product.validate_purchase(held + amount)
+                    if (not isinstance(product, NonStockedProduct) and
+                            amount > product.quantity - self._reserved.get(product, 0)):
+                        raise ValueError("Not enough quantity in stock.")
+                except Exception as e:
+                    raise Exception(f"Error reserving product {product.name}: {e}") from e
+
+            expires_at = self.clock() + ttl
+            if reservation is None:
+                reservation = Reservation(next(self._ids), expires_at)
+                self._open[reservation.id] = reservation
+            reservation.expires_at = expires_at
+            heapq.heappush(self._expiries, (expires_at, reservation.id))
+            reservation.lines.extend(shopping_list)
+            for product, amount in amounts.items():
+                reservation.amounts[product] = reservation.amount(product) + amount
+                if not isinstance(product, NonStockedProduct):
+                    self._reserved[product] = self._reserved.get(product, 0) + amount
+            return reservation
+
+    def check(self, product, amount, reservation=None):
+        """
+        Check that an amount of a product can be ordered without taking reserved stock.
+
+        :param product: product to order
+        :param amount: quantity to order
+        :param reservation: reservation the order checks out, its stock may be used
+        :raises ValueError: if the amount is larger than the available stock, or the
+                            reservation was already checked out, released or expired
+        """
+        if reservation is None and (isinstance(product, NonStockedProduct) or not self._reserved):
+            return  # without reservations, all stock is available
+        with self._lock:
+            self._expire()
+            if reservation is not None and not reservation.active:
+                raise ValueError("Reservation expired or already checked out.")
+            if isinstance(product, NonStockedProduct):
+                return
+            reserved = self._reserved.get(product, 0)
+            if reservation is not None:
+                reserved -= reservation.amount(product)
+            if amount > product.quantity - reserved:
+                raise ValueError("Not enough quantity in stock.")
+
+    def check_open(self, reservation):
+        """
+        Check that a reservation can still be checked out.
+
+        :raises Exception: if the reservation was already checked out, released or expired
+        """
+        with self._lock:
+            self._expire()
+            if not reservation.active:
+                raise Exception("Reservation expired or already checked out.")
+
+    def release(self, reservation) -> None:
+        """Give the stock of a reservation back (after checkout or when the cart is abandoned)."""
+        with self._lock:
+            self._release(reservation)
+
+    def expire(self):
+        """
+        Release all reservations whose time is over.
+
+        :return: number of released reservations
+        """
+        with self._lock:
+            return self._expire()
+
+    def _expire(self):
+        now = self.clock()
+        expiries = self._expiries
+        count = 0
+        while expiries and expiries[0][0] <= now:
+            expires_at, reservation_id = heapq.heappop(expiries)
+            reservation = self._open.get(reservation_id)
+            # skip entries of released reservations and entries replaced by a renewal
+            if reservation is not None and reservation.expires_at == expires_at:
+                self._release(reservation)
+                count += 1
+        return count
+
+    def _release(self, reservation):
+        if self._open.pop(reservation.id, None) is None:
+            return
+        reservation.active = False
+        for product, amount in reservation.amounts.items():
+            if isinstance(product, NonStockedProduct):
+                continue
+            reserved = self._reserved[product] - amount
+            if reserved:
+                self._reserved[product] = reserved
+            else:
+                del self._reserved[product]
@@ -0,0 +1,337 @@
+"""
+Store split over several worker processes, so orders can use more than one CPU core.
+
+Every product belongs to one shard, chosen by the CRC32 of its name. Each shard is a
+worker process with its own Store; the ShardedStore in the main process routes the
+lines of a shopping list to the shards over pipes:
+
+- an order with all lines on one shard is sent to that shard as one message (fast path)
+- an order over several shards uses two-phase commit: every shard prepares its part
+  (validates, prices and removes the stock, keeping an undo log), then all shards
+  commit, or all prepared shards abort and restore the stock if one shard failed
+- get_total_quantity() and get_all_products() ask all shards at once and combine
+  the answers (scatter-gather)
+
+Products returned by the ShardedStore are copies; changing them does not change the
+stock in the shards. Basket promotions are not supported in sharded mode.
+"""
+import itertools
+import multiprocessing
+import threading
+import zlib
+
+from products import Product, to_row, from_row
+from store import Store
+
+
+def shard_of(name, shards):
+    """
+    Return the shard of a product name.
+
+    :param name: name of the product
+    :param shards: number of shards
+    :return: shard number from 0 to shards - 1
+    """
+    return zlib.crc32(name.encode("utf-8")) % shards
+
+
+class _ShardWorker:
+    """The Store of one shard and the commands it understands. Runs in the worker process."""
+
+    def __init__(self, rows):
+        self.store = Store([from_row(row) for row in rows])
+        self.prepared = {}  # transaction id -> undo log of (product, removed amount, was active)
+
+    def _shopping_list(self, lines):
+        """Turn (name, quantity) lines into (Product, quantity) tuples."""
+        shopping_list = []
+        for name, quantity in lines:
+            product = self.store.get_product(name)
+            if product is None:
+                raise Exception(f"Error ordering product {name}: Product not found in the store.")
+            shopping_list.append((product, quantity))
+        return shopping_list
+
+    def order(self, lines):
+        return self.store.order(self._shopping_list(lines))
+
+    def orders(self, orders):
+        """Execute many orders, return (True, total) or (False, exception) for each."""
+        results = []
+        for lines in orders:
+            try:
+                results.append((True, self.order(lines)))
+            except Exception as e:
+                results.append((False, e))
+        return results
+
+    def prepare(self, argument):
+        """Execute the shard's part of a cross-shard order and keep an undo log until commit or abort."""
+        transaction, lines = argument
+        shopping_list = self._shopping_list(lines)
+        before = {product: (product.quantity, product.active) for product, _ in shopping_list}
+        total = self.store.order(shopping_list)
+        # the removed amounts, not the old quantities: orders placed on this shard
+        # between prepare and abort must stay
+        self.prepared[transaction] = [(product, quantity - product.quantity, active)
+                                      for product, (quantity, active) in before.items()]
+        return total
+
+    def commit(self, transaction):
+        del self.prepared[transaction]
+
+    def abort(self, transaction):
+        for product, amount, active in self.prepared.pop(transaction):
+            product.quantity += amount
+            if active and amount:
+                product.active = True
+
+    def total_quantity(self, _):
+        return self.store.get_total_quantity()
+
+    def active_products(self, _):
+        return [to_row(product) for product in self.store.get_all_products()]
+
+    def products(self, _):
+        return [to_row(product) for product in self.store.products]
+
+    def get_product(self, name):
+        product = self.store.get_product(name)
+        return to_row(product) if product is not None else None
+
+    def add_product(self, row):
+        self.store.add_product(from_row(row))
+
+    def remove_product(self, name):
+        product = self.store.get_product(name)
+        if product is None:
+            raise ValueError("Product not found in the list.")
+        self.store.remove_product(product)
+
+
+def _serve(connection, rows):
+    """Main loop of a worker process: execute commands until "stop" is received."""
+    worker = _ShardWorker(rows)
+    while True:
+        command, argument = connection.recv()
+        if command == "stop":
+            break
+        try:
+            connection.send((True, getattr(worker, command)(argument)))
+        except Exception as e:
+            connection.send((False, e))
+    connection.close()
+
+
+class _Shard:
+    """Connection of the main process to one worker process."""
+
+    def __init__(self, context, rows):
+        self.connection, worker_connection = context.Pipe()
+        self.process = context.Process(target=_serve, args=(worker_connection, rows), daemon=True)
+        self.process.start()
+        worker_connection.close()
+        self.lock = threading.Lock()  # one request at a time per pipe
+
+
+class ShardedStore:
+    """Store whose products are split over several worker processes (see module docstring)."""
+
+    def __init__(self, products, workers=4, start_method=None):
+        """
+        Start the worker processes and hand every product to its shard.
+
+        :param products: list of Product objects
+        :param workers: number of worker processes (shards)
+        :param start_method: multiprocessing start method ("fork", "spawn", ...), None for the default
+        """
+        if not isinstance(products, list):
+            raise TypeError("Expected a list of products.")
+        if not isinstance(workers, int) or workers <= 0:
+            raise ValueError("workers must be a positive integer.")
+        rows = [[] for _ in range(workers)]
+        names = set()
+        for product in products:
+            if not isinstance(product, Product):
+                raise TypeError("All items must be Product objects.")
+            if product.name in names:
+                raise ValueError(f"Product {product.name} already exists in the store.")
+            names.add(product.name)
+            rows[shard_of(product.name, workers)].append(to_row(product))
+
+        context = multiprocessing.get_context(start_method)
+        self._shards = [_Shard(context, shard_rows) for shard_rows in rows]
+        self._transactions = itertools.count()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    @property
+    def workers(self):
+        """Number of worker processes."""
+        return len(self._shards)
+
+    def close(self) -> None:
+        """Stop all worker processes."""
+        for shard in self._shards:
+            with shard.lock:
+                if shard.process.is_alive():
+                    shard.connection.send(("stop", None))
+                shard.connection.close()
+        for shard in self._shards:
+            shard.process.join()
+        self._shards = []
+
+    def _call(self, shard, command, argument=None):
+        """Send one command to a shard and return its result."""
+        shard = self._shards[shard]
+        with shard.lock:
+            shard.connection.send((command, argument))
+            ok, result = shard.connection.recv()
+        if not ok:
+            raise result
+        return result
+
+    def _scatter(self, commands):
+        """
+        Send commands to several shards at once and wait for all answers.
+
+        :param commands: dict shard -> (command, argument)
+        :return: dict shard -> (ok, result)
+        """
+        shards = sorted(commands)
+        # the shard locks are always taken in shard order, so two callers can not deadlock
+        for shard in shards:
+            self._shards[shard].lock.acquire()
+        try:
+            for shard in shards:
+                self._shards[shard].connection.send(commands[shard])
+            return {shard: self._shards[shard].connection.recv() for shard in shards}
+        finally:
+            for shard in shards:
+                self._shards[shard].lock.release()
+
+    def _split(self, shopping_list):
+        """Group the lines of a shopping list by shard: dict shard -> list of (name, quantity)."""
+        Store._check_shopping_list(shopping_list)
+        lines = {}
+        for product, quantity in shopping_list:
+            lines.setdefault(shard_of(product.name, len(self._shards)), []).append((product.name, quantity))
+        return lines
+
+    def order(self, shopping_list):
+        """
+        Order a list of (Product, quantity) tuples and return the total price.
+        The order is all-or-nothing, also if its lines are on several shards.
+
+        :param shopping_list: list of (Product, quantity) tuples
+        :return: total price of the order
+        :raises Exception: if a product can not be ordered
+        """
+        lines = self._split(shopping_list)
+        if not lines:
+            return 0
+        if len(lines) == 1:
+            (shard, shard_lines), = lines.items()
+            return self._call(shard, "order", shard_lines)
+        return self._order_across_shards(lines)
+
+    def _order_across_shards(self, lines):
+        """Two-phase commit of an order with lines on several shards."""
+        transaction = next(self._transactions)
+        results = self._scatter({shard: ("prepare", (transaction, shard_lines))
+                                 for shard, shard_lines in lines.items()})
+        prepared = [shard for shard, (ok, _) in results.items() if ok]
+        if len(prepared) == len(results):
+            self._scatter({shard: ("commit", transaction) for shard in prepared})
+            return sum(total for _, total in results.values())
+        if prepared:
+            self._scatter({shard: ("abort", transaction) for shard in prepared})
+        raise next(result for ok, result in results.values() if not ok)
+
+    def order_many(self, shopping_lists):
+        """
+        Order many shopping lists. Orders on a single shard are sent to all shards
+        in one batch each, so the shards work on them in parallel.
+
+        :param shopping_lists: list of shopping lists
+        :return: list with the total price of every order, or the Exception if it failed
+        """
+        results = [None] * len(shopping_lists)
+        batches = {}  # shard -> (order numbers, lines of every order)
+        across_shards = []
+        for number, shopping_list in enumerate(shopping_lists):
+            lines = self._split(shopping_list)
+            if len(lines) == 1:
+                (shard, shard_lines), = lines.items()
+                numbers, orders = batches.setdefault(shard, ([], []))
+                numbers.append(number)
+                orders.append(shard_lines)
+            elif lines:
+                across_shards.append((number, lines))
+            else:
+                results[number] = 0
+
+        answers = self._scatter({shard: ("orders", orders) for shard, (_, orders) in batches.items()})
+        for shard, (ok, shard_results) in answers.items():
+            if not ok:
+                raise shard_results
+            for number, (_, result) in zip(batches[shard][0], shard_results):
+                results[number] = result
+
+        for number, lines in across_shards:
+            try:
+                results[number] = self._order_across_shards(lines)
+            except Exception as e:
+                results[number] = e
+        return results
+
+    def _gather(self, command):
+        """Send a command to all shards and return their results in shard order."""
+        answers = self._scatter({shard: (command, None) for shard in range(len(self._shards))})
+        results = []
+        for shard in range(len(self._shards)):
+            ok, result = answers[shard]
+            if not ok:
+                raise result
+            results.append(result)
+        return results
+
+    @property
+    def products(self):
+        """List of copies of all products in the store (active and inactive)."""
+        return [from_row(row) for rows in self._gather("products") for row in rows]
+
+    def add_product(self, product):
+        """Add a product to its shard"""
+        if not isinstance(product, Product):
+            raise TypeError("All items must be Product objects.")
+        self._call(shard_of(product.name, len(self._shards)), "add_product", to_row(product))
+
+    def remove_product(self, product):
+        """Remove a product from its shard"""
+        name = getattr(product, "name", None)
+        if not isinstance(name, str):
+            raise ValueError("Product not found in the list.")
+        self._call(shard_of(name, len(self._shards)), "remove_product", name)
+
+    def get_product(self, name):
+        """
+        Look up a product by its name.
+
+        :param name: name of the product
+        :return: copy of the product or None if the store has no product with this name
+        """
+        row = self._call(shard_of(name, len(self._shards)), "get_product", name)
+        return from_row(row) if row is not None else None
+
+    def get_total_quantity(self):
+        """Returns the sum of all Products."""
+        return sum(self._gather("total_quantity"))
+
+    def get_all_products(self):
+        """Returns a list of copies of all active products"""
+        return [from_row(row) for rows in self._gather("active_products") for row in rows]
@@ -0,0 +1,236 @@
+"""
+Binary inventory snapshots.
+
+A snapshot file has four parts:
+1. a fixed header (magic, version, number of group members, number of rows, number of
+   promotions, size of the string table)
+2. the record table: one fixed-width record per product, stored column by column
+   (price, quantity, maximum, name offset, promotion id, active flag, kind) plus
+   the rows sorted by name, so a product can be found without reading all names
+3. the promotion table: one fixed-width record per promotion; a promotion group
+   (StackedPromotion, BestPromotion) comes after the promotions it contains
+4. the member table: the promotion ids of the members of every group, in the order
+   of the groups in the promotion table
+5. the string table with the UTF-8 names of products and promotions
+
+load() memory-maps the file and uses the columns in place, so opening a snapshot
+with millions of products does not parse the products up front.
+"""
+import mmap
+import struct
+from array import array
+
+from columnar import ColumnarInventory, ColumnarStore
+from promotions import (PercentDiscount, SecondHalfPrice, ThirdOneFree, StackedPromotion, BestPromotion,
+                        shared_promotion)
+
+MAGIC = b"BBSNAP\0\0"
+VERSION = 2  # version 1 had no promotion groups, it is read as well
+HEADER = struct.Struct("<8sIIQQQ")  # magic, version, group members, rows, promotions, string table size
+PROMOTION_RECORD = struct.Struct("<qdQQ")  # promotion type, percent or number of members, name start, name end
+MEMBER_TYPECODE = "i"
+
+# promotion types in the promotion table
+PROMOTION_TYPES = {PercentDiscount: 1, SecondHalfPrice: 2, ThirdOneFree: 3, StackedPromotion: 4, BestPromotion: 5}
+GROUP_TYPES = (StackedPromotion, BestPromotion)
+
+# record table columns: (name, array type code)
+COLUMNS = (
+    ("prices", "d"),
+    ("quantities", "q"),
+    ("maximums", "q"),
+    ("name_ends", "Q"),  # end of every name in the string table, a name starts where the previous ends
+    ("sorted_rows", "q"),  # rows sorted by name
+    ("promotion_ids", "i"),
+    ("active", "b"),
+    ("kinds", "b"),
+)
+
+
+def _align(offset):
+    """Round an offset up to a multiple of 8 bytes."""
+    return (offset + 7) & ~7
+
+
+def _layout(rows, promotions, members):
+    """Return the offset of every column, of the promotion table, the member table and the string table."""
+    offsets = {}
+    offset = HEADER.size
+    for column, typecode in COLUMNS:
+        offsets[column] = offset
+        offset = _align(offset + rows * array(typecode).itemsize)
+    offsets["promotions"] = offset
+    offsets["members"] = _align(offset + promotions * PROMOTION_RECORD.size)
+    offsets["strings"] = _align(offsets["members"] + members * array(MEMBER_TYPECODE).itemsize)
+    return offsets
+
+
+def save(store, path):
+    """
+    Write all products of a store to a snapshot file.
+
+    :param store: Store or ColumnarStore
+    :param path: file to write
+    :raises ValueError: if a product has a promotion type that can not be stored
+    """
+    inventory = getattr(store, "inventory", None)
+    if inventory is None:
+        inventory = ColumnarInventory()
+        for product in store.products:
+            inventory.add_product(product)
+    rows = inventory.rows()
+
+    strings = bytearray()
+    name_ends = array("Q")
+    encoded_names = []
+    for row in rows:
+        name = inventory.names[row].encode("utf-8")
+        encoded_names.append(name)
+        strings += name
+        name_ends.append(len(strings))
+    sorted_rows = array("q", sorted(range(len(rows)), key=encoded_names.__getitem__))
+
+    # only store promotions that are used, and renumber them
+    promotion_ids = array("i")
+    new_ids = {}
+    promotion_records = []
+    members = array(MEMBER_TYPECODE)
+
+    def add_promotion(promotion):
+        """Add a promotion (after the members of a group) to the tables, return its new id."""
+        if promotion in new_ids:
+            return new_ids[promotion]
+        promotion_type = PROMOTION_TYPES.get(type(promotion))
+        if promotion_type is None:
+            raise ValueError(f"Promotion type {type(promotion).__name__} can not be saved.")
+        if isinstance(promotion, GROUP_TYPES):
+            member_ids = [add_promotion(member) for member in promotion.promotions]
+            members.extend(member_ids)
+            number = float(len(member_ids))
+        else:
+            number = float(getattr(promotion, "percent", 0))
+        start = len(strings)
+        strings.extend(promotion.name.encode("utf-8"))
+        promotion_records.append(PROMOTION_RECORD.pack(promotion_type, number, start, len(strings)))
+        new_ids[promotion] = len(new_ids)
+        return new_ids[promotion]
+
+    for row in rows:
+        old_id = inventory.promotion_ids[row]
+        promotion_ids.append(add_promotion(inventory.promotions[old_id]) if old_id >= 0 else -1)
+
+    columns = {
+        "prices": array("d", (inventory.prices[row] for row in rows)),
+        "quantities": array("q", (inventory.quantities[row] for row in rows)),
+        "maximums": array("q", (inventory.maximums[row] for row in rows)),
+        "name_ends": name_ends,
+        "sorted_rows": sorted_rows,
+        "promotion_ids": promotion_ids,
+        "active": array("b", (inventory.active[row] for row in rows)),
+        "kinds": array("b", (inventory.kinds[row] for row in rows)),
+    }
+    offsets = _layout(len(rows), len(promotion_records), len(members))
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(members), len(rows), len(promotion_records), len(strings)))
+        for column, _ in COLUMNS:
+            _write_at(file, offsets[column], columns[column].tobytes())
+        _write_at(file, offsets["promotions"], b"".join(promotion_records))
+        _write_at(file, offsets["members"], members.tobytes())
+        _write_at(file, offsets["strings"], bytes(strings))
+
+
+def _write_at(file, offset, data):
+    """Pad the file with zeros up to offset and write data."""
+    file.write(b"\0" * (offset - file.tell()))
+    file.write(data)
+
+
+def load(path, thread_safe=False):
+    """
+    Open a snapshot file as a ColumnarStore.
+    The file is memory-mapped copy-on-write: orders change the store, never the file.
+
+    :param path: snapshot file
+    :param thread_safe: passed to the store
+    :return: ColumnarStore with the products of the snapshot
+    :raises ValueError: if the file is not a snapshot
+    """
+    with open(path, "rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+    if len(mapped) < HEADER.size:
+        raise ValueError("Not a snapshot file.")
+    magic, version, member_count, rows, promotions, strings_size = HEADER.unpack_from(mapped, 0)
+    if magic != MAGIC or version not in (1, VERSION):
+        raise ValueError("Not a snapshot file or unsupported version.")
+    offsets = _layout(rows, promotions, member_count)
+    if len(mapped) < offsets["strings"] + strings_size:
+        raise ValueError("Snapshot file is truncated.")
+
+    buffer = memoryview(mapped)
+    columns = {}
+    for column, typecode in COLUMNS:
+        start = offsets[column]
+        columns[column] = buffer[start:start + rows * array(typecode).itemsize].cast(typecode)
+    strings = buffer[offsets["strings"]:offsets["strings"] + strings_size]
+
+    inventory = ColumnarInventory()
+    inventory.names = SnapshotNames(strings, columns["name_ends"], columns["sorted_rows"])
+    inventory._index = None
+    for column in ("prices", "quantities", "maximums", "promotion_ids", "active", "kinds"):
+        setattr(inventory, column, columns[column])
+    inventory._removed = 0  # save() does not write removed rows
+
+    members = buffer[offsets["members"]:offsets["strings"]].cast(MEMBER_TYPECODE)[:member_count]
+    next_member = 0
+    promotion_classes = {number: cls for cls, number in PROMOTION_TYPES.items()}
+    for number in range(promotions):
+        promotion_type, value, start, end = PROMOTION_RECORD.unpack_from(
+            mapped, offsets["promotions"] + number * PROMOTION_RECORD.size)
+        name = bytes(strings[start:end]).decode("utf-8")
+        promotion_class = promotion_classes[promotion_type]
+        if promotion_class in GROUP_TYPES:
+            member_ids = members[next_member:next_member + int(value)]
+            next_member += int(value)
+            promotion = promotion_class(name, [inventory.promotions[member] for member in member_ids])
+        elif promotion_class is PercentDiscount:
+            percent = int(value) if value.is_integer() else value
+            promotion = shared_promotion(PercentDiscount, name, percent=percent)
+        else:
+            promotion = shared_promotion(promotion_class, name)
+        # the promotion ids of the rows are the record numbers, even if two records share a promotion
+        inventory.promotions.append(promotion)
+        inventory._promotion_ids.setdefault(promotion, number)
+    return ColumnarStore(inventory=inventory, thread_safe=thread_safe)
+
+
+class SnapshotNames:
+    """Product names of a snapshot, decoded from the string table when they are used."""
+
+    def __init__(self, strings, name_ends, sorted_rows):
+        self._strings = strings
+        self._name_ends = name_ends
+        self._sorted_rows = sorted_rows
+
+    def __len__(self):
+        return len(self._name_ends)
+
+    def __getitem__(self, row):
+        return self._encoded(row).decode("utf-8")
+
+    def _encoded(self, row):
+        start = self._name_ends[row - 1] if row > 0 else 0
+        return bytes(self._strings[start:self._name_ends[row]])
+
+    def find(self, name):
+        """Binary search for a name, return its row or None."""
+        encoded = name.encode("utf-8")
+        low, high = 0, len(self._sorted_rows)
+        while low < high:
+            middle = (low + high) // 2
+            if self._encoded(self._sorted_rows[middle]) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._sorted_rows) and self._encoded(self._sorted_rows[low]) == encoded:
+            return self._sorted_rows[low]
+        return None
@@ -1,48 +1,648 @@
-from products import Product
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+import itertools
+import logging
+import threading
+
+from basket import BasketRules, Receipt
+from catalog_index import CatalogIndex, LowStockWatches
+from instrumentation import instrumented
+from locks import stock_locks
+from money import Money, to_cents
+from products import Product, to_row
+from reservations import ReservationBook
+from versions import InventoryVersions
+
+logger = logging.getLogger(__name__)
+
+
+class QuoteCache:
+    """LRU cache of priced lines.
+    A line is stored under (product, product version, quantity, promotion, promotion version),
+    so a change of price, promotion or stock creates a new key and an old price is never
+    returned. Old keys are dropped when the cache is full.
+    """
+
+    def __init__(self, maxsize=10_000):
+        """
+        :param maxsize: maximum number of cached lines (0 disables the cache)
+        """
+        if not isinstance(maxsize, int) or maxsize < 0:
+            raise ValueError("maxsize must be a non-negative integer.")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lines = OrderedDict()  # key -> line total, least recently used first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._lines)
+
+    @staticmethod
+    def key(product, quantity):
+        """Return the cache key of a line."""
+        promotion = product.promotion
+        return (product, product.version, quantity, promotion,
+                promotion.version if promotion is not None else 0)
+
+    def get_many(self, keys):
+        """
+        Look up many lines at once.
+
+        :param keys: list of keys from key()
+        :return: list with the cached total or None for every key
+        """
+        lines = self._lines
+        totals = []
+        with self._lock:
+            for key in keys:
+                total = lines.get(key)
+                if total is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    lines.move_to_end(key)
+                totals.append(total)
+        return totals
+
+    def put_many(self, items):
+        """
+        Store priced lines.
+
+        :param items: iterable of (key, total) pairs
+        """
+        if not self.maxsize:
+            return
+        lines = self._lines
+        with self._lock:
+            for key, total in items:
+                lines[key] = total
+                lines.move_to_end(key)
+            while len(lines) > self.maxsize:
+                lines.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all lines and reset the counters."""
+        with self._lock:
+            self._lines.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        """Return hits, misses, current size and maximum size as a dict."""
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._lines), "maxsize": self.maxsize}
+
+
+class ProductIterator:
+    """Lazy iterator over the products of a store, see Store.iter_products().
+    After every product, cursor is the position to continue from (the `after` of the next page).
+    """
+    __slots__ = ("_entries", "cursor")
+
+    def __init__(self, entries, cursor):
+        self._entries = entries  # iterator of (position, product)
+        self.cursor = cursor
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        position, product = next(self._entries)
+        self.cursor = position
+        return product
+
+
 class Store:
     """This class represents a store that holds and manages a list of products."""
 
-    def __init__(self, products):
-        """Initialize the store with a list of products"""
+    def __init__(self, products, thread_safe=False, quote_cache_size=10_000):
+        """
+        Initialize the store with a list of products
+
+        :param products: list of Product objects
+        :param thread_safe: if True, orders may be placed from several threads at once
+        :param quote_cache_size: number of priced lines kept for quote() and order() (0 = no cache)
+        """
         # Check that products is a list
         if not isinstance(products, list):
             raise TypeError("Expected a list of products.")
 
-        # Check that all elements in the list are Product instances
-        for product in products:
-            if not isinstance(product, Product):
-                raise TypeError("All items must be Product objects.")
+        self.thread_safe = thread_safe
+        # guards the catalog and the totals below, never held while waiting for a product lock
+        self._index_lock = threading.Lock() if thread_safe else nullcontext()
+
+        self._catalog = {}  # name -> product, keeps insertion order
+        self._active = {}  # name -> product, only active products
+        self._total_quantity = 0  # running sum of all quantities
+        # products in the order they were added, with ascending insertion numbers; cursors of
+        # iter_products() stay valid when products are removed. Removed products stay in the
+        # listing (iterators skip them) until more than half of it is removed.
+        self._listing = []
+        self._listing_numbers = array("q")
+        self._next_number = 0
+        self._removed_listed = set()  # removed products that are still in the listing
+        self.journal = None  # write-ahead journal of stock changes, see attach_journal()
+        self.feed = None  # change events for replicas, see attach_feed()
+        self.basket_rules = BasketRules()  # promotions on whole orders
+        self.quote_cache = QuoteCache(quote_cache_size)  # priced lines, see quote()
+        self.reservations = ReservationBook(thread_safe=thread_safe)  # stock held for carts, see reserve()
+        self._catalog_index = None  # secondary indexes, built by the first find()
+        self._low_stock_watches = LowStockWatches()
+        self._orders = threading.local()  # per thread: low-stock callbacks of the running order
+        self.versions = InventoryVersions(thread_safe)  # committed versions for snapshot()
+        self.add_products(products)
 
-        self.products = products
+    @property
+    def products(self):
+        """List of all products in the store (active and inactive)."""
+        return list(self._catalog.values())
 
     def add_product(self, product):
         """Add a product to the store"""
-        self.products.append(product)
+        if not isinstance(product, Product):
+            raise TypeError("All items must be Product objects.")
+        with self.versions.lock, self._index_lock:
+            if product.name in self._catalog:
+                raise ValueError(f"Product {product.name} already exists in the store.")
+            self._catalog[product.name] = product
+            if product.is_active():
+                self._active[product.name] = product
+            self._total_quantity += product.quantity
+            if product in self._removed_listed:
+                # added again: its old entry must not list it a second time
+                self._removed_listed.discard(product)
+                self._listing[self._listing.index(product)] = None
+            # the number first: a concurrent iterator only reads entries below len(_listing)
+            self._listing_numbers.append(self._next_number)
+            self._listing.append(product)
+            self._next_number += 1
+            if self._catalog_index is not None:
+                self._catalog_index.add(product)
+            if self.versions.enabled:
+                self.versions.added(product)
+            if self.feed is not None:
+                self.feed.publish("add", product.name, to_row(product))
+            product.add_observer(self._on_product_changed)
+
+    def add_products(self, products):
+        """
+        Add many products to the store, e.g. a chunk of a catalog import.
+
+        :param products: iterable of Product objects
+        """
+        for product in products:
+            self.add_product(product)
 
     def remove_product(self, product):
         """Remove a product from products list"""
-        # check for products list is not empty
-        if product not in self.products:
-            raise ValueError("Product not found in the list.")
-        self.products.remove(product)
+        # check that the product is in the store
+        name = getattr(product, "name", None)
+        with self.versions.lock, self._index_lock:
+            if self._catalog.get(name) is not product:
+                raise ValueError("Product not found in the list.")
+            del self._catalog[name]
+            self._active.pop(name, None)
+            self._total_quantity -= product.quantity
+            self._remove_from_listing(product)
+            if self._catalog_index is not None:
+                self._catalog_index.remove(product)
+            if self.versions.enabled:
+                self.versions.removed(product)
+            if self.feed is not None:
+                self.feed.publish("remove", name)
+            product.remove_observer(self._on_product_changed)
+
+    def _remove_from_listing(self, product):
+        """Note a removed product, and compact the listing when more than half of it is removed."""
+        removed = self._removed_listed
+        removed.add(product)
+        listing = self._listing
+        if len(removed) > 1024 and len(removed) * 2 > len(listing):
+            # new lists: running iterators keep reading the old ones
+            kept = [position for position, entry in enumerate(listing)
+                    if entry is not None and entry not in removed]
+            self._listing_numbers = array("q", [self._listing_numbers[position] for position in kept])
+            self._listing = [listing[position] for position in kept]
+            removed.clear()
+
+    def iter_products(self, active_only=False, after=None, limit=None):
+        """
+        Iterate lazily over the products in the order they were added, e.g. to show a
+        page without building a list of the whole catalog. The order is stable while
+        products are added (they come last) and removed (they are skipped).
+
+        :param active_only: if True, only active products
+        :param after: cursor of an earlier iterator, to continue after its last product
+        :param limit: maximum number of products, None for all
+        :return: ProductIterator; its cursor attribute is the `after` of the next page
+        """
+        entries = self._iter_entries(after)
+        if active_only:
+            entries = ((position, product) for position, product in entries if product.active)
+        if limit is not None:
+            entries = itertools.islice(entries, limit)
+        return ProductIterator(entries, after)
+
+    def _iter_entries(self, after):
+        """Yield (insertion number, product) of the products added after a cursor."""
+        listing, numbers, catalog = self._listing, self._listing_numbers, self._catalog
+        position = 0 if after is None else bisect_right(numbers, after)
+        while position < len(listing):
+            product = listing[position]
+            # removed products are still listed until the listing is compacted
+            if product is not None and catalog.get(product.name) is product:
+                yield numbers[position], product
+            position += 1
+
+    def get_product(self, name):
+        """
+        Look up a product by its name.
+
+        :param name: name of the product
+        :return: the product or None if the store has no product with this name
+        """
+        return self._catalog.get(name)
 
     def get_total_quantity(self):
         """Returns the sum of all Products."""
-        total = 0
-        for product in self.products:
-            total += product.quantity
-        return total
+        return self._total_quantity
 
     def get_all_products(self):
         """Returns a list of all active products"""
-        active_products = []
-        for product in self.products:
-            if product.is_active():
-                active_products.append(product)
-        return active_products
+        return list(self._active.values())
+
+    def find(self, price_between=None, quantity_below=None, promotion=None, kind=None, active_only=False):
+        """
+        Return the products matching all given filters, in no particular order.
+        The first call builds sorted secondary indexes, which are then kept up to date
+        with every change, so a query does not scan the whole catalog.
+
+        :param price_between: (low, high) tuple, both inclusive
+        :param quantity_below: only products with a quantity below this value (not NonStockedProduct)
+        :param promotion: a promotion, or a promotion class to match all promotions of that class
+        :param kind: product class, e.g. LimitedProduct
+        :param active_only: if True, only active products
+        :return: list of products
+        """
+        filters = {"price_between": price_between, "quantity_below": quantity_below,
+                   "promotion": promotion, "kind": kind}
+        with self._index_lock:
+            if self._catalog_index is None:
+                self._catalog_index = CatalogIndex(self.products)
+            names = self._catalog_index.candidates(**filters)
+        products = self.products if names is None else [self.get_product(name) for name in names]
+        return [product for product in products
+                if product is not None and CatalogIndex.matches(product, **filters) and
+                (not active_only or product.active)]
+
+    def watch_low_stock(self, threshold, callback):
+        """
+        Call a function whenever the quantity of a product falls below a threshold,
+        e.g. to reorder it. The callback runs in the thread that changed the stock, after
+        the whole order is committed and the stock locks are released, so it sees the complete
+        order and may change the stock itself (e.g. set_quantity). An exception of a callback
+        is logged and does not affect the order or the other watches.
+
+        :param threshold: called when a quantity changes from >= threshold to < threshold
+        :param callback: callable taking the product
+        :return: id of the watch, for unwatch_low_stock()
+        """
+        with self._index_lock:
+            return self._low_stock_watches.add(threshold, callback)
+
+    def unwatch_low_stock(self, watch_id):
+        """Remove a watch added with watch_low_stock()."""
+        with self._index_lock:
+            self._low_stock_watches.remove(watch_id)
+
+    def snapshot(self):
+        """
+        Return a consistent, read-only view of the inventory at the last committed version,
+        e.g. for a report during heavy ordering (see versions.py). Taking and reading the
+        view never blocks orders, and an order is either completely in the view or not at all.
+        The old version is kept until the view is closed or garbage collected.
+
+        :return: ReadView with products, get_product(), get_all_products() and get_total_quantity()
+        """
+        return self.versions.read_view(self)
+
+    def save(self, path):
+        """
+        Write all products to a binary snapshot file (see snapshot.py).
+
+        :param path: file to write
+        """
+        import snapshot  # imported here, snapshot.py depends on this module
+        snapshot.save(self, path)
+
+    @staticmethod
+    def load(path, thread_safe=False):
+        """
+        Open a snapshot file written by save(). The file is memory-mapped,
+        products are only read when they are used.
+
+        :param path: snapshot file
+        :param thread_safe: if True, orders may be placed from several threads at once
+        :return: ColumnarStore with the products of the snapshot
+        """
+        import snapshot  # imported here, snapshot.py depends on this module
+        return snapshot.load(path, thread_safe)
+
+    def attach_journal(self, journal):
+        """
+        Write every stock change of the store's products to a journal (see journal.py).
+        An order is written as one transaction.
+
+        :param journal: Journal or None to stop journaling
+        """
+        self.journal = journal
+
+    def attach_feed(self, feed):
+        """
+        Publish every change of the store and its products to a change feed (see change_feed.py),
+        e.g. to keep a Replica in sync.
+
+        :param feed: ChangeFeed or None to stop publishing
+        """
+        self.feed = feed
+
+    def _on_product_changed(self, product, field, old_value):
+        """Called by the products of the store after every change."""
+        self._update_indexes(product, field, old_value)
+        if self.versions.enabled:
+            self.versions.record(product)
+        if self._catalog_index is not None:
+            with self._index_lock:
+                self._catalog_index.update(product, field, old_value)
+        if self.journal is not None:
+            self.journal.record(product, field, old_value)
+        if self.feed is not None:
+            self.feed.publish(field, product.name, getattr(product, field))
+        if field == "quantity" and self._low_stock_watches:
+            with self._index_lock:
+                callbacks = self._low_stock_watches.crossed(old_value, product.quantity)
+            pending = getattr(self._orders, "low_stock", None)
+            for callback in callbacks:
+                if pending is not None:
+                    pending.append((callback, product))  # called at the end of the order
+                else:
+                    # after the stock locks are released, so a callback may change the stock itself
+                    stock_locks.call_after_release(self._call_low_stock, callback, product)
+
+    @staticmethod
+    def _call_low_stock(callback, product):
+        """Call a low-stock callback and log its exception, so it can not affect the order or other watches."""
+        try:
+            callback(product)
+        except Exception:
+            logger.exception("Low-stock callback %r failed for product %s.", callback, product.name)
+
+    @contextmanager
+    def _low_stock_after_order(self):
+        """Collect the low-stock callbacks of an order and call them after the whole commit."""
+        orders = self._orders
+        if getattr(orders, "low_stock", None) is not None:
+            yield  # nested in another order of this thread, which calls them
+            return
+        orders.low_stock = pending = []
+        try:
+            yield
+        finally:
+            orders.low_stock = None
+            for callback, product in pending:
+                self._call_low_stock(callback, product)
+
+    def _update_indexes(self, product, field, old_value):
+        """Keep the indexes up to date when a product in the store changes."""
+        with self._index_lock:
+            if field == "quantity":
+                self._total_quantity += product.quantity - old_value
+            elif field == "active":
+                if product.active:
+                    self._active[product.name] = product
+                else:
+                    self._active.pop(product.name, None)
 
     def order(self, shopping_list):
-        """Create a list with tuple (Product and quantity) and return the total price"""
+        """
+        Order a list of (Product, quantity) tuples and return the total price.
+        The order is all-or-nothing: if one line fails, no stock is changed.
+
+        :param shopping_list: list of (Product, quantity) tuples
+        :return: total price of the order
+        :raises Exception: if a product can not be ordered
+        """
+        return self.place_order(shopping_list).total
+
+    @instrumented("store.order")
+    def place_order(self, shopping_list, reservation=None):
+        """
+        Order a list of (Product, quantity) tuples like order(), but return the whole receipt.
+        Stock reserved for carts can not be ordered, except by the checkout of its reservation.
+
+        :param shopping_list: list of (Product, quantity) tuples
+        :param reservation: reservation whose stock may be used, see checkout()
+        :return: Receipt with the price and discounts of every line
+        :raises Exception: if a product can not be ordered
+        """
+        # Phase 1: price the order and validate the amounts per product for the whole order.
+        # Nothing is changed yet, so a failing line leaves the stock untouched.
+        receipt = self.preview_order(shopping_list)
+        amounts = self._amounts(shopping_list)
+
+        with self._low_stock_after_order(), self._lock_products(amounts):
+            if reservation is not None:
+                # under the stock locks: a second checkout of the same cart waits here and fails
+                self.reservations.check_open(reservation)
+            self._validate_amounts(amounts, reservation)
+
+            # Phase 2: the order is valid, remove the stock of all products
+            # as one version for snapshot() and one journal transaction
+            with self.versions.commit(), self._journal_transaction():
+                for product, amount in amounts.items():
+                    product.commit_purchase(amount)
+            if reservation is not None:
+                self.reservations.release(reservation)
+        return receipt
+
+    @instrumented("store.order_many")
+    def order_many(self, shopping_lists):
+        """
+        Order many shopping lists as one batch: the stock locks are taken once, and the
+        changes of all orders are one version for snapshot() and one journal transaction.
+        Every order is still all-or-nothing and sees the stock left by the orders before it.
+
+        :param shopping_lists: list of shopping lists of (Product, quantity) tuples
+        :return: list with the total price of every order, or the Exception if it failed
+        """
+        results = []
+        batch = []  # (result index, amounts, receipt) of the orders that could be priced
+        for shopping_list in shopping_lists:
+            try:
+                receipt = self.preview_order(shopping_list)
+            except Exception as e:
+                results.append(e)
+                continue
+            batch.append((len(results), self._amounts(shopping_list), receipt))
+            results.append(None)
+
+        with self._low_stock_after_order(), \
+                self._lock_products({product for _, amounts, _ in batch for product in amounts}):
+            with self.versions.commit(), self._journal_transaction():
+                for index, amounts, receipt in batch:
+                    try:
+                        self._validate_amounts(amounts)
+                    except Exception as e:
+                        results[index] = e
+                        continue
+                    for product, amount in amounts.items():
+                        product.commit_purchase(amount)
+                    results[index] = receipt.total
+        return results
+
+    @staticmethod
+    def _amounts(shopping_list):
+        """Return the ordered amount per product of a shopping list."""
+        amounts = {}
+        for product, quantity in shopping_list:
+            amounts[product] = amounts.get(product, 0) + quantity
+        return amounts
+
+    def _validate_amounts(self, amounts, reservation=None):
+        """Check that all amounts can be ordered, without changing the stock. Call with the stock locks held."""
+        for product, amount in amounts.items():
+            try:
+                product.validate_purchase(amount)
+                self.reservations.check(product, amount, reservation)
+            except Exception as e:
+                raise Exception(f"Error ordering product {product.name}: {e}") from e
+
+    def reserve(self, shopping_list, ttl=900, reservation=None):
+        """
+        Hold stock for a cart. Reserved stock is not available to other orders until the
+        reservation is checked out, released or expires.
+
+        :param shopping_list: list of (Product, quantity) tuples
+        :param ttl: seconds until the reservation expires
+        :param reservation: open reservation to add the lines to, None for a new one
+        :return: Reservation
+        :raises Exception: if a line can not be reserved
+        """
+        self._check_shopping_list(shopping_list)
+        # under the stock locks, so an order can not take the stock between the check and the update
+        with self._lock_products({product for product, _ in shopping_list}):
+            return self.reservations.reserve(shopping_list, ttl, reservation)
+
+    def release(self, reservation):
+        """Give the stock of a reservation back, e.g. when the cart is abandoned."""
+        self.reservations.release(reservation)
+
+    def checkout(self, reservation):
+        """
+        Order all lines of a reservation and release it.
+
+        :param reservation: Reservation returned by reserve()
+        :return: Receipt of the order
+        :raises Exception: if the reservation was already checked out, released or expired,
+                           or the order fails
+        """
+        return self.place_order(reservation.lines, reservation)
+
+    def available(self, product):
+        """
+        Return the stock of a product that is not reserved for a cart.
+
+        :param product: product of the store
+        :return: quantity - reserved quantity
+        """
+        return self.reservations.available(product)
+
+    def preview_order(self, shopping_list):
+        """
+        Price a shopping list with product and basket promotions, without ordering it.
+
+        :param shopping_list: list of (Product, quantity) tuples
+        :return: Receipt with the price and discounts of every line
+        """
+        self._check_shopping_list(shopping_list)
+        for product, quantity in shopping_list:
+            if quantity <= 0:
+                raise Exception(f"Error ordering product {product.name}: Amount must be a positive integer.")
+        receipt = Receipt(shopping_list, self._price_lines(shopping_list))
+        self.basket_rules.apply(receipt)
+        return receipt
+
+    def add_basket_promotion(self, promotion):
+        """
+        Add a promotion on whole orders (see basket.py).
+
+        :param promotion: BasketPromotion
+        """
+        self.basket_rules.add(promotion)
+
+    def remove_basket_promotion(self, promotion):
+        """Remove a promotion added with add_basket_promotion()."""
+        self.basket_rules.remove(promotion)
+
+    def quote(self, shopping_list):
+        """
+        Price a shopping list without ordering it. The stock is not checked or changed.
+        Lines are grouped by promotion and every group is priced with one batch call.
+        Priced lines are cached, so quoting the same basket again does not apply the
+        promotions again (see quote_cache for hit and miss counters).
+        Basket promotions are not included, see preview_order().
+
+        :param shopping_list: list of (Product, quantity) tuples
+        :return: list with the total price (Money) of every line, in the order of shopping_list
+        """
+        self._check_shopping_list(shopping_list)
+        return self._price_lines(shopping_list)
+
+    def _price_lines(self, shopping_list):
+        """Return the price of every line with the product promotions, using the quote cache."""
+        cache = self.quote_cache
+        if not cache.maxsize:
+            return self._apply_promotions(shopping_list)
+        keys = [cache.key(product, quantity) for product, quantity in shopping_list]
+        line_totals = cache.get_many(keys)
+        missing = [line for line, total in enumerate(line_totals) if total is None]
+        if missing:
+            totals = self._apply_promotions([shopping_list[line] for line in missing])
+            for line, total in zip(missing, totals):
+                line_totals[line] = total
+            cache.put_many((keys[line], total) for line, total in zip(missing, totals))
+        return line_totals
+
+    @staticmethod
+    def _apply_promotions(shopping_list):
+        """Return the price of every line with the product promotions (Money)."""
+        line_totals = [None] * len(shopping_list)
+        groups = {}  # promotion -> line numbers
+        for line, (product, quantity) in enumerate(shopping_list):
+            if product.promotion:
+                groups.setdefault(product.promotion, []).append(line)
+            else:
+                line_totals[line] = Money(to_cents(product.price) * quantity)
+
+        for promotion, lines in groups.items():
+            price_cents = [to_cents(shopping_list[line][0].price) for line in lines]
+            quantities = [shopping_list[line][1] for line in lines]
+            totals = promotion.apply_promotion_batch_cents(price_cents, quantities)
+            for line, total in zip(lines, totals):
+                line_totals[line] = Money(int(total))
+        return line_totals
+
+    def _journal_transaction(self):
+        """Return a context manager writing all changes of the block as one journal transaction."""
+        if self.journal is not None:
+            return self.journal.transaction()
+        return nullcontext()
+
+    @staticmethod
+    def _check_shopping_list(shopping_list):
+        """Raise an error if shopping_list is not a list of (Product, quantity) tuples."""
         if not isinstance(shopping_list, list):
             raise TypeError("Expected shopping_list to be a list.")
 
@@ -55,11 +655,8 @@ class Store:
             ):
                 raise ValueError("Each item in shopping_list must be a tuple of (Product, quantity).")
 
-        total = 0
-        for product, quantity in shopping_list:
-            try:
-                total += product.buy(quantity)
-            except Exception as e:
-                raise Exception(f"Error ordering product {product.name}: {e}") from e
-            print(f"DEBUG: {product.name} | quantity: {product.quantity} | active: {product.active}")
-        return total
+    def _lock_products(self, products):
+        """Return a context manager holding the stock locks of the products in thread safe mode."""
+        if self.thread_safe:
+            return stock_locks.acquire_all(products)
+        return nullcontext()
@@ -0,0 +1,47 @@
+"""
+Unit tests for the asyncio front-end of the store.
+"""
+import asyncio
+
+import pytest
+from async_store import AsyncStore
+from products import Product, NonStockedProduct
+from store import Store
+
+
+def test_async_orders_are_committed():
+    """
+    Test that many concurrent coroutines can order and the stock is updated exactly once per order.
+    """
+    product = Product("MacBook Air M2", price=1450, quantity=100)
+    license_ = NonStockedProduct("Windows License", price=200)
+    store = Store([product, license_])
+
+    async def run():
+        async with AsyncStore(store, max_queue=10, batch_size=4) as async_store:
+            totals = await asyncio.gather(*(async_store.order([(product, 1), (license_, 1)])
+                                            for _ in range(50)))
+            quantity = await async_store.get_total_quantity()
+            return totals, quantity
+
+    totals, quantity = asyncio.run(run())
+    assert totals == [1650] * 50
+    assert quantity == 50
+    assert product.quantity == 50
+
+
+def test_async_order_errors_are_raised():
+    """
+    Test that a failing order raises in the ordering coroutine and does not stop the worker.
+    """
+    product = Product("Shipping", price=10, quantity=1)
+    store = Store([product])
+
+    async def run():
+        async with AsyncStore(store) as async_store:
+            assert await async_store.order([(product, 1)]) == 10
+            with pytest.raises(Exception):
+                await async_store.order([(product, 1)])
+            return await async_store.get_all_products()
+
+    assert asyncio.run(run()) == []
@@ -0,0 +1,95 @@
+"""
+Unit tests for the change feed and store replicas.
+"""
+import pytest
+from change_feed import ChangeFeed, FeedOverrunError, Replica
+from columnar import ColumnarStore
+from products import Product, NonStockedProduct, LimitedProduct
+from promotions import PercentDiscount
+from store import Store
+
+
+def create_products():
+    return [
+        Product("MacBook Air M2", price=1450, quantity=100),
+        NonStockedProduct("Windows License", price=200),
+        LimitedProduct("Shipping", price=10, quantity=5, maximum=1),
+    ]
+
+
+def test_store_changes_are_published():
+    """
+    Test the events of orders, stock and status changes, promotions, additions and removals.
+    """
+    store = Store(create_products())
+    feed = ChangeFeed()
+    store.attach_feed(feed)
+    subscription = feed.subscribe()
+    macbook = store.get_product("MacBook Air M2")
+    shipping = store.get_product("Shipping")
+    promotion = PercentDiscount("20% off", percent=20)
+
+    store.order([(macbook, 2)])
+    shipping.buy(1)
+    macbook.set_quantity(0)
+    macbook.activate()
+    macbook.set_promotion(promotion)
+    store.add_product(Product("Google Pixel 7", price=500, quantity=250))
+    store.remove_product(shipping)
+
+    events = [(change.kind, change.name, change.value) for change in subscription.poll()]
+    assert events == [
+        ("quantity", "MacBook Air M2", 98),
+        ("quantity", "Shipping", 4),
+        ("quantity", "MacBook Air M2", 0),
+        ("active", "MacBook Air M2", False),
+        ("active", "MacBook Air M2", True),
+        ("promotion", "MacBook Air M2", promotion),
+        ("add", "Google Pixel 7", ("product", "Google Pixel 7", 500, 250, 0, True, None)),
+        ("remove", "Shipping", None),
+    ]
+    assert subscription.offset == feed.end == 8
+    assert subscription.poll() == []
+
+
+def test_read_by_offset_and_overrun():
+    """
+    Test reading with limits across the end of the ring buffer and the error for overwritten offsets.
+    """
+    feed = ChangeFeed(capacity=4)
+    for quantity in range(6):
+        feed.publish("quantity", "Shipping", quantity)
+    assert feed.start == 2
+    assert [change.value for change in feed.read(2)] == [2, 3, 4, 5]
+    assert [change.offset for change in feed.read(3, limit=2)] == [3, 4]
+    assert feed.read(6) == []
+    with pytest.raises(FeedOverrunError):
+        feed.read(1)
+
+
+@pytest.mark.parametrize("store_class", [Store, ColumnarStore])
+def test_replica_follows_the_source(store_class):
+    """
+    Test that a replica applies the changes of its source and copies it again after an overrun.
+    """
+    source = store_class(create_products())
+    source.attach_feed(ChangeFeed(capacity=8))
+    replica = Replica(source)
+    macbook = source.get_product("MacBook Air M2")
+
+    source.order([(macbook, 10), (source.get_product("Windows License"), 1)])
+    macbook.price = 1300
+    source.add_product(Product("Google Pixel 7", price=500, quantity=250))
+    source.remove_product(source.get_product("Shipping"))
+    assert replica.sync() == 4
+    assert replica.store.get_product("MacBook Air M2").quantity == 90
+    assert replica.store.get_product("MacBook Air M2").price == 1300
+    assert replica.store.get_product("Google Pixel 7").quantity == 250
+    assert replica.store.get_product("Shipping") is None
+    assert replica.store.get_total_quantity() == source.get_total_quantity()
+
+    for _ in range(10):
+        source.order([(macbook, 1)])
+    assert replica.sync() == 0  # fell behind by more than the capacity: copied again
+    assert replica.store.get_product("MacBook Air M2").quantity == 80
+    assert replica.store.get_product("MacBook Air M2") is not source.get_product("MacBook Air M2")
@@ -0,0 +1,140 @@
+"""
+Unit tests for the columnar inventory and the ColumnarStore.
+"""
+import pytest
+from columnar import ColumnarInventory, ColumnarStore, NON_STOCKED, LIMITED
+from products import Product, NonStockedProduct, LimitedProduct
+from promotions import PercentDiscount
+
+
+def create_store():
+    """Create a columnar store with one product of every type."""
+    macbook = Product("MacBook Air M2", price=1450, quantity=100)
+    macbook.set_promotion(PercentDiscount("20% off", percent=20))
+    return ColumnarStore([
+        macbook,
+        NonStockedProduct("Windows License", price=200),
+        LimitedProduct("Shipping", price=10, quantity=5, maximum=1),
+    ])
+
+
+def test_views_behave_like_products():
+    """
+    Test that the row views have the type and the values of the copied products.
+    """
+    store = create_store()
+    macbook = store.get_product("MacBook Air M2")
+    license_ = store.get_product("Windows License")
+    shipping = store.get_product("Shipping")
+
+    assert isinstance(macbook, Product)
+    assert isinstance(license_, NonStockedProduct)
+    assert isinstance(shipping, LimitedProduct)
+    assert macbook.price == 1450 and macbook.quantity == 100 and macbook.active
+    assert macbook.promotion.name == "20% off"
+    assert shipping.maximum == 1
+    assert "Max per order: 1" in shipping.show()
+    assert store.get_product("MacBook Air M2") == macbook
+
+
+def test_columnar_order_and_aggregates():
+    """
+    Test that orders change the columns and the totals and active filter follow.
+    """
+    store = create_store()
+    macbook = store.get_product("MacBook Air M2")
+    shipping = store.get_product("Shipping")
+
+    assert store.get_total_quantity() == 105
+    total = store.order([(macbook, 2), (store.get_product("Windows License"), 1)])
+    assert total == 2 * 1160 + 200
+    assert store.get_total_quantity() == 103
+
+    shipping.set_quantity(0)
+    assert [product.name for product in store.get_all_products()] == ["MacBook Air M2", "Windows License"]
+
+    with pytest.raises(Exception):
+        store.order([(shipping, 1)])
+
+
+def test_columnar_add_and_remove():
+    """
+    Test that removed rows disappear from the store and names stay unique.
+    """
+    store = create_store()
+    store.add_product(Product("Google Pixel 7", price=500, quantity=50))
+    with pytest.raises(ValueError):
+        store.add_product(Product("Google Pixel 7", price=500, quantity=50))
+
+    pixel = store.get_product("Google Pixel 7")
+    store.remove_product(pixel)
+    assert store.get_product("Google Pixel 7") is None
+    assert store.get_total_quantity() == 105
+    assert len(store.products) == 3
+    with pytest.raises(ValueError):
+        store.remove_product(pixel)
+
+
+def test_total_quantity_is_kept_up_to_date(monkeypatch):
+    """
+    Test that the total quantity is summed on the column once and then follows every change.
+    """
+    store = create_store()
+    assert store.get_total_quantity() == 105
+    monkeypatch.setattr(store.inventory, "total_quantity", lambda: pytest.fail("summed again"))
+
+    store.order([(store.get_product("MacBook Air M2"), 2)])
+    store.get_product("Shipping").set_quantity(3)
+    store.add_product(Product("Google Pixel 7", price=500, quantity=50))
+    store.remove_product(store.get_product("Shipping"))
+    assert store.get_total_quantity() == 98 + 50
+
+
+def test_inventory_rows():
+    """
+    Test adding rows without Product objects.
+    """
+    inventory = ColumnarInventory()
+    inventory.add_row("Windows License", 200, quantity=5, kind=NON_STOCKED)
+    inventory.add_row("Shipping", 10, quantity=5, kind=LIMITED, maximum=1)
+    assert inventory.quantities.tolist() == [0, 5]
+    assert inventory.view(1).maximum == 1
+    with pytest.raises(Exception):
+        inventory.add_row("", 10)
+
+
+def test_view_changes_invalidate_quotes():
+    """
+    Test that changing a row view gives it a new version, so cached quotes are not reused.
+    """
+    store = create_store()
+    macbook = store.get_product("MacBook Air M2")
+    assert store.quote([(macbook, 1)]) == [1160]
+
+    store.get_product("MacBook Air M2").price = 1000
+    assert macbook.version == 1
+    assert store.quote([(macbook, 1)]) == [800]
+    macbook.set_promotion(None)
+    assert store.quote([(macbook, 1)]) == [1000]
+
+
+def test_find_returns_views():
+    """
+    Test that find() works on the columnar store and follows changes of the rows.
+    """
+    store = create_store()
+    store.get_product("MacBook Air M2").price = 100
+    assert [product.name for product in store.find(price_between=(50, 150))] == ["MacBook Air M2"]
+    store.get_product("Shipping").set_quantity(0)
+    assert [product.name for product in store.find(quantity_below=1)] == ["Shipping"]
+
+
+def test_columnar_iter_products_uses_rows_as_cursor():
+    """
+    Test pagination of a columnar store with a removed row.
+    """
+    store = ColumnarStore([Product(f"Product {number}", price=10, quantity=5) for number in range(5)])
+    page = store.iter_products(limit=2)
+    assert [product.name for product in page] == ["Product 0", "Product 1"]
+    store.remove_product(store.get_product("Product 2"))
+    assert [product.name for product in store.iter_products(after=page.cursor)] == ["Product 3", "Product 4"]
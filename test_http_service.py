@@ -0,0 +1,152 @@
+"""
+Unit tests for the HTTP/JSON order service.
+"""
+import asyncio
+
+from http_service import OrderService, Client
+from products import Product, NonStockedProduct, LimitedProduct
+from promotions import PercentDiscount
+from store import Store
+
+
+def create_store():
+    macbook = Product("MacBook Air M2", price=1450, quantity=100)
+    macbook.set_promotion(PercentDiscount("20% off", percent=20))
+    return Store([
+        macbook,
+        NonStockedProduct("Windows License", price=200),
+        LimitedProduct("Shipping", price=10, quantity=5, maximum=1),
+    ])
+
+
+def serve(store, requests):
+    """Start a service on a free port, run requests(client) over one connection and return its result."""
+    async def run():
+        async with OrderService(store, batch_size=8) as service:
+            port = await service.start(port=0)
+            async with Client(port=port) as client:
+                return await requests(client, service)
+
+    return asyncio.run(run())
+
+
+def test_products_and_orders_over_one_connection():
+    """
+    Test listing, quoting and ordering with several requests on one kept-alive connection.
+    """
+    store = create_store()
+
+    async def requests(client, service):
+        status, products = await client.request("GET", "/products")
+        assert status == 200
+        assert products[0] == {"name": "MacBook Air M2", "price": 1450, "quantity": 100,
+                               "active": True, "promotion": "20% off"}
+        assert products[2]["maximum"] == 1
+
+        status, quote = await client.request("POST", "/quote", {"items": [
+            {"name": "MacBook Air M2", "quantity": 1}, {"name": "Shipping", "quantity": 1}]})
+        assert (status, quote) == (200, {"lines": ["1160.00", "10.00"], "total": "1170.00"})
+
+        status, order = await client.request("POST", "/order", {"items": [{"name": "MacBook Air M2", "quantity": 2}]})
+        assert (status, order) == (200, {"total": "2320.00"})
+
+        status, product = await client.request("GET", "/products/MacBook%20Air%20M2")
+        assert product["quantity"] == 98
+        status, total = await client.request("GET", "/total")
+        return total
+
+    assert serve(store, requests) == {"total_quantity": 103}
+    assert store.get_product("MacBook Air M2").quantity == 98
+
+
+def test_batch_endpoint_reports_every_order():
+    """
+    Test that /orders orders every shopping list and reports failures per order.
+    """
+    store = create_store()
+
+    async def requests(client, service):
+        return await client.request("POST", "/orders", {"orders": [
+            [{"name": "Shipping", "quantity": 1}],
+            [{"name": "Shipping", "quantity": 2}],
+            [{"name": "Windows License", "quantity": 3}],
+        ]})
+
+    status, response = serve(store, requests)
+    assert status == 200
+    results = response["results"]
+    assert results[0] == {"total": "10.00"}
+    assert "Error ordering product Shipping" in results[1]["error"]
+    assert results[2] == {"total": "600.00"}
+    assert store.get_product("Shipping").quantity == 4
+
+
+def test_errors_are_answered_with_status_codes():
+    """
+    Test the status codes of unknown products, invalid requests and failing orders.
+    """
+    async def requests(client, service):
+        return [
+            (await client.request("GET", "/products/iPhone"))[0],
+            (await client.request("GET", "/unknown"))[0],
+            (await client.request("GET", "/order"))[0],
+            (await client.request("POST", "/order", {"items": [{"name": "Shipping"}]}))[0],
+            (await client.request("POST", "/order", {"items": [{"name": "Shipping", "quantity": 9}]}))[0],
+            (await client.request("POST", "/quote", {"items": [{"name": "Shipping", "quantity": -1}]}))[0],
+            (await client.request("POST", "/order", {"items": [{"name": "Shipping", "quantity": 0}]}))[0],
+            (await client.request("GET", "/total"))[0],  # the connection is still usable
+        ]
+
+    assert serve(create_store(), requests) == [404, 404, 405, 400, 409, 400, 400, 200]
+
+
+def test_negative_content_length_is_rejected():
+    """
+    Test that a negative Content-Length is answered with 400 and the connection is closed.
+    """
+    async def run():
+        async with OrderService(create_store()) as service:
+            port = await service.start(port=0)
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"POST /order HTTP/1.1\r\nContent-Length: -5\r\n\r\n")
+            response = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return response
+
+    assert asyncio.run(run()).startswith(b"HTTP/1.1 400 Bad Request")
+
+
+def test_product_json_is_only_serialized_after_a_change():
+    """
+    Test that unchanged products reuse their cached JSON fragment.
+    """
+    store = create_store()
+    macbook = store.get_product("MacBook Air M2")
+
+    async def requests(client, service):
+        await client.request("GET", "/products")
+        fragment = service._fragments[macbook][1]
+        await client.request("GET", "/products")
+        assert service._fragments[macbook][1] is fragment
+        macbook.price = 1300
+        status, products = await client.request("GET", "/products")
+        assert service._fragments[macbook][1] is not fragment
+        return products[0]["price"]
+
+    assert serve(store, requests) == 1300
+
+
+def test_fragments_of_removed_products_are_dropped():
+    """
+    Test that the JSON cache does not keep products that were removed from the store.
+    """
+    store = Store([Product(f"Product {number}", price=10, quantity=1) for number in range(3000)])
+
+    async def requests(client, service):
+        for product in store.products[:2000]:
+            await client.request("GET", f"/products/Product%20{product.name.split()[1]}")
+            store.remove_product(product)
+        await client.request("GET", "/products")
+        return len(service._fragments)
+
+    assert serve(store, requests) <= 2048
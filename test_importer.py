@@ -0,0 +1,62 @@
+"""
+Unit tests for the streaming catalog import.
+"""
+import json
+
+import pytest
+from importer import import_catalog
+from products import NonStockedProduct, LimitedProduct
+from store import Store
+
+
+def test_import_csv(tmp_path):
+    """
+    Test that a CSV feed creates all product types with promotions and reports bad rows.
+    """
+    path = tmp_path / "feed.csv"
+    path.write_text(
+        "name,price,quantity,type,maximum,promotion\n"
+        "MacBook Air M2,1450,100,,,percent|20% off|20\n"
+        "Windows License,200,,non_stocked,,third_one_free|3 für 2\n"
+        "Shipping,10,5,limited,1,\n"
+        "Broken,abc,5,,,\n"
+        "MacBook Air M2,1450,1,,,\n"
+        "Pixel,500,5,,,bogus|Sale\n"
+        "Earbuds,250.5,500,product,,second_half_price|Second one half price\n",
+        encoding="utf-8")
+    store = Store([])
+    report = import_catalog(store, path, chunk_size=2)
+
+    assert report.imported == 4
+    assert [line for line, _ in report.errors] == [5, 6, 7]
+    assert store.get_product("MacBook Air M2").promotion.percent == 20
+    assert isinstance(store.get_product("Windows License"), NonStockedProduct)
+    assert store.get_product("Shipping").maximum == 1
+    assert store.get_product("Earbuds").price == 250.5
+    assert store.get_total_quantity() == 605
+
+    # the promotions are shared with other imports, so they can not be changed
+    with pytest.raises(AttributeError):
+        store.get_product("MacBook Air M2").promotion.percent = 30
+    other = Store([])
+    import_catalog(other, path)
+    assert other.get_product("MacBook Air M2").get_price(1) == 1160
+
+
+def test_import_json_lines(tmp_path):
+    """
+    Test that a JSON Lines feed is imported and invalid lines are reported.
+    """
+    path = tmp_path / "feed.jsonl"
+    rows = [
+        {"name": "Shipping", "price": 10, "quantity": 5, "type": "limited", "maximum": 1},
+        {"name": "", "price": 10, "quantity": 5},
+    ]
+    path.write_text("\n".join(json.dumps(row) for row in rows) + "\n{not json\n[1, 2]\n", encoding="utf-8")
+    store = Store([])
+    report = import_catalog(store, path, max_errors=2)
+
+    assert report.imported == 1
+    assert report.error_count == 3
+    assert len(report.errors) == 2
+    assert isinstance(store.get_product("Shipping"), LimitedProduct)
@@ -0,0 +1,65 @@
+"""
+Unit tests for the hot path instrumentation.
+"""
+import json
+
+import pytest
+from instrumentation import dump_metrics, export_metrics, metrics
+from products import Product
+from promotions import ThirdOneFree
+from store import Store
+
+
+@pytest.fixture
+def enabled_metrics():
+    """Enable fresh metrics for one test and disable them afterwards."""
+    metrics.reset()
+    metrics.enable()
+    yield metrics
+    metrics.disable()
+    metrics.reset()
+
+
+def test_order_does_not_print(capsys):
+    """
+    Test that ordering does not write debug output.
+    """
+    product = Product("MacBook Air M2", price=1450, quantity=100)
+    Store([product]).order([(product, 1)])
+    assert capsys.readouterr().out == ""
+
+
+def test_metrics_are_recorded(enabled_metrics, tmp_path):
+    """
+    Test that calls, errors and latencies of order, buy and promotions are counted.
+    """
+    product = Product("Bose Earbuds", price=300, quantity=10)
+    product.set_promotion(ThirdOneFree("Third One Free!"))
+    store = Store([product])
+    store.order([(product, 3)])
+    product.buy(1)
+    with pytest.raises(Exception):
+        store.order([(product, 100)])
+
+    exported = export_metrics()
+    counters = exported["counters"]
+    assert counters["store.order.calls"] == 2
+    assert counters["store.order.errors"] == 1
+    assert counters["product.buy.calls"] == 1
+    assert counters["promotion.apply_promotion.calls"] == 1  # product.buy
+    assert counters["promotion.apply_promotion_batch.calls"] == 2  # orders price their lines in batches
+    assert exported["histograms"]["store.order"]["count"] == 2
+
+    path = tmp_path / "metrics.json"
+    dump_metrics(path)
+    assert json.loads(path.read_text())["counters"] == counters
+
+
+def test_disabled_metrics_record_nothing():
+    """
+    Test that nothing is recorded while the metrics are disabled.
+    """
+    metrics.reset()
+    product = Product("MacBook Air M2", price=1450, quantity=100)
+    Store([product]).order([(product, 1)])
+    assert export_metrics() == {"counters": {}, "histograms": {}}
@@ -0,0 +1,132 @@
+"""
+Unit tests for the write-ahead journal and crash recovery.
+"""
+import time
+
+import pytest
+from journal import Journal, checkpoint, read_transactions, recover
+from products import Product, NonStockedProduct, LimitedProduct
+from store import Store
+
+
+def create_store():
+    """Create a small store with one product of every type."""
+    return Store([
+        Product("MacBook Air M2", price=1450, quantity=100),
+        NonStockedProduct("Windows License", price=200),
+        LimitedProduct("Shipping", price=10, quantity=5, maximum=1),
+    ])
+
+
+def test_order_is_one_transaction(tmp_path):
+    """
+    Test that an order is written as one journal line and set_quantity as another one.
+    """
+    store = create_store()
+    path = tmp_path / "journal.log"
+    store.attach_journal(Journal(path))
+
+    store.order([(store.get_product("MacBook Air M2"), 2), (store.get_product("Shipping"), 1)])
+    store.get_product("Shipping").set_quantity(0)
+    store.journal.close()
+
+    assert list(read_transactions(path)) == [
+        [["MacBook Air M2", 98, True], ["Shipping", 4, True]],
+        [["Shipping", 0, True]],
+        [["Shipping", 0, False]],
+    ]
+
+
+def test_recover_from_snapshot_and_journal(tmp_path):
+    """
+    Test that a store is rebuilt from the snapshot plus the journal, ignoring a torn last line.
+    """
+    snapshot_path = tmp_path / "inventory.snap"
+    journal_path = tmp_path / "journal.log"
+    store = create_store()
+    store.save(snapshot_path)
+    store.attach_journal(Journal(journal_path, group_size=10))
+
+    for _ in range(3):
+        store.order([(store.get_product("MacBook Air M2"), 1)])
+    store.journal.close()
+    # simulate a crash in the middle of writing the next transaction
+    with open(journal_path, "a", encoding="utf-8") as file:
+        file.write('[["MacBook Air M2", 0, fa')
+
+    recovered = recover(snapshot_path, journal_path)
+    assert recovered.get_product("MacBook Air M2").quantity == 97
+    assert recovered.get_total_quantity() == 97 + 5
+
+    # after a checkpoint the journal is empty and the snapshot has the current stock
+    recovered.order([(recovered.get_product("Shipping"), 1)])
+    checkpoint(recovered, snapshot_path)
+    assert list(read_transactions(journal_path)) == []
+    recovered.journal.close()
+    assert recover(snapshot_path, journal_path).get_total_quantity() == 97 + 4
+
+
+def test_checkpoint_keeps_transactions_committed_during_the_save(tmp_path, monkeypatch):
+    """
+    Test that an order committed while the snapshot is written is still in the journal afterwards.
+    """
+    snapshot_path = tmp_path / "inventory.snap"
+    journal_path = tmp_path / "journal.log"
+    store = create_store()
+    store.attach_journal(Journal(journal_path))
+    macbook = store.get_product("MacBook Air M2")
+    store.order([(macbook, 1)])
+    save = store.save
+
+    def save_and_order(path):
+        save(path)
+        store.order([(macbook, 2)])  # after the snapshot read the stock
+
+    monkeypatch.setattr(store, "save", save_and_order)
+    checkpoint(store, snapshot_path)
+    assert list(read_transactions(journal_path)) == [[["MacBook Air M2", 97, True]]]
+    store.journal.close()
+    assert recover(snapshot_path, journal_path).get_product("MacBook Air M2").quantity == 97
+
+
+def test_truncate_never_loses_the_kept_transactions(tmp_path, monkeypatch):
+    """
+    Test that a crash before the new journal replaces the old one keeps all transactions,
+    and that the journal is usable after a truncate.
+    """
+    path = tmp_path / "journal.log"
+    store = create_store()
+    store.attach_journal(Journal(path))
+    macbook = store.get_product("MacBook Air M2")
+    store.order([(macbook, 1)])
+    position = store.journal.position()
+    store.order([(macbook, 2)])
+
+    def crash(source, destination):
+        raise OSError("crash")
+
+    with monkeypatch.context() as patch:
+        patch.setattr("os.replace", crash)
+        with pytest.raises(OSError):
+            store.journal.truncate(position)
+    assert len(list(read_transactions(path))) == 2
+
+    store.journal.truncate(position)
+    store.order([(macbook, 3)])
+    store.journal.close()
+    assert list(read_transactions(path)) == [[["MacBook Air M2", 97, True]], [["MacBook Air M2", 94, True]]]
+
+
+def test_sync_interval_flushes_without_more_transactions(tmp_path):
+    """
+    Test that the last transactions of an unfinished group are written after sync_interval.
+    """
+    path = tmp_path / "journal.log"
+    store = create_store()
+    store.attach_journal(Journal(path, group_size=100, sync_interval=0.01))
+    store.order([(store.get_product("MacBook Air M2"), 1)])
+    deadline = time.monotonic() + 5
+    while not list(read_transactions(path)) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert list(read_transactions(path)) == [[["MacBook Air M2", 99, True]]]
+    store.journal.close()
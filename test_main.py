@@ -0,0 +1,94 @@
+"""
+Unit tests for the setup and the command line of main.py.
+"""
+import os
+import subprocess
+import sys
+
+import main
+
+
+def test_store_is_created_on_first_use():
+    """
+    Test that importing main creates no store and that best_buy and product_list belong together.
+    """
+    code = ("import main; assert 'best_buy' not in vars(main); "
+            "assert main.best_buy.products == main.product_list; assert 'best_buy' in vars(main)")
+    subprocess.run([sys.executable, "-c", code], check=True)
+    assert main.create_store().get_total_quantity() == 1105
+
+
+def test_commands_on_a_catalog(tmp_path, capsys):
+    """
+    Test stock and order on a snapshot catalog; orders are kept in the journal of the catalog.
+    """
+    catalog = str(tmp_path / "catalog.snap")
+    assert main.main(["save", catalog]) == 0
+    assert main.main(["--catalog", catalog, "order", "Google Pixel 7", "3", "Shipping", "1"]) == 0
+    assert "Order successful" in capsys.readouterr().out
+    assert main.main(["--catalog", catalog, "order", "Shipping", "1"]) == 0
+    assert main.main(["--catalog", catalog, "order", "Shipping", "2"]) == 1  # at most 1 per order
+    capsys.readouterr()
+
+    assert main.main(["--catalog", catalog, "stock", "Google Pixel 7", "Shipping"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert "Quantity: 497" in lines[0]
+    assert "Quantity: 3" in lines[1]
+    assert main.main(["--catalog", catalog, "stock", "iPhone"]) == 1
+    assert main.main(["stock"]) == 0
+    assert capsys.readouterr().out == "Product iPhone not found.\nTotal quantity in store: 1105\n"
+
+
+def test_menu_orders_on_a_catalog_are_journaled(tmp_path, monkeypatch, capsys):
+    """
+    Test that an order placed in the interactive menu with --catalog is kept after the program ends.
+    """
+    catalog = str(tmp_path / "catalog.snap")
+    main.main(["save", catalog])
+    answers = iter(["3", "1", "2", "n", "4"])  # order 2 of product 1, then quit
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    assert main.main(["--catalog", catalog]) == 0
+    capsys.readouterr()
+    main.main(["--catalog", catalog, "stock", "MacBook Air M2"])
+    assert "Quantity: 98" in capsys.readouterr().out
+
+
+def test_menu_starts_a_new_order_after_the_reservation_expired(monkeypatch, capsys):
+    """
+    Test that the interactive menu tells the user about an expired reservation instead of failing.
+    """
+    store = main.create_store()
+    now = [0.0]
+    store.reservations.clock = lambda: now[0]
+    answers = iter(["3", "1", "2", "y", "1", "1", "n", "4"])  # 2 of product 1, later 1 more, then quit
+
+    def answer(prompt=""):
+        if prompt.startswith("Would you like to add another product") and not now[0]:
+            now[0] = 1000  # the first reservation of 900 seconds runs out
+        return next(answers)
+
+    monkeypatch.setattr("builtins.input", answer)
+    main.start(store)
+    output = capsys.readouterr().out
+    assert "Your reservation expired" in output and "Order successful" in output
+    assert store.get_product("MacBook Air M2").quantity == 99
+
+
+def test_large_journals_are_checkpointed(tmp_path, monkeypatch, capsys):
+    """
+    Test that the orders of a large journal, and of save over the catalog, are written into the snapshot.
+    """
+    catalog = str(tmp_path / "catalog.snap")
+    journal_path = f"{catalog}.journal"
+    main.main(["save", catalog])
+    assert main.main(["--catalog", catalog, "order", "Google Pixel 7", "3"]) == 0
+    assert os.path.getsize(journal_path) > 0
+    assert main.main(["--catalog", catalog, "save", catalog]) == 0
+    assert os.path.getsize(journal_path) == 0
+
+    monkeypatch.setattr(main, "CHECKPOINT_BYTES", 0)
+    assert main.main(["--catalog", catalog, "order", "Google Pixel 7", "2"]) == 0
+    assert os.path.getsize(journal_path) == 0
+    capsys.readouterr()
+    main.main(["--catalog", catalog, "stock", "Google Pixel 7"])
+    assert "Quantity: 495" in capsys.readouterr().out
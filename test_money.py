@@ -0,0 +1,91 @@
+"""
+Unit tests for the integer-cents money type and the rounding rules of the promotions.
+"""
+from decimal import Decimal
+from fractions import Fraction
+
+import pytest
+from money import Money, to_cents
+from products import Product
+from promotions import PercentDiscount, SecondHalfPrice, ThirdOneFree, StackedPromotion
+from store import Store
+
+
+def test_money_is_exact_and_compares_with_numbers():
+    """
+    Test that sums of cents do not drift and that Money compares and formats like a number.
+    """
+    total = sum([Money.of(0.1)] * 1000, Money())
+    assert total.cents == 10000
+    assert total == 100 and total == 100.0 and total == Decimal("100.00")
+    assert Money.of(0.1) + Money.of(0.2) == 0.3
+    assert Money.of(2.675) == Money(268)  # rounded half up
+    assert to_cents(Decimal("19.995")) == 2000
+    assert f"{Money(123456):12.2f}" == "     1234.56"
+    assert str(Money(5)) == "0.05" and repr(Money(-5)) == "Money('-0.05')"
+    assert hash(Money(14000)) == hash(140) and hash(Money(250)) == hash(2.5)
+    assert hash(Money(10)) == hash(Decimal("0.1")) == hash(Fraction(1, 10))
+    assert len({Money(10), Decimal("0.1"), Fraction(1, 10)}) == 1
+    assert Money(100) * 3 == 3 and Money(100) / 3 == Money(33)
+    assert Money(1999).percent_of(15) == Money(300)
+    assert sorted([Money(300), 2, Money(100)]) == [Money(100), 2, Money(300)]
+    with pytest.raises(TypeError):
+        Money(1.5)
+
+
+def test_promotions_round_per_documented_rule():
+    """
+    Test the rounding rule of every promotion with prices that do not divide evenly.
+    """
+    product = Product("Cable", price=9.99, quantity=100)
+    assert PercentDiscount("15% off", percent=15).apply_promotion(product, 3) == Money(2547)  # 25.4745
+    assert SecondHalfPrice("half").apply_promotion(product, 2) == Money(999 + 500)
+    assert ThirdOneFree("3 for 2").apply_promotion(product, 3) == Money(1998)
+    assert PercentDiscount("12.5% off", percent=12.5).apply_promotion(product, 1) == Money(874)  # 8.74125
+
+    # 3 for 2 gives 6.66 per item, 10% off the line total 19.98 -> 17.982 -> 17.98
+    stacked = StackedPromotion("deal", [ThirdOneFree("3 for 2"), PercentDiscount("10%", percent=10)])
+    assert stacked.apply_promotion(product, 3) == Money(1798)
+
+    totals = PercentDiscount("15% off", percent=15).apply_promotion_batch_cents([999, 100], [3, 1])
+    assert [int(total) for total in totals] == [2547, 85]
+    assert list(PercentDiscount("15% off", percent=15).apply_promotion_batch([9.99], [3])) == [25.47]
+    product.set_promotion(PercentDiscount("15% off", percent=15))
+    assert product.buy(3) == 25.47
+
+
+@pytest.mark.parametrize("percent", [100 / 3, 33.333333333, 12.5])
+def test_batch_pricing_matches_single_prices_for_float_percents(percent):
+    """
+    Test that batch pricing (vectorized with NumPy, if installed) does not overflow for float
+    percents with huge fractions and gives the same prices as pricing one line.
+    """
+    promotion = PercentDiscount("third off", percent=percent)
+    price_cents, quantities = [145000, 999, 1], [1, 1000, 7]
+    totals = promotion.apply_promotion_batch_cents(price_cents, quantities)
+    assert [int(total) for total in totals] == [promotion.price_cents(cents, quantity)
+                                                for cents, quantity in zip(price_cents, quantities)]
+
+    product = Product("MacBook Air M2", price=1450, quantity=2000)
+    product.set_promotion(promotion)
+    expected = product.get_price(1000)
+    assert Store([product]).order([(product, 1000)]) == expected
+
+
+@pytest.mark.parametrize("promotion", [PercentDiscount("15% off", percent=15), SecondHalfPrice("half"),
+                                       ThirdOneFree("3 for 2")])
+def test_batch_pricing_matches_single_prices_at_the_limits(promotion):
+    """
+    Test that batch pricing rounds prices with more than two decimals half up like a
+    single line, and does not overflow machine ints for huge amounts.
+    """
+    prices = [0.125, 0.005, 1.005, 9.99]
+    quantities = [2, 3, 1, 3]
+    expected = [promotion.price_cents(to_cents(price), quantity) / 100
+                for price, quantity in zip(prices, quantities)]
+    assert list(promotion.apply_promotion_batch(prices, quantities)) == expected
+
+    price_cents, quantities = [10 ** 12, 999], [10 ** 8, 3]
+    totals = promotion.apply_promotion_batch_cents(price_cents, quantities)
+    assert [int(total) for total in totals] == [promotion.price_cents(cents, quantity)
+                                                for cents, quantity in zip(price_cents, quantities)]
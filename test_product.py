@@ -2,9 +2,12 @@
 Unit tests for all product types and promotions in the Best Buy 2 project.
 Includes tests for core product functionality, special product types, and promotion logic.
 """
+import pickle
+
 import pytest
 from products import Product, NonStockedProduct, LimitedProduct
-from promotions import PercentDiscount, SecondHalfPrice, ThirdOneFree
+from promotions import PercentDiscount, SecondHalfPrice, ThirdOneFree, shared_promotion
+from promotions import StackedPromotion, BestPromotion
 
 def test_creating_product():
     """
@@ -192,3 +195,110 @@ def test_percent_discount_promotion():
 
     total = product.buy(1)
     assert total == 140.0  # 200 - 30% = 140
+
+
+def test_batch_promotions_match_single_prices():
+    """
+    Test that apply_promotion_batch returns the same prices as apply_promotion for every promotion type.
+    """
+    prices = [1000, 250, 19.99, 1]
+    quantities = [1, 2, 3, 7]
+    for promotion in (PercentDiscount("20% off", percent=20),
+                      SecondHalfPrice("Second Half price!"),
+                      ThirdOneFree("Third One Free!")):
+        expected = [promotion.apply_promotion(Product("test_product", price=price, quantity=10), quantity)
+                    for price, quantity in zip(prices, quantities)]
+        assert list(promotion.apply_promotion_batch(prices, quantities)) == pytest.approx(expected)
+
+    with pytest.raises(ValueError):
+        ThirdOneFree("Third One Free!").apply_promotion_batch([1, 2], [1])
+
+
+def test_products_have_no_instance_dict():
+    """
+    Test that all product types use __slots__ and can not get new attributes by accident.
+    """
+    for product in (Product("MacBook", price=1450, quantity=100),
+                    NonStockedProduct("Windows License", price=200),
+                    LimitedProduct("Shipping", price=10, quantity=5, maximum=1)):
+        assert not hasattr(product, "__dict__")
+        with pytest.raises(AttributeError):
+            product.colour = "silver"
+
+
+def test_shared_promotions_are_reused():
+    """
+    Test that shared_promotion returns one object per promotion type and parameters.
+    """
+    first = shared_promotion(PercentDiscount, "20% off", percent=20)
+    assert shared_promotion(PercentDiscount, "20% off", percent=20) is first
+    assert shared_promotion(PercentDiscount, "30% off", percent=30) is not first
+    assert shared_promotion(ThirdOneFree, "3 for 2") is not shared_promotion(SecondHalfPrice, "3 for 2")
+    assert first.apply_promotion(Product("MacBook", price=100, quantity=1), 1) == 80
+
+
+def test_stacked_promotion():
+    """
+    Test that a stacked promotion applies its promotions one after the other.
+    """
+    product = Product("Pixel 7", price=500, quantity=10)
+    product.set_promotion(StackedPromotion("3 for 2, then 10% off", [
+        ThirdOneFree("3 for 2"),
+        PercentDiscount("10% off", percent=10),
+    ]))
+    assert product.buy(3) == pytest.approx(900)  # 2 * 500, then 10% off
+
+    # two percent discounts give 20% and then 50% off
+    product.set_promotion(StackedPromotion("double deal", [
+        PercentDiscount("20% off", percent=20),
+        PercentDiscount("50% off", percent=50),
+    ]))
+    assert product.buy(2) == pytest.approx(400)
+
+
+def test_best_promotion():
+    """
+    Test that an exclusive group applies only the cheapest of its promotions.
+    """
+    group = BestPromotion("best offer", [
+        PercentDiscount("30% off", percent=30),
+        ThirdOneFree("3 for 2"),
+        SecondHalfPrice("Second Half price!"),
+    ])
+    product = Product("Bose Earbuds", price=100, quantity=100)
+    product.set_promotion(group)
+    assert product.buy(1) == 70  # only the percent discount helps
+    assert product.buy(3) == 200  # 3 for 2 is better than 210
+    assert list(group.apply_promotion_batch([100, 100], [1, 3])) == [70, 200]
+
+    # groups can be nested
+    nested = StackedPromotion("best offer, then 50% off", [group, PercentDiscount("50% off", percent=50)])
+    assert nested.apply_promotion(product, 3) == pytest.approx(100)
+
+    with pytest.raises(ValueError):
+        BestPromotion("empty", [])
+
+
+def test_group_is_compiled_again_after_a_change():
+    """
+    Test that a promotion group uses the new parameters of a changed promotion.
+    """
+    discount = PercentDiscount("20% off", percent=20)
+    group = StackedPromotion("deal", [discount, ThirdOneFree("3 for 2")])
+    product = Product("Bose Earbuds", price=100, quantity=100)
+    assert group.apply_promotion(product, 3) == pytest.approx(160)
+
+    version = group.version
+    discount.percent = 50
+    assert group.version > version
+    assert group.apply_promotion(product, 3) == pytest.approx(100)
+
+    # the change reaches groups containing the group, also in a pickled copy
+    nested = BestPromotion("best offer", [group, SecondHalfPrice("Second Half price!")])
+    copy = pickle.loads(pickle.dumps(nested))
+    version = nested.version
+    discount.percent = 0
+    assert nested.version > version
+    assert nested.apply_promotion(product, 3) == pytest.approx(200)
+    copy.promotions[0].promotions[0].percent = 20
+    assert copy.apply_promotion(product, 3) == pytest.approx(160)
@@ -0,0 +1,143 @@
+"""
+Unit tests for stock reservations of shopping carts.
+"""
+import threading
+import time
+
+import pytest
+from products import Product, NonStockedProduct, LimitedProduct
+from store import Store
+
+
+class FakeClock:
+    """Clock that only moves when the test says so."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def create_store():
+    store = Store([
+        Product("MacBook Air M2", price=1450, quantity=10),
+        NonStockedProduct("Windows License", price=200),
+        LimitedProduct("Shipping", price=10, quantity=5, maximum=1),
+    ])
+    store.reservations.clock = FakeClock()
+    return store
+
+
+def test_reserved_stock_is_not_available_to_other_orders():
+    """
+    Test that a reservation lowers the available stock and that checkout orders it.
+    """
+    store = create_store()
+    macbook = store.get_product("MacBook Air M2")
+    license_ = store.get_product("Windows License")
+
+    cart = store.reserve([(macbook, 8), (license_, 1)])
+    assert store.available(macbook) == 2
+    assert macbook.quantity == 10
+    with pytest.raises(Exception, match="Not enough quantity"):
+        store.order([(macbook, 3)])
+    with pytest.raises(Exception, match="Error reserving product MacBook Air M2"):
+        store.reserve([(macbook, 3)])
+    assert store.order([(macbook, 2)]) == 2900
+
+    receipt = store.checkout(cart)
+    assert receipt.total == 8 * 1450 + 200
+    assert macbook.quantity == 0 and store.available(macbook) == 0
+    assert not cart.active
+    with pytest.raises(Exception, match="already checked out"):
+        store.checkout(cart)
+
+
+def test_reservations_expire_lazily():
+    """
+    Test that expired reservations give their stock back and renewed ones do not expire early.
+    """
+    store = create_store()
+    clock = store.reservations.clock
+    macbook = store.get_product("MacBook Air M2")
+    shipping = store.get_product("Shipping")
+
+    abandoned = store.reserve([(macbook, 5)], ttl=60)
+    cart = store.reserve([(macbook, 1)], ttl=60)
+    clock.now = 50
+    store.reserve([(shipping, 1)], ttl=60, reservation=cart)  # renews the cart until 110
+    with pytest.raises(Exception, match="Cannot buy more than 1"):
+        store.reserve([(shipping, 1)], reservation=cart)
+    assert store.available(macbook) == 4
+
+    clock.now = 61
+    assert store.available(macbook) == 9
+    assert not abandoned.active and cart.active
+    assert len(store.reservations) == 1
+
+    clock.now = 111
+    assert store.reservations.expire() == 1
+    assert store.available(macbook) == 10 and store.available(shipping) == 5
+    with pytest.raises(Exception, match="expired"):
+        store.checkout(cart)
+
+    store.release(store.reserve([(macbook, 10)]))
+    assert store.available(macbook) == 10
+
+
+def test_reserve_and_order_do_not_interleave():
+    """
+    Test that an order in another thread waits for a reservation of the same product in thread safe mode.
+    """
+    macbook = Product("MacBook Air M2", price=1450, quantity=10)
+    store = Store([macbook], thread_safe=True)
+    # a slow clock widens the gap between the stock check and the update of the reservation
+    store.reservations.clock = lambda: time.sleep(0.05) or 0.0
+    thread = threading.Thread(target=store.reserve, args=([(macbook, 8)],))
+    thread.start()
+    time.sleep(0.02)
+    with pytest.raises(Exception, match="Not enough quantity"):
+        store.order([(macbook, 5)])
+    thread.join()
+    assert macbook.quantity == 10 and store.available(macbook) == 2
+
+
+def test_cart_is_checked_out_once():
+    """
+    Test that two concurrent checkouts of one cart order it only once in thread safe mode.
+    """
+    macbook = Product("MacBook Air M2", price=10, quantity=10)
+    store = Store([macbook], thread_safe=True)
+    cart = store.reserve([(macbook, 3)])
+    store.reservations.clock = lambda: time.sleep(0.01) or 0.0  # widens the gap between check and checkout
+    results = []
+
+    def checkout():
+        try:
+            results.append(store.checkout(cart).total)
+        except Exception as e:
+            results.append(e)
+
+    threads = [threading.Thread(target=checkout) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results, key=str)[0] == 30
+    assert "already checked out" in str(sorted(results, key=str)[1])
+    assert macbook.quantity == 7
+
+
+def test_reserve_rejects_amounts_below_one():
+    """
+    Test that every reserved line needs a positive quantity, also when it is added to a cart.
+    """
+    store = create_store()
+    macbook = store.get_product("MacBook Air M2")
+    cart = store.reserve([(macbook, 5)])
+    for quantity in (0, -3):
+        with pytest.raises(Exception, match="positive integer"):
+            store.reserve([(macbook, quantity)], reservation=cart)
+    assert store.available(macbook) == 5
+    assert store.checkout(cart).total == 5 * 1450
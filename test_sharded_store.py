@@ -0,0 +1,95 @@
+"""
+Unit tests for the store split over worker processes.
+"""
+import pytest
+from products import Product, NonStockedProduct, LimitedProduct, to_row
+from promotions import PercentDiscount, StackedPromotion, ThirdOneFree
+from sharded_store import ShardedStore, _ShardWorker, shard_of
+
+
+def create_products():
+    """Create products on both shards of a store with two workers."""
+    macbook = Product("MacBook Air M2", price=1450, quantity=100)
+    macbook.set_promotion(PercentDiscount("20% off", percent=20))
+    return [
+        macbook,
+        Product("Bose QuietComfort Earbuds", price=250, quantity=500),
+        NonStockedProduct("Windows License", price=200),
+        LimitedProduct("Shipping", price=10, quantity=5, maximum=1),
+    ]
+
+
+@pytest.fixture
+def store():
+    with ShardedStore(create_products(), workers=2) as sharded:
+        yield sharded
+
+
+def test_products_are_split_over_the_shards(store):
+    """
+    Test that every product lives in the shard of its name and the aggregates combine all shards.
+    """
+    assert shard_of("Shipping", 2) != shard_of("MacBook Air M2", 2)
+    assert store.get_total_quantity() == 605
+    assert sorted(product.name for product in store.get_all_products()) == [
+        "Bose QuietComfort Earbuds", "MacBook Air M2", "Shipping", "Windows License"]
+    assert store.get_product("MacBook Air M2").promotion.name == "20% off"
+    assert store.get_product("iPhone") is None
+
+
+def test_single_and_cross_shard_orders(store):
+    """
+    Test that orders on one shard and over both shards update the stock of every shard.
+    """
+    macbook = store.get_product("MacBook Air M2")
+    shipping = store.get_product("Shipping")
+    assert store.order([(macbook, 2)]) == 2320
+    assert store.order([(macbook, 1), (shipping, 1)]) == 1170
+    assert store.get_product("MacBook Air M2").quantity == 97
+    assert store.get_product("Shipping").quantity == 4
+    assert store.order_many([[(macbook, 1)], [(shipping, 1), (macbook, 1)], [(shipping, 2)]])[:2] == [1160, 1170]
+
+
+def test_failed_cross_shard_order_changes_nothing(store):
+    """
+    Test that a cross-shard order that fails on one shard is aborted on all shards.
+    """
+    macbook = store.get_product("MacBook Air M2")
+    shipping = store.get_product("Shipping")
+    with pytest.raises(Exception, match="Cannot buy more than 1"):
+        store.order([(macbook, 10), (shipping, 2)])
+    assert store.get_total_quantity() == 605
+
+    results = store.order_many([[(macbook, 1000)], [(macbook, 1)]])
+    assert isinstance(results[0], Exception) and results[1] == 1160
+
+    store.remove_product(shipping)
+    assert store.get_product("Shipping") is None
+    with pytest.raises(ValueError):
+        store.add_product(Product("MacBook Air M2", price=1, quantity=1))
+
+
+def test_abort_keeps_orders_placed_after_the_prepare():
+    """
+    Test that aborting a prepared order gives back its amounts without undoing later orders of the shard.
+    """
+    worker = _ShardWorker([to_row(product) for product in create_products()])
+    worker.prepare((1, [("Shipping", 1), ("MacBook Air M2", 3)]))
+    worker.order([("MacBook Air M2", 2)])
+    worker.abort(1)
+    assert worker.store.get_product("MacBook Air M2").quantity == 98
+    assert worker.store.get_product("Shipping").quantity == 5
+    assert worker.store.get_product("Shipping").is_active()
+
+
+def test_products_with_promotion_groups():
+    """
+    Test that products with a compiled promotion group can be sent to and from the worker processes.
+    """
+    products = create_products()
+    products[1].set_promotion(StackedPromotion("deal", [ThirdOneFree("3 for 2"), PercentDiscount("10%", percent=10)]))
+    assert products[1].get_price(3) == 450  # compiles the group
+    with ShardedStore(products, workers=2) as store:
+        earbuds = store.get_product("Bose QuietComfort Earbuds")
+        assert store.order([(earbuds, 3)]) == 450
+        assert store.get_product("Bose QuietComfort Earbuds").promotion.name == "deal"
@@ -0,0 +1,33 @@
+"""
+Unit tests for the order simulation harness.
+"""
+from benchmarks.common import create_products
+from benchmarks.simulation import create_store, generate_orders, load_orders, save_orders, simulate
+from products import NonStockedProduct
+
+
+def test_simulation_is_reproducible(tmp_path):
+    """
+    Test that the same seed gives the same orders and results with both engines,
+    and that the reported stockouts match the store.
+    """
+    orders = generate_orders(create_products(200, promotions=True), 500, seed=7)
+    assert orders == generate_orders(create_products(200, promotions=True), 500, seed=7)
+    path = str(tmp_path / "orders.jsonl")
+    save_orders(orders, path)
+    assert load_orders(path) == orders
+
+    reports = []
+    for engine in ("store", "columnar"):
+        products = create_products(200, promotions=True)
+        quantities = {product.name: product.quantity for product in products
+                      if not isinstance(product, NonStockedProduct)}
+        store = create_store(products, engine=engine)
+        results = simulate(store, orders, quantities)
+        assert results["placed"] + results["failed"] == 500
+        assert results["failed"] > 0  # the hot products run out of stock
+        assert results["stockouts"]
+        for name in results["stockouts"]:
+            assert store.get_product(name).quantity == 0
+        reports.append((results["placed"], results["revenue"], list(results["stockouts"])))
+    assert reports[0] == reports[1]
@@ -0,0 +1,124 @@
+"""
+Unit tests for saving and loading binary inventory snapshots.
+"""
+import pytest
+from products import Product, NonStockedProduct, LimitedProduct
+from promotions import PercentDiscount, SecondHalfPrice, ThirdOneFree, StackedPromotion, BestPromotion
+from store import Store
+
+
+def create_store():
+    """Create a store with all product types and all promotion types."""
+    products = [
+        Product("MacBook Air M2", price=1450, quantity=100),
+        Product("Bose QuietComfort Earbuds", price=250, quantity=500),
+        Product("Google Pixel 7", price=500, quantity=0),
+        NonStockedProduct("Windows License", price=200),
+        LimitedProduct("Shipping", price=10, quantity=5, maximum=1),
+        Product("Käsekuchen", price=2.5, quantity=3),
+    ]
+    products[0].set_promotion(PercentDiscount("20% off", percent=20))
+    products[1].set_promotion(SecondHalfPrice("Second one half price"))
+    products[2].set_promotion(ThirdOneFree("3 für 2 Aktion"))
+    products[3].set_promotion(PercentDiscount("30% off", percent=30))
+    return Store(products)
+
+
+def test_snapshot_round_trip(tmp_path):
+    """
+    Test that all product types and promotions are the same after save and load.
+    """
+    store = create_store()
+    path = tmp_path / "inventory.snap"
+    store.save(path)
+    loaded = Store.load(path)
+
+    assert [product.show() for product in loaded.products] == [product.show() for product in store.products]
+    assert loaded.get_total_quantity() == store.get_total_quantity()
+    assert [product.name for product in loaded.get_all_products()] == \
+           [product.name for product in store.get_all_products()]
+    assert isinstance(loaded.get_product("Windows License"), NonStockedProduct)
+    assert loaded.get_product("Shipping").maximum == 1
+    assert loaded.get_product("Google Pixel 7").promotion.name == "3 für 2 Aktion"
+    assert loaded.get_product("Käsekuchen").price == 2.5
+    assert loaded.get_product("iPhone") is None
+
+
+def test_loaded_store_can_be_changed(tmp_path):
+    """
+    Test that orders and new products work on a loaded store and do not change the file.
+    """
+    path = tmp_path / "inventory.snap"
+    create_store().save(path)
+    loaded = Store.load(path)
+
+    macbook = loaded.get_product("MacBook Air M2")
+    assert loaded.order([(macbook, 2)]) == 2 * 1160
+    loaded.add_product(Product("iPhone", price=900, quantity=10))
+    loaded.remove_product(loaded.get_product("Käsekuchen"))
+    assert loaded.get_total_quantity() == 98 + 500 + 5 + 10
+
+    again = Store.load(path)
+    assert again.get_product("MacBook Air M2").quantity == 100
+    assert again.get_product("iPhone") is None
+
+    # the changed store can be saved again
+    loaded.save(path)
+    assert Store.load(path).get_product("iPhone").quantity == 10
+
+
+def test_snapshot_with_promotion_groups(tmp_path):
+    """
+    Test that stacked, best and nested promotion groups are saved and price the same after loading,
+    also when two products have equal but separate promotions.
+    """
+    discount = PercentDiscount("10% off", percent=10)
+    stacked = StackedPromotion("3 for 2, then 10% off", [ThirdOneFree("3 for 2"), discount])
+    best = BestPromotion("best offer", [stacked, SecondHalfPrice("Second one half price"), discount])
+    products = [
+        Product("MacBook Air M2", price=1450, quantity=100),
+        Product("Bose QuietComfort Earbuds", price=250, quantity=500),
+        Product("Google Pixel 7", price=500, quantity=50),
+        Product("iPhone", price=900, quantity=10),
+    ]
+    products[0].set_promotion(stacked)
+    products[1].set_promotion(best)
+    products[2].set_promotion(PercentDiscount("10% off", percent=10))
+    products[3].set_promotion(discount)
+    store = Store(products)
+    path = tmp_path / "inventory.snap"
+    store.save(path)
+    loaded = Store.load(path)
+
+    for product in store.products:
+        copy = loaded.get_product(product.name)
+        assert copy.promotion.name == product.promotion.name
+        assert [copy.get_price(quantity) for quantity in (1, 2, 3, 7)] == \
+               [product.get_price(quantity) for quantity in (1, 2, 3, 7)]
+    assert isinstance(loaded.get_product("Bose QuietComfort Earbuds").promotion, BestPromotion)
+    loaded.save(path)
+    assert Store.load(path).get_product("MacBook Air M2").get_price(3) == 2610
+
+
+def test_loaded_promotions_can_not_be_changed_for_other_stores(tmp_path):
+    """
+    Test that a promotion of a loaded store, which is shared with other loads, can not be changed.
+    """
+    path = tmp_path / "inventory.snap"
+    create_store().save(path)
+    first, second = Store.load(path), Store.load(path)
+    with pytest.raises(AttributeError, match="shared"):
+        first.get_product("MacBook Air M2").promotion.percent = 30
+    first.get_product("MacBook Air M2").set_promotion(PercentDiscount("30% off", percent=30))
+    assert first.get_product("MacBook Air M2").get_price(1) == 1015
+    assert second.get_product("MacBook Air M2").get_price(1) == 1160
+
+
+def test_load_rejects_other_files(tmp_path):
+    """
+    Test that loading a file that is not a snapshot raises a ValueError.
+    """
+    path = tmp_path / "products.txt"
+    path.write_bytes(b"MacBook Air M2, 1450, 100" * 10)
+    with pytest.raises(ValueError):
+        Store.load(path)
@@ -0,0 +1,430 @@
+"""
+Unit tests for the Store class of the Best Buy 2 project.
+Includes tests for the product catalog, the cached totals and order processing.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import pytest
+from products import Product, NonStockedProduct, LimitedProduct
+from basket import BundleDiscount, BasketThresholdDiscount
+from journal import Journal, read_transactions
+from promotions import PercentDiscount, ThirdOneFree
+from store import Store
+
+
+def create_store():
+    """Create a small store with one product of every type."""
+    return Store([
+        Product("MacBook Air M2", price=1450, quantity=100),
+        Product("Bose QuietComfort Earbuds", price=250, quantity=500),
+        NonStockedProduct("Windows License", price=200),
+        LimitedProduct("Shipping", price=10, quantity=5, maximum=1),
+    ])
+
+
+def test_store_keeps_product_list():
+    """
+    Test that the products property lists all products in insertion order.
+    """
+    store = create_store()
+    names = [product.name for product in store.products]
+    assert names == ["MacBook Air M2", "Bose QuietComfort Earbuds", "Windows License", "Shipping"]
+
+
+def test_get_product_by_name():
+    """
+    Test that products can be looked up by their name.
+    """
+    store = create_store()
+    assert store.get_product("Shipping").maximum == 1
+    assert store.get_product("iPhone") is None
+
+
+def test_add_and_remove_product():
+    """
+    Test that adding and removing products updates the catalog and the totals.
+    """
+    store = create_store()
+    pixel = Product("Google Pixel 7", price=500, quantity=50)
+    store.add_product(pixel)
+    assert store.get_total_quantity() == 655
+    assert pixel in store.get_all_products()
+
+    store.remove_product(pixel)
+    assert store.get_total_quantity() == 605
+    assert store.get_product("Google Pixel 7") is None
+
+    # the product is not in the store anymore
+    with pytest.raises(ValueError):
+        store.remove_product(pixel)
+
+    # changes of removed products do not affect the store
+    pixel.set_quantity(10)
+    assert store.get_total_quantity() == 605
+
+
+def test_add_duplicate_or_invalid_product():
+    """
+    Test that duplicate names and non-products are rejected.
+    """
+    store = create_store()
+    with pytest.raises(ValueError):
+        store.add_product(Product("Shipping", price=5, quantity=1))
+    with pytest.raises(TypeError):
+        store.add_product("Shipping")
+    with pytest.raises(TypeError):
+        Store(["MacBook"])
+
+
+def test_total_quantity_follows_product_changes():
+    """
+    Test that the total quantity is updated by buy() and set_quantity().
+    """
+    store = create_store()
+    macbook = store.get_product("MacBook Air M2")
+    macbook.buy(10)
+    assert store.get_total_quantity() == 595
+    macbook.set_quantity(0)
+    assert store.get_total_quantity() == 505
+
+
+def test_active_products_follow_product_changes():
+    """
+    Test that deactivated and sold out products are not returned as active.
+    """
+    store = create_store()
+    shipping = store.get_product("Shipping")
+    earbuds = store.get_product("Bose QuietComfort Earbuds")
+
+    earbuds.deactivate()
+    shipping.set_quantity(0)
+    active_names = [product.name for product in store.get_all_products()]
+    assert active_names == ["MacBook Air M2", "Windows License"]
+
+    earbuds.activate()
+    assert earbuds in store.get_all_products()
+
+
+def test_order_returns_total_price():
+    """
+    Test that an order removes the stock and returns the total price.
+    """
+    store = create_store()
+    macbook = store.get_product("MacBook Air M2")
+    license_ = store.get_product("Windows License")
+
+    total = store.order([(macbook, 2), (license_, 3)])
+    assert total == 2 * 1450 + 3 * 200
+    assert macbook.quantity == 98
+    assert store.get_total_quantity() == 603
+
+
+def test_failed_order_changes_nothing():
+    """
+    Test that an order with one invalid line does not change the stock of the other lines.
+    """
+    store = create_store()
+    macbook = store.get_product("MacBook Air M2")
+    earbuds = store.get_product("Bose QuietComfort Earbuds")
+
+    with pytest.raises(Exception):
+        store.order([(macbook, 2), (earbuds, 3), (macbook, 99)])
+
+    assert macbook.quantity == 100
+    assert earbuds.quantity == 500
+    assert store.get_total_quantity() == 605
+
+
+def test_order_checks_maximum_for_whole_order():
+    """
+    Test that the maximum of a LimitedProduct counts for all lines of an order together.
+    """
+    store = create_store()
+    shipping = store.get_product("Shipping")
+
+    with pytest.raises(Exception):
+        store.order([(shipping, 1), (shipping, 1)])
+    assert shipping.quantity == 5
+
+    assert store.order([(shipping, 1)]) == 10
+    assert shipping.quantity == 4
+
+
+def test_concurrent_orders_do_not_oversell():
+    """
+    Test that many threads ordering the same products never sell more than the stock.
+    """
+    hot = Product("Hot Product", price=10, quantity=500)
+    other = Product("Other Product", price=5, quantity=300)
+    store = Store([hot, other, NonStockedProduct("Windows License", price=200)], thread_safe=True)
+    license_ = store.get_product("Windows License")
+
+    def place_order(number):
+        # alternate the line order so the locks are requested in different orders
+        lines = [(hot, 1), (other, 1), (license_, 1)]
+        if number % 2:
+            lines.reverse()
+        try:
+            store.order(lines)
+            return True
+        except Exception:
+            return False
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(place_order, range(1000)))
+
+    successful = sum(results)
+    assert successful == 300  # "Other Product" limits the number of orders
+    assert hot.quantity == 500 - successful
+    assert other.quantity == 0 and not other.active
+    assert store.get_total_quantity() == hot.quantity
+
+
+def test_quote_prices_lines_without_ordering():
+    """
+    Test that quote() returns the promoted price of every line and does not change the stock.
+    """
+    store = create_store()
+    macbook = store.get_product("MacBook Air M2")
+    earbuds = store.get_product("Bose QuietComfort Earbuds")
+    macbook.set_promotion(PercentDiscount("20% off", percent=20))
+    earbuds.set_promotion(ThirdOneFree("3 for 2"))
+
+    shopping_list = [(macbook, 1), (earbuds, 3), (store.get_product("Shipping"), 1), (macbook, 2)]
+    assert store.quote(shopping_list) == [1160, 500, 10, 2320]
+    assert macbook.quantity == 100
+    assert sum(store.quote(shopping_list)) == store.order(shopping_list)
+
+
+def test_basket_promotions_on_receipt():
+    """
+    Test that bundle and threshold promotions are applied to the order and shown per line.
+    """
+    store = create_store()
+    macbook = store.get_product("MacBook Air M2")
+    license_ = store.get_product("Windows License")
+    shipping = store.get_product("Shipping")
+    store.add_basket_promotion(BundleDiscount("License 50% with MacBook", trigger="MacBook Air M2",
+                                              target="Windows License", percent=50))
+    store.add_basket_promotion(BasketThresholdDiscount("10% over 2000", threshold=2000, percent=10))
+
+    # no MacBook and below the threshold: no basket discount
+    assert store.order([(license_, 1), (shipping, 1)]) == 210
+    # a MacBook without a license triggers the bundle, but it changes nothing
+    assert store.place_order([(macbook, 1)]).applied == []
+
+    receipt = store.place_order([(macbook, 2), (license_, 1)])
+    assert receipt.applied == ["License 50% with MacBook", "10% over 2000"]
+    assert [line.basket_discount for line in receipt.lines] == pytest.approx([290, 100 + 10])
+    assert [line.total for line in receipt.lines] == pytest.approx([2610, 90])
+    assert receipt.total == pytest.approx(2700)
+    assert macbook.quantity == 97
+
+
+def test_order_many_is_one_batch(tmp_path):
+    """
+    Test that order_many places every valid order, returns the errors of the others
+    and writes the whole batch as one journal transaction.
+    """
+    store = create_store()
+    store.attach_journal(Journal(tmp_path / "journal.log"))
+    macbook = store.get_product("MacBook Air M2")
+    shipping = store.get_product("Shipping")
+
+    results = store.order_many([[(macbook, 60)], [(macbook, 60)], [(shipping, 2)], [(macbook, 40), (shipping, 1)]])
+    assert results[0] == 87000 and results[3] == 58010
+    assert "Not enough quantity" in str(results[1]) and "Cannot buy more than 1" in str(results[2])
+    assert macbook.quantity == 0 and shipping.quantity == 4
+    store.journal.close()
+    assert len(list(read_transactions(tmp_path / "journal.log"))) == 1
+
+
+def test_preview_order_does_not_change_stock():
+    """
+    Test that preview_order prices the basket like place_order without ordering it.
+    """
+    store = create_store()
+    macbook = store.get_product("MacBook Air M2")
+    rule = BasketThresholdDiscount("10% over 2000", threshold=2000, percent=10)
+    store.add_basket_promotion(rule)
+
+    assert store.preview_order([(macbook, 2)]).total == pytest.approx(2610)
+    assert macbook.quantity == 100
+
+    store.remove_basket_promotion(rule)
+    assert store.preview_order([(macbook, 2)]).total == 2900
+    with pytest.raises(ValueError):
+        store.remove_basket_promotion(rule)
+
+
+def test_quote_cache_is_invalidated_by_changes():
+    """
+    Test that quotes are served from the cache until price, promotion or stock change.
+    """
+    store = create_store()
+    macbook = store.get_product("MacBook Air M2")
+    promotion = PercentDiscount("20% off", percent=20)
+    macbook.set_promotion(promotion)
+    shopping_list = [(macbook, 2)]
+
+    assert store.quote(shopping_list) == [2320]
+    assert store.quote(shopping_list) == [2320]
+    assert store.quote_cache.info()["hits"] == 1
+
+    macbook.price = 1000
+    assert store.quote(shopping_list) == [1600]
+    promotion.percent = 50
+    assert store.quote(shopping_list) == [1000]
+    macbook.set_promotion(None)
+    assert store.quote(shopping_list) == [2000]
+    assert store.quote_cache.misses == 4
+
+    # stock changes give the product a new version, too
+    macbook.set_quantity(50)
+    store.quote(shopping_list)
+    assert store.quote_cache.info() == {"hits": 1, "misses": 5, "size": 5, "maxsize": 10_000}
+
+    uncached = Store([Product("Pen", price=2, quantity=10)], quote_cache_size=0)
+    assert uncached.quote([(uncached.get_product("Pen"), 3)]) == [6]
+    assert len(uncached.quote_cache) == 0
+
+
+def test_find_uses_indexes_that_follow_changes():
+    """
+    Test that find() filters by price, stock, promotion and class, also after products changed.
+    """
+    store = create_store()
+    macbook = store.get_product("MacBook Air M2")
+    earbuds = store.get_product("Bose QuietComfort Earbuds")
+
+    def names(**filters):
+        return sorted(product.name for product in store.find(**filters))
+
+    assert names(price_between=(10, 250)) == ["Bose QuietComfort Earbuds", "Shipping", "Windows License"]
+    assert names(quantity_below=100) == ["Shipping"]
+    assert names(kind=LimitedProduct) == ["Shipping"]
+
+    deal = ThirdOneFree("3 for 2")
+    earbuds.set_promotion(deal)
+    macbook.set_promotion(PercentDiscount("20% off", percent=20))
+    macbook.price = 240
+    store.order([(macbook, 99)])
+    earbuds.set_quantity(50)
+    assert names(promotion=deal) == ["Bose QuietComfort Earbuds"]
+    assert names(promotion=PercentDiscount, price_between=(200, 250)) == ["MacBook Air M2"]
+    assert names(quantity_below=100, price_between=(200, 300)) == ["Bose QuietComfort Earbuds", "MacBook Air M2"]
+
+    store.remove_product(earbuds)
+    store.add_product(Product("Google Pixel 7", price=500, quantity=1))
+    store.order([(macbook, 1)])
+    assert names(quantity_below=100) == ["Google Pixel 7", "MacBook Air M2", "Shipping"]
+    assert names(quantity_below=100, active_only=True) == ["Google Pixel 7", "Shipping"]
+
+    # many changes between two queries are merged by re-sorting the index
+    many = Store([Product(f"SKU {number:02d}", price=10, quantity=number) for number in range(50)])
+    assert len(many.find(quantity_below=10)) == 10
+    for product in many.products:
+        product.set_quantity(50 - product.quantity)
+    assert sorted(product.name for product in many.find(quantity_below=5)) == [
+        "SKU 46", "SKU 47", "SKU 48", "SKU 49"]
+
+
+def test_low_stock_watch_fires_on_crossing():
+    """
+    Test that a low-stock watch is called once when the quantity falls below its threshold.
+    """
+    store = create_store()
+    macbook = store.get_product("MacBook Air M2")
+    low = []
+    watch = store.watch_low_stock(10, low.append)
+    store.watch_low_stock(50, lambda product: low.append("below 50"))
+
+    store.order([(macbook, 80)])  # 100 -> 20
+    store.order([(macbook, 15)])  # 20 -> 5
+    store.order([(macbook, 1)])  # already below both thresholds
+    macbook.set_quantity(100)
+    store.unwatch_low_stock(watch)
+    macbook.set_quantity(0)
+    assert low == ["below 50", macbook, "below 50"]
+
+
+@pytest.mark.parametrize("thread_safe", [False, True])
+def test_low_stock_watch_can_reorder(thread_safe):
+    """
+    Test that a low-stock callback may change the stock of the product without deadlocking.
+    """
+    macbook = Product("MacBook Air M2", price=1450, quantity=100)
+    store = Store([macbook], thread_safe=thread_safe)
+    store.watch_low_stock(10, lambda product: product.set_quantity(product.quantity + 100))
+
+    def buy():
+        store.order([(macbook, 95)])
+        macbook.buy(2)
+        macbook.buy(100)
+
+    thread = threading.Thread(target=buy, daemon=True)
+    thread.start()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert macbook.quantity == 103  # reordered twice
+
+
+@pytest.mark.parametrize("thread_safe", [False, True])
+def test_low_stock_callbacks_run_after_the_whole_order(thread_safe, caplog):
+    """
+    Test that low-stock callbacks see the complete order and that a failing callback
+    neither changes the order nor stops the other callbacks.
+    """
+    macbook = Product("MacBook Air M2", price=1450, quantity=10)
+    pixel = Product("Google Pixel 7", price=500, quantity=10)
+    store = Store([macbook, pixel], thread_safe=thread_safe)
+    seen = []
+
+    def failing(product):
+        seen.append((product.name, macbook.quantity, pixel.quantity))
+        raise RuntimeError("supplier unreachable")
+
+    store.watch_low_stock(5, failing)
+    store.watch_low_stock(5, lambda product: seen.append(product.name))
+    assert store.order([(macbook, 6), (pixel, 6)]) == 6 * 1450 + 6 * 500
+    assert seen == [("MacBook Air M2", 4, 4), "MacBook Air M2", ("Google Pixel 7", 4, 4), "Google Pixel 7"]
+    assert macbook.quantity == pixel.quantity == 4
+    assert "supplier unreachable" in caplog.text
+
+
+def test_iter_products_pages_stay_stable_when_products_change():
+    """
+    Test cursor pagination while products are added and removed between pages.
+    """
+    store = Store([Product(f"Product {number}", price=10, quantity=5) for number in range(10)])
+    page = store.iter_products(limit=4)
+    assert [product.name for product in page] == [f"Product {number}" for number in range(4)]
+
+    store.remove_product(store.get_product("Product 2"))  # already shown
+    store.remove_product(store.get_product("Product 5"))  # not shown yet
+    product_6 = store.get_product("Product 6")
+    store.remove_product(product_6)
+    store.add_product(Product("Product 10", price=10, quantity=5))
+    store.add_product(product_6)  # added again: listed once, at the end
+    store.get_product("Product 4").set_quantity(0)
+
+    names = [product.name for product in store.iter_products(after=page.cursor)]
+    assert names == ["Product 4", "Product 7", "Product 8", "Product 9", "Product 10", "Product 6"]
+    active = store.iter_products(active_only=True, after=page.cursor, limit=2)
+    assert [product.name for product in active] == ["Product 7", "Product 8"]
+
+
+def test_iter_products_cursor_survives_compaction():
+    """
+    Test that a cursor stays valid after most products were removed and the listing was compacted.
+    """
+    store = Store([Product(f"Product {number}", price=10, quantity=5) for number in range(3000)])
+    page = store.iter_products(limit=1500)
+    list(page)
+    for number in range(3000):
+        if number % 3 != 1:
+            store.remove_product(store.get_product(f"Product {number}"))
+    assert len(store._listing) < 3000
+    names = [product.name for product in store.iter_products(after=page.cursor, limit=3)]
+    assert names == ["Product 1501", "Product 1504", "Product 1507"]
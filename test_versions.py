@@ -0,0 +1,132 @@
+"""
+Unit tests for the consistent read views returned by Store.snapshot().
+"""
+import gc
+import threading
+
+import pytest
+from products import Product, NonStockedProduct
+from store import Store
+from columnar import ColumnarStore
+
+
+def create_products():
+    return [
+        Product("MacBook Air M2", price=1450, quantity=100),
+        Product("Bose QuietComfort Earbuds", price=250, quantity=500),
+        NonStockedProduct("Windows License", price=125),
+    ]
+
+
+@pytest.mark.parametrize("store_class", [Store, ColumnarStore])
+def test_snapshot_does_not_see_later_changes(store_class):
+    """
+    Test that a view keeps the stock, products and total of its version.
+    """
+    store = store_class(create_products())
+    macbook = store.get_product("MacBook Air M2")
+    bose = store.get_product("Bose QuietComfort Earbuds")
+
+    view = store.snapshot()
+    store.order([(macbook, 100), (bose, 5)])
+    bose.price = 200
+    store.add_product(Product("Google Pixel 7", price=500, quantity=250))
+    store.remove_product(store.get_product("Windows License"))
+
+    assert view.get_total_quantity() == 600
+    assert view.get_product("MacBook Air M2").quantity == 100
+    assert view.get_product("MacBook Air M2").active
+    assert view.get_product("Bose QuietComfort Earbuds").price == 250
+    assert view.get_product("Google Pixel 7") is None
+    assert view.get_product("Windows License") is not None
+    assert sorted(state.name for state in view.get_all_products()) == [
+        "Bose QuietComfort Earbuds", "MacBook Air M2", "Windows License"]
+
+    later = store.snapshot()
+    assert later.get_total_quantity() == store.get_total_quantity() == 745
+    assert not later.get_product("MacBook Air M2").active
+    assert later.get_product("Windows License") is None
+    assert len(later.products) == 3
+
+
+def test_old_versions_are_released_with_the_last_view():
+    """
+    Test that the history is kept while a view needs it and dropped after it is closed.
+    """
+    store = Store(create_products())
+    macbook = store.get_product("MacBook Air M2")
+    with store.snapshot() as first:
+        second = store.snapshot()
+        store.order([(macbook, 1)])
+        assert store.versions._history
+        first.close()
+        assert store.versions._history  # still needed by second
+        assert second.get_product("MacBook Air M2").quantity == 100
+        del second
+        gc.collect()
+        assert not store.versions._history
+        assert not store.versions._readers
+    store.order([(macbook, 1)])
+    assert not store.versions._history  # without open views, nothing is kept
+
+
+def test_views_see_whole_orders_only():
+    """
+    Test that concurrent readers never see a half-applied order.
+    Every order takes one unit of both products, so their quantities stay equal.
+    """
+    store = Store([Product("A", price=1, quantity=20_000), Product("B", price=1, quantity=20_000)],
+                  thread_safe=True)
+    a, b = store.get_product("A"), store.get_product("B")
+    torn = []
+
+    def order():
+        for _ in range(5_000):
+            store.order([(a, 1), (b, 1)])
+
+    writer = threading.Thread(target=order)
+    writer.start()
+    while writer.is_alive():
+        with store.snapshot() as view:
+            quantities = (view.get_product("A").quantity, view.get_product("B").quantity)
+            if quantities[0] != quantities[1] or view.get_total_quantity() != sum(quantities):
+                torn.append(quantities)
+    writer.join()
+    assert not torn
+    assert a.quantity == b.quantity == 15_000
+
+
+def test_orders_do_not_wait_for_the_first_snapshot(monkeypatch):
+    """
+    Test that orders take no store-wide lock before snapshot() and go on while the first
+    snapshot reads the catalog, and that the view still sees whole orders only.
+    """
+    import versions
+    store = Store([Product(f"Product {number}", price=1, quantity=10) for number in range(10)],
+                  thread_safe=True)
+    first, last = store.get_product("Product 0"), store.get_product("Product 9")
+
+    with store.versions.lock:  # held by another thread
+        orderer = threading.Thread(target=store.order, args=([(first, 1)],))
+        orderer.start()
+        orderer.join(timeout=5)
+        assert not orderer.is_alive()
+
+    current_state = versions._current_state
+    orders = []
+
+    def read_state(product):
+        if not orders:
+            # an order of the first and the last product while the pass is between them
+            orders.append(threading.Thread(target=store.order, args=([(first, 1), (last, 1)],)))
+            orders[0].start()
+            orders[0].join(timeout=5)
+            assert not orders[0].is_alive()
+        return current_state(product)
+
+    monkeypatch.setattr(versions, "_CHUNK_SIZE", 1)
+    monkeypatch.setattr(versions, "_current_state", read_state)
+    view = store.snapshot()
+    assert view.get_product("Product 0").quantity == 8
+    assert view.get_product("Product 9").quantity == 9
+    assert view.get_total_quantity() == store.get_total_quantity() == 97
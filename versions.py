@@ -0,0 +1,294 @@
+"""
+Consistent read views of a store's inventory (multi-version concurrency control).
+
+Store.snapshot() returns a ReadView of the inventory as of one committed version.
+Creating a view only takes a short lock to read the version number; reading it
+takes no lock at all, so reports never block Store.order, and an order is either
+completely visible in a view or not at all.
+
+The store keeps the committed state of every product as an immutable ProductState
+(quantity, active, price, promotion), replaced by a new one on every change, and while
+read views are open, the state a product had before each change (undo history). A view of version V uses the state of the
+first change after V, or the current state if there was none. When the last view
+of the oldest version is closed, the history it needed is dropped.
+
+Version tracking starts with the first snapshot(), which makes one pass over the
+catalog; afterwards every snapshot() is O(1). Until then the store pays nothing: commits
+take no lock. The pass itself does not block orders either, it locks only small chunks.
+"""
+from contextlib import nullcontext
+import threading
+import weakref
+
+from locks import stock_locks
+
+# products added to the state per lock round while version tracking starts
+_CHUNK_SIZE = 1000
+
+
+class ProductState:
+    """Immutable state of a product in a read view."""
+    __slots__ = ("product", "quantity", "active", "price", "promotion")
+
+    def __init__(self, product, quantity, active, price, promotion):
+        self.product = product  # the live product, e.g. to order it
+        self.quantity = quantity
+        self.active = active
+        self.price = price
+        self.promotion = promotion
+
+    @property
+    def name(self):
+        return self.product.name
+
+    def is_active(self):
+        return self.active
+
+    def get_quantity(self):
+        return self.quantity
+
+    def __repr__(self):
+        return f"ProductState({self.name!r}, quantity={self.quantity}, active={self.active})"
+
+
+def _current_state(product):
+    return ProductState(product, product.quantity, product.active, product.price, product.promotion)
+
+
+class InventoryVersions:
+    """Committed versions of the products of one store."""
+
+    def __init__(self, thread_safe=False):
+        """
+        :param thread_safe: if True, orders and read views may be used from several threads
+        """
+        # re-entrant: the changes of an order are recorded while its commit holds the lock
+        self.lock = threading.RLock() if thread_safe else nullcontext()
+        self.thread_safe = thread_safe
+        self.version = 0  # last committed version
+        self.enabled = False  # True once changes are recorded, see read_view()
+        self._ready = False  # True once the state of every product is known
+        self._starting = threading.Lock() if thread_safe else nullcontext()
+        self._pending = None  # version of the commit in progress
+        self._state = {}  # product -> committed ProductState
+        self._history = {}  # product -> [(version, state before that version)], only while views are open
+        self._added = {}  # product -> version it was added in, only while views are open
+        self._removed = {}  # product -> version it was removed in, only while views are open
+        self._readers = {}  # version -> number of open read views
+        self._total_quantity = 0  # sum of the committed quantities
+
+    def _next_version(self):
+        return self._pending if self._pending is not None else self.version + 1
+
+    def _publish(self, version):
+        if self._pending is None:
+            self.version = version
+
+    def commit(self):
+        """Return a context manager: all changes recorded inside the block become one new version."""
+        return _Commit(self)
+
+    def record(self, product) -> None:
+        """Record the new state of a changed product."""
+        with self.lock:
+            version = self._next_version()
+            if self._readers:
+                self._history.setdefault(product, []).append((version, self._state.get(product)))
+            state = _current_state(product)
+            old_state = self._state.get(product)  # None while tracking starts, see _start()
+            self._total_quantity += state.quantity - (old_state.quantity if old_state is not None else 0)
+            self._state[product] = state
+            self._publish(version)
+
+    def added(self, product) -> None:
+        with self.lock:
+            version = self._next_version()
+            if self._readers:
+                self._added[product] = version
+            self._state[product] = state = _current_state(product)
+            self._total_quantity += state.quantity
+            self._publish(version)
+
+    def removed(self, product) -> None:
+        with self.lock:
+            version = self._next_version()
+            state = self._state.get(product)  # None while tracking starts, see _start()
+            if state is None:
+                self._publish(version)
+                return
+            self._total_quantity -= state.quantity
+            if self._readers:
+                self._removed[product] = version  # the state stays until no view needs it
+            else:
+                del self._state[product]
+            self._publish(version)
+
+    def read_view(self, store):
+        """Return a ReadView of the last committed version of a store."""
+        if not self._ready:
+            self._start(store)
+        with self.lock:
+            version = self.version
+            self._readers[version] = self._readers.get(version, 0) + 1
+            return ReadView(self, store, version, self._total_quantity)
+
+    def _start(self, store):
+        """
+        Start version tracking with one pass over the catalog, every later view is O(1).
+        Orders go on during the pass: from the start, commits record their changes, and
+        the pass only adds the products no commit has recorded yet.
+        """
+        with self._starting:
+            if self._ready:
+                return
+            with self.lock:
+                self.enabled = True  # from now on, every commit takes the lock and records its changes
+            if self.thread_safe:
+                # commits that started without the lock hold the stock locks of their products
+                stock_locks.wait_for_holders()
+            products = store.products
+            for start in range(0, len(products), _CHUNK_SIZE):
+                chunk = [(product, _current_state(product)) for product in products[start:start + _CHUNK_SIZE]]
+                with self.lock:
+                    for product, state in chunk:
+                        if product not in self._state and store.get_product(product.name) == product:
+                            self._state[product] = state
+                            self._total_quantity += state.quantity
+            self._ready = True
+
+    def release(self, version) -> None:
+        """Close one read view of a version and drop the history no open view needs."""
+        dropped = None
+        with self.lock:
+            count = self._readers[version] - 1
+            if count:
+                self._readers[version] = count
+                return
+            del self._readers[version]
+            if not self._readers:
+                for product in self._removed:
+                    self._state.pop(product, None)
+                dropped, self._history = self._history, {}
+                self._added, self._removed = {}, {}
+            elif version < min(self._readers):
+                # entries up to the oldest open version are never read again
+                oldest = min(self._readers)
+                for product in list(self._history):
+                    entries = [entry for entry in self._history[product] if entry[0] > oldest]
+                    if entries:
+                        self._history[product] = entries
+                    else:
+                        del self._history[product]
+        del dropped  # a large history is freed after the lock is released, orders do not wait for it
+
+    def state_at(self, product, version):
+        """Return the ProductState of a product at a version."""
+        # the state is read before the history: a writer adds the history entry first
+        state = self._state.get(product)
+        for entry_version, old_state in self._history.get(product, ()):
+            if entry_version > version:
+                return old_state
+        return state
+
+    def existed_at(self, product, version):
+        """Return True if the product was in the store at a version."""
+        if self._added.get(product, 0) > version:
+            return False
+        removed = self._removed.get(product)
+        return removed is None or removed > version
+
+    def has_membership_changes(self):
+        """Return True if products were added or removed while views were open."""
+        return bool(self._added or self._removed)
+
+    def removed_products(self):
+        return list(self._removed)
+
+
+class _Commit:
+    """Context manager of InventoryVersions.commit()."""
+    __slots__ = ("_versions", "_locked", "_opened")
+
+    def __init__(self, versions):
+        self._versions = versions
+
+    def __enter__(self):
+        versions = self._versions
+        # stores without read views commit without the lock, orders only hold their stock locks
+        self._locked = versions.enabled
+        if not self._locked:
+            self._opened = False
+            return self
+        versions.lock.__enter__()
+        # nested commits do not open a version
+        self._opened = versions._pending is None
+        if self._opened:
+            versions._pending = versions.version + 1
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        versions = self._versions
+        if self._opened:
+            versions.version, versions._pending = versions._pending, None
+        if self._locked:
+            return versions.lock.__exit__(exc_type, exc, traceback)
+        return None
+
+
+class ReadView:
+    """Immutable view of a store's inventory at one committed version.
+    Close it (or use it in a with block) to release the old version early;
+    otherwise it is released when the view is garbage collected.
+    """
+
+    def __init__(self, versions, store, version, total_quantity):
+        self._versions = versions
+        self._store = store
+        self.version = version
+        self._total_quantity = total_quantity
+        self._finalizer = weakref.finalize(self, versions.release, version)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    def close(self) -> None:
+        """Release the version of this view."""
+        self._finalizer()
+
+    @property
+    def products(self):
+        """States of all products (active and inactive) at the version of the view."""
+        versions, version = self._versions, self.version
+        products = self._store.products
+        if versions.has_membership_changes():
+            products = [product for product in products if versions.existed_at(product, version)]
+            products.extend(product for product in versions.removed_products()
+                            if versions.existed_at(product, version))
+        state_at = versions.state_at
+        return [state_at(product, version) for product in products]
+
+    def get_product(self, name):
+        """
+        Look up a product by its name.
+
+        :param name: name of the product
+        :return: ProductState or None if the product did not exist at the version of the view
+        """
+        product = self._store.get_product(name)
+        if product is not None and self._versions.existed_at(product, self.version):
+            return self._versions.state_at(product, self.version)
+        for product in self._versions.removed_products():
+            if product.name == name and self._versions.existed_at(product, self.version):
+                return self._versions.state_at(product, self.version)
+        return None
+
+    def get_total_quantity(self):
+        """Returns the sum of all Products at the version of the view."""
+        return self._total_quantity
+
+    def get_all_products(self):
+        """Returns the states of all active products at the version of the view."""
+        return [state for state in self.products if state.active]